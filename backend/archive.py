@@ -0,0 +1,147 @@
+"""Hot/cold tiering for chat history.
+
+Messages older than a configurable age are moved out of ``chat_messages``
+into one compressed bucket document per room and day in
+``chat_message_buckets``. History reads merge both tiers.
+
+Buckets carry the room's partition key (see partition.py) and are
+addressed by (pk, room_id, day).
+
+Run once from the backend directory with ``python archive.py``.
+"""
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+import pymongo
+from bson import Binary
+
+from partition import scoped
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ARCHIVE_INTERVAL_SECONDS', '3600'))
+BUCKET_FORMAT = 1
+
+# Compact positional layout of one archived message
+FIELDS = ("id", "user_id", "message", "message_type", "file_urls", "created_at")
+
+
+def ensure_archive_indexes(db):
+    db.chat_message_buckets.create_index([("pk", 1), ("room_id", 1), ("day", 1)], unique=True)
+    db.chat_message_buckets.create_index([("pk", 1), ("room_id", 1), ("start", -1)])
+
+
+def _pack(messages: List[Dict[str, Any]]) -> Binary:
+    rows = [
+        [m["id"], m["user_id"], m["message"], m.get("message_type", "text"), m.get("file_urls", []),
+         int(m["created_at"].timestamp() * 1000)]
+        for m in messages
+    ]
+    return Binary(zlib.compress(json.dumps(rows, separators=(",", ":")).encode(), 6))
+
+
+def _unpack(room_id: str, data: bytes) -> List[Dict[str, Any]]:
+    messages = []
+    for row in json.loads(zlib.decompress(data)):
+        message = dict(zip(FIELDS, row))
+        message["room_id"] = room_id
+        message["created_at"] = datetime.fromtimestamp(message["created_at"] / 1000)
+        messages.append(message)
+    return messages
+
+
+def _write_bucket(db, pk: str, room_id: str, day: str, messages: List[Dict[str, Any]]):
+    key = {"pk": pk, "room_id": room_id, "day": day}
+    existing = db.chat_message_buckets.find_one(key)
+    if existing:
+        # Merge into an earlier bucket for the same day; ids dedupe a rerun after a crash
+        merged = {m["id"]: m for m in _unpack(room_id, existing["data"])}
+        merged.update({m["id"]: m for m in messages})
+        messages = list(merged.values())
+    messages.sort(key=lambda m: m["created_at"])
+
+    db.chat_message_buckets.update_one(
+        key,
+        {"$set": {
+            "format": BUCKET_FORMAT,
+            "start": messages[0]["created_at"],
+            "end": messages[-1]["created_at"],
+            "count": len(messages),
+            "data": _pack(messages),
+        }},
+        upsert=True
+    )
+
+
+def archive_old_messages(db, older_than: timedelta = timedelta(days=ARCHIVE_AFTER_DAYS), batch_size: int = 1000):
+    # Stream old messages in (room, time) order and flush one bucket per room/day.
+    # The bucket is written before the hot copies are deleted, so an interrupted
+    # run leaves duplicates that the next run and the read path both collapse.
+    cutoff = datetime.now() - older_than
+    cursor = db.chat_messages.find(
+        {"created_at": {"$lt": cutoff}},
+        {"_id": 0, "version": 0},
+        batch_size=batch_size
+    ).sort([("pk", 1), ("room_id", 1), ("created_at", 1)])
+
+    buckets = 0
+    archived = 0
+    current_key = None
+    pending: List[Dict[str, Any]] = []
+
+    def flush():
+        nonlocal buckets, archived
+        if not pending:
+            return
+        pk, room_id, day = current_key
+        _write_bucket(db, pk, room_id, day, pending)
+        db.chat_messages.delete_many({"pk": pk, "room_id": room_id, "id": {"$in": [m["id"] for m in pending]}})
+        buckets += 1
+        archived += len(pending)
+        pending.clear()
+
+    for message in cursor:
+        key = (message.get("pk"), message["room_id"], message["created_at"].strftime("%Y-%m-%d"))
+        if key != current_key:
+            flush()
+            current_key = key
+        pending.append(message)
+    flush()
+
+    return {"buckets": buckets, "messages": archived, "cutoff": cutoff.isoformat()}
+
+
+def load_archived_messages(db, room_id: str, before: datetime, limit: int, exclude_ids=(), pk: str = None) -> List[Dict[str, Any]]:
+    # Newest-first archived messages older than `before`, reading as few buckets as needed
+    skip = set(exclude_ids)
+    result: List[Dict[str, Any]] = []
+    buckets = db.chat_message_buckets.find(
+        scoped(pk, {"room_id": room_id, "start": {"$lt": before}}),
+        {"_id": 0, "data": 1}
+    ).sort("start", -1)
+
+    for bucket in buckets:
+        messages = [m for m in _unpack(room_id, bucket["data"]) if m["created_at"] < before and m["id"] not in skip]
+        messages.sort(key=lambda m: m["created_at"], reverse=True)
+        result.extend(messages[:limit - len(result)])
+        if len(result) >= limit:
+            break
+    return result
+
+
+def iter_archived_messages(db, room_id: str, after: datetime = None, pk: str = None) -> Iterator[List[Dict[str, Any]]]:
+    # Oldest-first buckets for a room, one day of messages at a time
+    query: Dict[str, Any] = scoped(pk, {"room_id": room_id})
+    if after is not None:
+        query["end"] = {"$gte": after}
+    for bucket in db.chat_message_buckets.find(query, {"_id": 0, "data": 1}).sort("start", 1).batch_size(8):
+        yield _unpack(room_id, bucket["data"])
+
+
+if __name__ == "__main__":
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
+    database = pymongo.MongoClient(mongo_url).school_connect
+    ensure_archive_indexes(database)
+    print(archive_old_messages(database))
@@ -0,0 +1,127 @@
+"""MLA citation formatting for single sources and whole Works Cited lists.
+
+Each source type has a formatter built once at import time from an ordered
+list of segments. Empty fields are dropped instead of leaving stray
+punctuation. Formatted entries are memoized, so a bibliography that repeats
+sources (or a student re-submitting the same list) costs one format per
+distinct entry.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAX_BATCH_SOURCES = 1000
+CACHE_SIZE = 4096
+LEADING_ARTICLE_RE = re.compile(r"^(a|an|the)\s+")
+SORT_STRIP_RE = re.compile(r"[\"'“”‘’]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _join(*parts: str, sep: str = ", ") -> str:
+    return sep.join(part for part in parts if part)
+
+
+def _author(f: Dict[str, str]) -> str:
+    return f"{f['author']}." if f.get("author") else ""
+
+
+def _quoted_title(f: Dict[str, str]) -> str:
+    return f'"{f["title"]}"' if f.get("title") else ""
+
+
+def _quoted_title_period(f: Dict[str, str]) -> str:
+    return f'"{f["title"]}."' if f.get("title") else ""
+
+
+def _container(*segments: Callable[[Dict[str, str]], str]) -> Callable[[Dict[str, str]], str]:
+    def render(f: Dict[str, str]) -> str:
+        body = _join(*(segment(f) for segment in segments))
+        return f"{body}." if body else ""
+    return render
+
+
+def _field(name: str, prefix: str = "") -> Callable[[Dict[str, str]], str]:
+    return lambda f: f"{prefix}{f[name]}" if f.get(name) else ""
+
+
+def _compile(*segments: Callable[[Dict[str, str]], str]) -> Callable[[Dict[str, str]], str]:
+    def render(f: Dict[str, str]) -> str:
+        return " ".join(part for part in (segment(f) for segment in segments) if part)
+    return render
+
+
+FORMATTERS: Dict[str, Callable[[Dict[str, str]], str]] = {
+    "website": _compile(_author, _quoted_title, _container(_field("website"), _field("date"), _field("url"))),
+    "book": _compile(_author, lambda f: f"{f['title']}." if f.get("title") else "",
+                     _container(_field("publisher"), _field("year"))),
+    "journal": _compile(_author, _quoted_title_period, _container(
+        _field("journal"),
+        _field("volume", "vol. "), _field("issue", "no. "), _field("year"), _field("pages", "pp. "),
+        _field("doi"),
+    )),
+    "video": _compile(_author, _quoted_title_period, _container(
+        _field("platform"),
+        _field("uploader", "uploaded by "), _field("date"), _field("url"),
+    )),
+}
+
+FIELDS = {
+    "website": ("author", "title", "website", "url", "date"),
+    "book": ("author", "title", "publisher", "year"),
+    "journal": ("author", "title", "journal", "volume", "issue", "year", "pages", "doi"),
+    "video": ("author", "title", "platform", "uploader", "date", "url"),
+}
+
+
+def _normalize(source: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    source_type = str(source.get("type", "website")).lower()
+    names = FIELDS.get(source_type, ())
+    return source_type, tuple((name, str(source.get(name) or "").strip()) for name in names)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _format_normalized(source_type: str, fields: Tuple[Tuple[str, str], ...]) -> Optional[str]:
+    formatter = FORMATTERS.get(source_type)
+    return formatter(dict(fields)) if formatter else None
+
+
+def format_citation(source: Dict[str, Any]) -> Optional[str]:
+    # None for unsupported source types
+    return _format_normalized(*_normalize(source))
+
+
+def sort_key(citation: str) -> str:
+    # Works Cited order ignores quotes and a leading article
+    key = SORT_STRIP_RE.sub("", citation).strip().lower()
+    return LEADING_ARTICLE_RE.sub("", key)
+
+
+def build_works_cited(sources: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    # Returns (sorted, de-duplicated entries, errors) with each source's original index
+    entries: Dict[str, Dict[str, Any]] = {}
+    errors = []
+    for index, source in enumerate(sources):
+        if not isinstance(source, dict):
+            errors.append({"index": index, "error": "Source must be an object"})
+            continue
+        citation = format_citation(source)
+        if citation is None:
+            errors.append({"index": index, "error": f"Unsupported source type: {source.get('type')}"})
+            continue
+        dedupe_key = WHITESPACE_RE.sub(" ", citation).casefold()
+        if dedupe_key in entries:
+            entries[dedupe_key]["duplicates"].append(index)
+        else:
+            entries[dedupe_key] = {"index": index, "type": _normalize(source)[0], "citation": citation, "duplicates": []}
+    return sorted(entries.values(), key=lambda entry: sort_key(entry["citation"])), errors
+
+
+def iter_text(entries: List[Dict[str, Any]], errors: List[Dict[str, Any]] = ()) -> Iterator[str]:
+    yield "Works Cited\n\n"
+    for entry in entries:
+        yield entry["citation"] + "\n"
+    # Sources that could not be formatted are listed after the bibliography, by original index
+    if errors:
+        yield "\nSkipped sources\n\n"
+        for error in errors:
+            yield f"{error['index']}: {error['error']}\n"
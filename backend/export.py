@@ -0,0 +1,178 @@
+"""Streaming NDJSON/CSV exports of room history and school help requests.
+
+Rows come straight from a Mongo cursor, in (created_at, id) order, and
+are encoded into chunks of about ``EXPORT_CHUNK_BYTES``. Memory stays
+constant however large the export is: one cursor batch, one chunk and
+one batch of user-name lookups.
+
+Every row carries a ``cursor`` column (``<created_at ms>:<id>``).
+Passing the last received cursor back as ``after`` resumes the export
+right after that row. Together with ``limit``, this lets clients fetch a
+large export in ranges or continue a broken download.
+
+Room exports include the archived buckets (see archive.py), oldest first,
+followed by the hot collection.
+"""
+import csv
+import io
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import archive
+from partition import scoped
+from serialization import dumps
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 10_000
+EXPORT_CHUNK_BYTES = 64 * 1024
+NAME_LOOKUP_BATCH = 500
+
+MESSAGE_COLUMNS = ("cursor", "id", "room_id", "user_id", "user_name", "message", "message_type", "file_urls", "created_at")
+HELP_REQUEST_COLUMNS = (
+    "cursor", "id", "school_id", "user_id", "user_name", "title", "subject", "description",
+    "status", "response_count", "image_urls", "created_at",
+)
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+Position = Tuple[datetime, str]
+
+
+def _millis(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    return f"{_millis(row['created_at'])}:{row['id']}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Position]:
+    if not cursor:
+        return None
+    millis, sep, row_id = cursor.partition(":")
+    if not sep or not row_id or not millis.lstrip("-").isdigit():
+        raise ValueError("Invalid cursor")
+    # Rebuilt exactly (no float round trip) so the resume boundary matches stored values
+    created_at = datetime.fromtimestamp(int(millis) // 1000).replace(microsecond=int(millis) % 1000 * 1000)
+    return created_at, row_id
+
+
+def clamp_batch_size(batch_size: int) -> int:
+    return max(MIN_BATCH_SIZE, min(batch_size, MAX_BATCH_SIZE))
+
+
+def _sort_key(row: Dict[str, Any]) -> Position:
+    return row["created_at"], row["id"]
+
+
+def _after_filter(after: Optional[Position]) -> Dict[str, Any]:
+    if after is None:
+        return {}
+    created_at, row_id = after
+    return {"$or": [{"created_at": {"$gt": created_at}}, {"created_at": created_at, "id": {"$gt": row_id}}]}
+
+
+def _with_user_names(db, rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # One $in lookup per NAME_LOOKUP_BATCH rows
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, NAME_LOOKUP_BATCH))
+        if not batch:
+            return
+        names = {
+            user["id"]: user["name"]
+            for user in db.users.find({"id": {"$in": list({row["user_id"] for row in batch})}}, {"_id": 0, "id": 1, "name": 1})
+        }
+        for row in batch:
+            row["user_name"] = names.get(row["user_id"], "Unknown")
+            yield row
+
+
+def room_messages(db, room_id: str, after: Optional[Position] = None, batch_size: int = EXPORT_BATCH_SIZE,
+                  pk: str = None) -> Iterator[Dict[str, Any]]:
+    last_bucket_ids = set()
+    for messages in archive.iter_archived_messages(db, room_id, after[0] if after else None, pk=pk):
+        messages.sort(key=_sort_key)
+        last_bucket_ids = {message["id"] for message in messages}
+        for message in messages:
+            if after is None or _sort_key(message) > after:
+                yield message
+
+    cursor = db.chat_messages.find(
+        scoped(pk, {"room_id": room_id, **_after_filter(after)}),
+        {"_id": 0, "version": 0, "pk": 0}
+    ).sort([("created_at", 1), ("id", 1)]).batch_size(clamp_batch_size(batch_size))
+    for message in cursor:
+        # An interrupted archive run can leave hot copies of the newest bucket's messages
+        if message["id"] not in last_bucket_ids:
+            yield message
+
+
+def school_help_requests(db, school_id: str, after: Optional[Position] = None, batch_size: int = EXPORT_BATCH_SIZE,
+                         pk: str = None) -> Iterator[Dict[str, Any]]:
+    yield from db.help_requests.find(
+        scoped(pk, {"school_id": school_id, **_after_filter(after)}),
+        {"_id": 0, "version": 0, "pk": 0, "latest_response": 0}
+    ).sort([("created_at", 1), ("id", 1)]).batch_size(clamp_batch_size(batch_size))
+
+
+def _row(row: Dict[str, Any], columns: Tuple[str, ...]) -> Dict[str, Any]:
+    values = {column: row.get(column) for column in columns}
+    values["cursor"] = encode_cursor(row)
+    return values
+
+
+def _chunked(lines: Iterable[bytes]) -> Iterator[bytes]:
+    buffer: List[bytes] = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def iter_ndjson(rows: Iterable[Dict[str, Any]], columns: Tuple[str, ...]) -> Iterator[bytes]:
+    return _chunked(dumps(_row(row, columns)) + b"\n" for row in rows)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return " ".join(map(str, value))
+    return "" if value is None else value
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]], columns: Tuple[str, ...]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        line = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    def lines():
+        # The header goes out even when there are no rows, so an empty export is still a CSV
+        writer.writerow(columns)
+        yield flush()
+        for row in rows:
+            values = _row(row, columns)
+            writer.writerow([_csv_value(values[column]) for column in columns])
+            yield flush()
+
+    return _chunked(lines())
+
+
+def encode(db, rows: Iterable[Dict[str, Any]], columns: Tuple[str, ...], output_format: str, limit: int = None) -> Iterator[bytes]:
+    if limit is not None:
+        rows = islice(rows, max(limit, 0))
+    rows = _with_user_names(db, rows)
+    return iter_csv(rows, columns) if output_format == "csv" else iter_ndjson(rows, columns)
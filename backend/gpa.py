@@ -0,0 +1,233 @@
+"""Vectorized GPA engine for single students and whole cohorts.
+
+Grades are arrays of (student, term, letter, credit hours, course level).
+Per-term and cumulative GPA are computed with grouped sums (``np.bincount``)
+rather than per-student loops. The weighted scale adds a bonus for honors
+and AP/IB/dual-credit courses; failing grades never earn a bonus.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+GRADE_POINTS = {
+    "A+": 4.0, "A": 4.0, "A-": 3.7,
+    "B+": 3.3, "B": 3.0, "B-": 2.7,
+    "C+": 2.3, "C": 2.0, "C-": 1.7,
+    "D+": 1.3, "D": 1.0, "D-": 0.7,
+    "F": 0.0,
+}
+
+LEVEL_BONUS = {
+    "regular": 0.0,
+    "honors": 0.5,
+    "ap": 1.0,
+    "ib": 1.0,
+    "dual_credit": 1.0,
+}
+
+DEFAULT_CREDIT_HOURS = 3.0
+CSV_CHUNK_ROWS = 50_000
+CSV_COLUMNS = ["student_id", "term", "letter", "credit_hours", "level"]
+
+
+def _lookup(values: np.ndarray, table: Dict[str, float], label: str) -> np.ndarray:
+    # Map each distinct label once, then broadcast back through the inverse index
+    uniques, inverse = np.unique(values, return_inverse=True)
+    unknown = [value for value in uniques if value not in table]
+    if unknown:
+        raise ValueError(f"Unknown {label}: {', '.join(map(str, unknown[:10]))}")
+    return np.array([table[value] for value in uniques], dtype=np.float64)[inverse]
+
+
+def credit_hours(value: Any) -> float:
+    # Missing or blank means the default, as in CSV uploads
+    if value is None or value == "":
+        return DEFAULT_CREDIT_HOURS
+    try:
+        hours = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Credit hours must be a number, got {value!r}")
+    if not math.isfinite(hours) or hours < 0:
+        raise ValueError("Credit hours must be non-negative numbers")
+    return hours
+
+
+def grade_points(letters: Iterable[str], levels: Iterable[str]):
+    letters = np.char.upper(np.char.strip(np.asarray(list(letters), dtype=str)))
+    levels = np.char.lower(np.char.strip(np.asarray(list(levels), dtype=str)))
+    unweighted = _lookup(letters, GRADE_POINTS, "letter grades")
+    bonus = _lookup(levels, LEVEL_BONUS, "course levels")
+    weighted = unweighted + np.where(unweighted > 0, bonus, 0.0)
+    return unweighted, weighted
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _rounded(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(value) else value for value in np.round(values, 3).tolist()]
+
+
+def compute_cohort(
+    student_ids: Iterable[str],
+    terms: Iterable[str],
+    letters: Iterable[str],
+    credit_hours: Iterable[float],
+    levels: Iterable[str],
+    term_order: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    student_ids = np.asarray(list(student_ids), dtype=str)
+    terms = np.asarray(list(terms), dtype=str)
+    credits = np.asarray(list(credit_hours), dtype=np.float64)
+    if not (len(student_ids) == len(terms) == len(credits)):
+        raise ValueError("Grade columns must all have the same length")
+    if len(student_ids) == 0:
+        return {"terms": [], "students": []}
+    if np.any(credits < 0) or not np.all(np.isfinite(credits)):
+        raise ValueError("Credit hours must be non-negative numbers")
+
+    unweighted, weighted = grade_points(letters, levels)
+
+    students, student_index = np.unique(student_ids, return_inverse=True)
+    # Terms sort by label unless the caller gives the chronological order
+    if term_order:
+        ordered_terms = np.asarray(term_order, dtype=str)
+        position = {term: i for i, term in enumerate(term_order)}
+        missing = sorted(set(np.unique(terms).tolist()) - set(position))
+        if missing:
+            raise ValueError(f"Terms missing from term_order: {', '.join(missing[:10])}")
+        unique_terms, inverse = np.unique(terms, return_inverse=True)
+        term_index = np.array([position[term] for term in unique_terms.tolist()])[inverse]
+    else:
+        ordered_terms, term_index = np.unique(terms, return_inverse=True)
+
+    n_students, n_terms = len(students), len(ordered_terms)
+    group = student_index * n_terms + term_index
+    size = n_students * n_terms
+
+    def grouped_sum(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(group, weights=weights, minlength=size).reshape(n_students, n_terms)
+
+    term_credits = grouped_sum(credits)
+    term_unweighted = grouped_sum(credits * unweighted)
+    term_weighted = grouped_sum(credits * weighted)
+
+    cumulative_credits = np.cumsum(term_credits, axis=1)
+    cumulative_unweighted = _safe_divide(np.cumsum(term_unweighted, axis=1), cumulative_credits)
+    cumulative_weighted = _safe_divide(np.cumsum(term_weighted, axis=1), cumulative_credits)
+    term_gpa_unweighted = _safe_divide(term_unweighted, term_credits)
+    term_gpa_weighted = _safe_divide(term_weighted, term_credits)
+
+    # Rank on final cumulative weighted GPA; students without credits are unranked
+    final_weighted = cumulative_weighted[:, -1]
+    ranked = ~np.isnan(final_weighted)
+    cohort = np.sort(final_weighted[ranked])
+    at_or_below = np.searchsorted(cohort, final_weighted, side="right")
+    class_rank = len(cohort) - at_or_below + 1
+    strictly_below = np.searchsorted(cohort, final_weighted, side="left")
+    percentile = 100.0 * strictly_below / max(len(cohort) - 1, 1) if len(cohort) > 1 else np.full(n_students, 100.0)
+
+    has_term = term_credits > 0
+    columns = {
+        "credits": term_credits.tolist(),
+        "unweighted": [_rounded(row) for row in term_gpa_unweighted],
+        "weighted": [_rounded(row) for row in term_gpa_weighted],
+        "cumulative_unweighted": [_rounded(row) for row in cumulative_unweighted],
+        "cumulative_weighted": [_rounded(row) for row in cumulative_weighted],
+    }
+    term_labels = ordered_terms.tolist()
+    final_unweighted = _rounded(cumulative_unweighted[:, -1])
+    final_weighted_rounded = _rounded(final_weighted)
+    percentile_rounded = np.round(percentile, 1).tolist()
+
+    result = []
+    for i, student_id in enumerate(students.tolist()):
+        result.append({
+            "student_id": student_id,
+            "terms": [
+                {
+                    "term": term_labels[t],
+                    "credits": columns["credits"][i][t],
+                    "unweighted": columns["unweighted"][i][t],
+                    "weighted": columns["weighted"][i][t],
+                    "cumulative_unweighted": columns["cumulative_unweighted"][i][t],
+                    "cumulative_weighted": columns["cumulative_weighted"][i][t],
+                }
+                for t in np.flatnonzero(has_term[i]).tolist()
+            ],
+            "cumulative": {
+                "credits": float(cumulative_credits[i, -1]),
+                "unweighted": final_unweighted[i],
+                "weighted": final_weighted_rounded[i],
+            },
+            "class_rank": int(class_rank[i]) if ranked[i] else None,
+            "percentile": percentile_rounded[i] if ranked[i] else None,
+        })
+
+    return {"terms": term_labels, "students": result}
+
+
+def compute_from_records(records: List[Dict[str, Any]], term_order: Optional[List[str]] = None) -> Dict[str, Any]:
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("records must be a list of grade objects")
+    if term_order is not None and not (isinstance(term_order, list) and all(isinstance(term, str) for term in term_order)):
+        raise ValueError("term_order must be a list of term names")
+    try:
+        return compute_cohort(
+            (record["student_id"] for record in records),
+            (record.get("term", "") for record in records),
+            (record["letter"] for record in records),
+            (credit_hours(record.get("credit_hours")) for record in records),
+            (record.get("level") or "regular" for record in records),
+            term_order=term_order,
+        )
+    except KeyError as e:
+        raise ValueError(f"Every grade record needs a {e.args[0]}")
+
+
+def _csv_credit_hours(raw) -> np.ndarray:
+    # Same rules as credit_hours(): blank cells get the default, anything else must parse
+    import pandas as pd
+
+    blank = raw.str.strip() == ""
+    parsed = pd.to_numeric(raw.where(~blank), errors="coerce")
+    invalid = parsed.isna() & ~blank
+    if invalid.any():
+        raise ValueError(f"Credit hours must be a number, got {raw[invalid].iloc[0]!r}")
+    return parsed.fillna(DEFAULT_CREDIT_HOURS).to_numpy(dtype=np.float64)
+
+
+def compute_from_csv(stream, term_order: Optional[List[str]] = None) -> Dict[str, Any]:
+    # pandas is only needed here; importing it lazily keeps server startup fast
+    import pandas as pd
+
+    # Parse the upload in chunks so the raw CSV is never held in memory twice
+    columns: Dict[str, List[np.ndarray]] = {name: [] for name in CSV_COLUMNS}
+    reader = pd.read_csv(
+        stream,
+        chunksize=CSV_CHUNK_ROWS,
+        dtype={"student_id": str, "term": str, "letter": str, "credit_hours": str, "level": str},
+        keep_default_na=False,
+    )
+    for chunk in reader:
+        if "student_id" not in chunk or "letter" not in chunk:
+            raise ValueError("CSV needs student_id and letter columns")
+        columns["student_id"].append(chunk["student_id"].to_numpy(dtype=str))
+        columns["letter"].append(chunk["letter"].to_numpy(dtype=str))
+        columns["term"].append(chunk["term"].to_numpy(dtype=str) if "term" in chunk else np.full(len(chunk), ""))
+        columns["credit_hours"].append(
+            _csv_credit_hours(chunk["credit_hours"]) if "credit_hours" in chunk else np.full(len(chunk), DEFAULT_CREDIT_HOURS)
+        )
+        levels = chunk["level"].replace("", "regular").to_numpy(dtype=str) if "level" in chunk else np.full(len(chunk), "regular")
+        columns["level"].append(levels)
+
+    if not columns["student_id"]:
+        return {"terms": [], "students": []}
+    merged = {name: np.concatenate(parts) for name, parts in columns.items()}
+    return compute_cohort(
+        merged["student_id"], merged["term"], merged["letter"], merged["credit_hours"], merged["level"],
+        term_order=term_order,
+    )
@@ -0,0 +1,212 @@
+"""Background jobs that run after the HTTP response is sent.
+
+Handlers are registered by name with ``@job_queue.job(name)`` and run on a
+fixed pool of worker tasks. Each worker owns a bounded queue. When all
+queues are full, ``enqueue`` waits for space, so overload slows the
+routes down instead of dropping work. Jobs enqueued with the same ``key``
+go to the same worker and run in order; chat broadcasts use the room id,
+so a room's messages are never reordered. A failing job is retried in
+place with exponential backoff, up to ``JOB_MAX_ATTEMPTS`` attempts. The
+worker's later jobs wait for it, so the order holds across retries too.
+
+Jobs registered with ``durable=True`` can instead go to a ``jobs`` Mongo
+collection (``JOB_BACKEND=mongo``). Every worker process polls that
+collection and claims jobs with a lease, which the worker renews while the
+job runs. A job survives a restart and is picked up again if its worker
+dies. Jobs that write to WebSockets stay in process, because only the
+process holding a socket can write to it; a durable job that needs to
+notify clients enqueues an in-process job for that.
+"""
+import asyncio
+import os
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import pymongo
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', '10000'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+RETRY_BACKOFF_SECONDS = 0.5
+POLL_INTERVAL_SECONDS = 0.5
+LEASE_SECONDS = 60
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class MongoJobStore:
+    def __init__(self, collection, lease_seconds: float = LEASE_SECONDS):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+
+    def ensure_indexes(self):
+        self.collection.create_index([("status", 1), ("run_at", 1)])
+        self.collection.create_index([("status", 1), ("lease_until", 1)])
+
+    def push(self, name: str, payload: Dict[str, Any]):
+        now = datetime.utcnow()
+        self.collection.insert_one({
+            "_id": uuid.uuid4().hex, "name": name, "payload": payload,
+            "status": "queued", "attempts": 0, "run_at": now, "created_at": now,
+        })
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        # Due jobs, or running jobs whose worker stopped renewing the lease
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": "running", "lease_until": now + timedelta(seconds=self.lease_seconds)}, "$inc": {"attempts": 1}},
+            sort=[("run_at", 1)],
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+
+    def renew(self, job_id: str):
+        self.collection.update_one(
+            {"_id": job_id, "status": "running"},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+        )
+
+    def complete(self, job_id: str):
+        self.collection.delete_one({"_id": job_id})
+
+    def fail(self, job: Dict[str, Any], error: str, max_attempts: int):
+        if job["attempts"] >= max_attempts:
+            update = {"status": "failed", "error": error}
+        else:
+            delay = RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+            update = {"status": "queued", "error": error, "run_at": datetime.utcnow() + timedelta(seconds=delay)}
+        self.collection.update_one({"_id": job["_id"]}, {"$set": update})
+
+    def pending(self) -> int:
+        return self.collection.count_documents({"status": {"$in": ["queued", "running"]}})
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, maxsize: int = JOB_QUEUE_SIZE,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, store: MongoJobStore = None):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_attempts = max_attempts
+        self.store = store
+        self.handlers: Dict[str, Tuple[Handler, bool]] = {}
+        self.queues: List[asyncio.Queue] = []
+        self.tasks: List[asyncio.Task] = []
+        self.counts: Counter = Counter()
+        self._next_queue = 0
+
+    def job(self, name: str, durable: bool = False):
+        def register(handler: Handler) -> Handler:
+            self.handlers[name] = (handler, durable)
+            return handler
+        return register
+
+    def ensure_indexes(self):
+        if self.store is not None:
+            self.store.ensure_indexes()
+
+    def start(self):
+        self.queues = [asyncio.Queue(max(1, self.maxsize // self.workers)) for _ in range(self.workers)]
+        self.tasks = [asyncio.create_task(self._work(queue)) for queue in self.queues]
+        if self.store is not None:
+            self.tasks += [asyncio.create_task(self._poll_store()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10):
+        # Let queued in-process jobs finish; durable ones stay in Mongo for the next start
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            print(f"Job queue stopped with {sum(queue.qsize() for queue in self.queues)} jobs pending")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.queues = []
+
+    async def enqueue(self, name: str, payload: Dict[str, Any], key: str = None):
+        handler, durable = self.handlers[name]
+        self.counts["enqueued"] += 1
+        if durable and self.store is not None:
+            await asyncio.to_thread(self.store.push, name, payload)
+            return
+        if not self.queues:
+            # Not started (scripts, benchmarks calling routes directly): run inline
+            await self._run(name, payload, attempts=1)
+            return
+        if key is None:
+            queue = self.queues[self._next_queue % len(self.queues)]
+            self._next_queue += 1
+        else:
+            queue = self.queues[hash(key) % len(self.queues)]
+        await queue.put((name, payload))
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            name, payload = await queue.get()
+            try:
+                await self._run(name, payload, self.max_attempts)
+            finally:
+                queue.task_done()
+
+    async def _run(self, name: str, payload: Dict[str, Any], attempts: int):
+        # Retries sleep on this worker instead of requeueing, which would put the job behind later ones
+        for attempt in range(attempts):
+            try:
+                await self.handlers[name][0](**payload)
+                self.counts["succeeded"] += 1
+                return
+            except Exception as e:
+                if attempt + 1 < attempts:
+                    self.counts["retried"] += 1
+                    await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+                else:
+                    self.counts["failed"] += 1
+                    print(f"Job {name} failed after {attempts} attempts: {e}")
+
+    async def _poll_store(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+            except Exception as e:
+                print(f"Job store error: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                continue
+            renewal = asyncio.create_task(self._renew_lease(job["_id"]))
+            try:
+                await self.handlers[job["name"]][0](**job["payload"])
+                self.counts["succeeded"] += 1
+                await asyncio.to_thread(self.store.complete, job["_id"])
+            except Exception as e:
+                self.counts["failed" if job["attempts"] >= self.max_attempts else "retried"] += 1
+                await asyncio.to_thread(self.store.fail, job, str(e), self.max_attempts)
+            finally:
+                renewal.cancel()
+
+    async def _renew_lease(self, job_id: str):
+        # Renews well before expiry, so a long job is not claimed a second time
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.store.renew, job_id)
+            except Exception as e:
+                print(f"Job store error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": sum(queue.qsize() for queue in self.queues),
+            "backend": "mongo" if self.store is not None else "memory",
+            **{outcome: self.counts[outcome] for outcome in ("enqueued", "succeeded", "retried", "failed")},
+        }
+
+
+def queue_from_env(db=None) -> JobQueue:
+    if os.environ.get('JOB_BACKEND', 'memory') == 'mongo' and db is not None:
+        return JobQueue(store=MongoJobStore(db.jobs))
+    return JobQueue()
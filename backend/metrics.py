@@ -0,0 +1,131 @@
+"""Prometheus metrics for HTTP routes, Mongo commands, WebSockets, uploads and AI calls.
+
+Scraped from ``GET /metrics``. Route labels use the route template
+(``/api/chat/rooms/{room_id}/messages``), not the raw path, so label
+cardinality stays bounded. Hot-path recording is a dict lookup plus a
+histogram observe.
+"""
+import time
+from typing import Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily
+from prometheus_client.registry import REGISTRY
+from pymongo import monitoring
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FANOUT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_RESPONSES = Counter("http_responses_total", "HTTP responses by status", ["method", "route", "status"])
+
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency", ["collection", "command"], buckets=LATENCY_BUCKETS
+)
+MONGO_COMMAND_FAILURES = Counter("mongo_command_failures_total", "Failed Mongo commands", ["collection", "command"])
+
+# Not labelled by room: room ids are unbounded. Per-room counts are in /api/chat/rooms/{room_id}/presence
+WEBSOCKET_CONNECTIONS = Gauge("websocket_connections", "Open chat WebSocket connections")
+BROADCAST_FANOUT = Histogram("broadcast_fanout", "Sockets reached per broadcast", ["kind"], buckets=FANOUT_BUCKETS)
+BROADCAST_SECONDS = Histogram("broadcast_duration_seconds", "Time to fan out one broadcast", ["kind"], buckets=LATENCY_BUCKETS)
+SESSION_RESUMES = Counter("chat_session_resumes_total", "Chat reconnects by where the replay came from", ["source"])
+
+UPLOAD_BYTES = Counter("upload_bytes_total", "Uploaded file bytes", ["kind"])
+UPLOAD_SECONDS = Histogram("upload_duration_seconds", "Time to store one uploaded file", ["kind"], buckets=LATENCY_BUCKETS)
+
+AI_REQUEST_SECONDS = Histogram(
+    "ai_request_duration_seconds", "AI completion latency", ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+)
+AI_REQUESTS = Counter("ai_requests_total", "AI completions by outcome", ["outcome"])
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._inflight: Dict[Tuple[int, object], Tuple[str, str]] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = "-"
+        self._inflight[(event.request_id, event.connection_id)] = (collection, event.command_name)
+
+    def succeeded(self, event):
+        labels = self._inflight.pop((event.request_id, event.connection_id), None)
+        if labels:
+            MONGO_COMMAND_SECONDS.labels(*labels).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._inflight.pop((event.request_id, event.connection_id), None)
+        if labels:
+            MONGO_COMMAND_SECONDS.labels(*labels).observe(event.duration_micros / 1e6)
+            MONGO_COMMAND_FAILURES.labels(*labels).inc()
+
+
+class RateLimitCollector:
+    # Exposes the rate limiter's own counters instead of double-counting
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def collect(self):
+        throttled = CounterMetricFamily("rate_limit_throttled", "Requests rejected by the rate limiter", labels=["route_class"])
+        for route_class, count in self.limiter.throttled.items():
+            throttled.add_metric([route_class], count)
+        yield throttled
+
+
+def register_rate_limiter(limiter):
+    REGISTRY.register(RateLimitCollector(limiter))
+
+
+class MetricsMiddleware:
+    def __init__(self, app, routes_app):
+        self.app = app
+        self.routes_app = routes_app
+        self._templates: Dict[object, str] = {}
+
+    def _route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is not None:
+            template = self._templates.get(endpoint)
+            if template is None:
+                self._templates = {route.endpoint: route.path for route in self.routes_app.routes if hasattr(route, "endpoint")}
+                template = self._templates.get(endpoint, "unmatched")
+            return template
+        # Answered before routing (response cache, rate limiter): match the template directly
+        for route in self.routes_app.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route_template(scope)
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_RESPONSES.labels(method, route, str(status)).inc()
+
+
+def latest():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,199 @@
+"""One-off data migrations for the SchoolConnect database.
+
+Run from the backend directory:
+
+    python migrations.py split_help_responses
+    python migrations.py backfill_sync_versions
+    python migrations.py backfill_partition_keys
+    python migrations.py drop_unpartitioned_indexes
+"""
+import os
+import sys
+
+import pymongo
+
+from partition import VersionClock, partition_key
+
+RESPONSE_PREVIEW_LENGTH = 200
+
+
+def split_help_responses(db, batch_size: int = 500):
+    # Move embedded help_requests.responses arrays into the help_responses
+    # collection and replace them with response_count / latest_response.
+    moved = 0
+    migrated_requests = 0
+    cursor = db.help_requests.find(
+        {"responses": {"$exists": True}},
+        {"_id": 1, "id": 1, "responses": 1},
+        batch_size=batch_size
+    )
+    for request in cursor:
+        responses = request.get("responses") or []
+        docs = []
+        for response in responses:
+            doc = dict(response)
+            doc["request_id"] = request["id"]
+            doc.setdefault("file_urls", [])
+            docs.append(doc)
+
+        if docs:
+            # Upsert by id so an interrupted run can be resumed safely
+            db.help_responses.bulk_write([
+                pymongo.UpdateOne({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True)
+                for doc in docs
+            ], ordered=False)
+
+        latest = None
+        if docs:
+            newest = max(docs, key=lambda d: d["created_at"])
+            latest = {
+                "id": newest["id"],
+                "user_id": newest["user_id"],
+                "message": newest["message"][:RESPONSE_PREVIEW_LENGTH],
+                "created_at": newest["created_at"]
+            }
+
+        db.help_requests.update_one(
+            {"_id": request["_id"]},
+            {
+                "$set": {"response_count": len(docs), "latest_response": latest},
+                "$unset": {"responses": ""}
+            }
+        )
+        moved += len(docs)
+        migrated_requests += 1
+
+    return {"help_requests": migrated_requests, "responses": moved}
+
+
+def backfill_sync_versions(db, batch_size: int = 500):
+    # Give pre-existing documents a version (and help requests a school_id)
+    # so they are visible to /api/sync.
+    stamped = {}
+    clock = VersionClock()
+    for name in ("users", "chat_rooms", "chat_messages", "help_requests"):
+        collection = db[name]
+        count = 0
+        cursor = collection.find(
+            {"version": {"$exists": False}},
+            {"_id": 1, "user_id": 1},
+            batch_size=batch_size
+        )
+        for doc in cursor:
+            update = {"version": clock.next()}
+            if name == "help_requests":
+                user = db.users.find_one({"id": doc.get("user_id")}, {"school_id": 1})
+                update["school_id"] = user["school_id"] if user else None
+            collection.update_one({"_id": doc["_id"]}, {"$set": update})
+            count += 1
+        stamped[name] = count
+    return stamped
+
+
+def _district_lookup():
+    # The same catalog the server resolves districts with
+    from school_catalog import SchoolCatalog
+    path = os.environ.get('SCHOOL_CATALOG_PATH')
+    if path:
+        catalog = SchoolCatalog.load(path)
+    else:
+        from server import TEXAS_SCHOOLS
+        catalog = SchoolCatalog.from_grouped(TEXAS_SCHOOLS)
+    return lambda school_id: (catalog.get(school_id) or {}).get("district")
+
+
+def _flush(collection, ops) -> int:
+    if not ops:
+        return 0
+    modified = collection.bulk_write(ops, ordered=False).modified_count
+    ops.clear()
+    return modified
+
+
+def backfill_partition_keys(db, batch_size: int = 500):
+    # Stamp pk on documents written before partitioning (see partition.py).
+    # Only documents without a pk are touched, so the run can be repeated.
+    district_of = _district_lookup()
+    missing = {"pk": {"$exists": False}}
+    stamped = {}
+
+    def pk_for(school_id):
+        return partition_key(school_id, district_of(school_id) if school_id else None)
+
+    # Users and help requests: one update per school
+    for name in ("users", "help_requests"):
+        count = 0
+        for school_id in db[name].distinct("school_id", missing):
+            count += db[name].update_many({**missing, "school_id": school_id}, {"$set": {"pk": pk_for(school_id)}}).modified_count
+        stamped[name] = count
+
+    # Rooms: by school, or by the creator's school for group rooms and DMs
+    room_count = 0
+    for school_id in db.chat_rooms.distinct("school_id", missing):
+        if school_id:
+            room_count += db.chat_rooms.update_many({**missing, "school_id": school_id}, {"$set": {"pk": pk_for(school_id)}}).modified_count
+    ops = []
+    for room in db.chat_rooms.find(missing, {"_id": 1, "created_by": 1}, batch_size=batch_size):
+        creator = db.users.find_one({"id": room.get("created_by")}, {"_id": 0, "pk": 1})
+        ops.append(pymongo.UpdateOne({"_id": room["_id"]}, {"$set": {"pk": creator["pk"] if creator else pk_for(None)}}))
+        if len(ops) >= batch_size:
+            room_count += _flush(db.chat_rooms, ops)
+    room_count += _flush(db.chat_rooms, ops)
+    stamped["chat_rooms"] = room_count
+
+    # Children inherit their parent's key
+    for parent, child, field in (
+        ("chat_rooms", "chat_messages", "room_id"),
+        ("chat_rooms", "chat_message_buckets", "room_id"),
+        ("help_requests", "help_responses", "request_id"),
+    ):
+        ops = []
+        count = 0
+        for doc in db[parent].find({"pk": {"$exists": True}}, {"_id": 0, "id": 1, "pk": 1}, batch_size=batch_size):
+            ops.append(pymongo.UpdateMany({**missing, field: doc["id"]}, {"$set": {"pk": doc["pk"]}}))
+            if len(ops) >= batch_size:
+                count += _flush(db[child], ops)
+        stamped[child] = count + _flush(db[child], ops)
+    return stamped
+
+
+# Indexes replaced by pk-prefixed ones; drop them once PARTITION_ROUTING=1 is live
+UNPARTITIONED_INDEXES = {
+    "users": ["school_id_1_version_1"],
+    "chat_messages": ["room_id_1_version_1", "room_id_1_created_at_-1", "room_id_1_created_at_1_id_1"],
+    "help_requests": [
+        "school_id_1_version_1", "school_id_1_created_at_-1", "user_id_1_created_at_-1", "school_id_1_created_at_1_id_1",
+    ],
+    "help_responses": ["id_1", "request_id_1_created_at_1"],
+    "chat_message_buckets": ["room_id_1_day_1", "room_id_1_start_-1"],
+}
+
+
+def drop_unpartitioned_indexes(db):
+    dropped = []
+    for name, indexes in UNPARTITIONED_INDEXES.items():
+        existing = db[name].index_information()
+        for index in indexes:
+            if index in existing:
+                db[name].drop_index(index)
+                dropped.append(f"{name}.{index}")
+    return {"dropped": dropped}
+
+
+MIGRATIONS = {
+    "split_help_responses": split_help_responses,
+    "backfill_sync_versions": backfill_sync_versions,
+    "backfill_partition_keys": backfill_partition_keys,
+    "drop_unpartitioned_indexes": drop_unpartitioned_indexes,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in MIGRATIONS:
+        print(f"Usage: python migrations.py [{'|'.join(MIGRATIONS)}]")
+        sys.exit(1)
+
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
+    database = pymongo.MongoClient(mongo_url).school_connect
+    result = MIGRATIONS[sys.argv[1]](database)
+    print(f"{sys.argv[1]}: {result}")
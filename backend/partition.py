@@ -0,0 +1,171 @@
+"""School/district partitioning.
+
+Every school-owned document carries a partition key ``pk`` of the form
+``<district slug>:<school id>``, e.g. ``plano-isd:plano_east``. Schools
+without a district (most colleges) use ``independent``. Child documents
+inherit their parent's key:
+
+- users and help requests take the key of their school
+- help responses take the key of their request
+- chat rooms take the key of their school or, for group rooms, of their creator
+- chat messages and archive buckets take the key of their room
+
+The hot indexes start with ``pk``, and so do the shard keys in
+``SHARD_KEYS``. A query that includes ``pk`` is therefore sent to one shard.
+A school's documents sort together and a district's schools are adjacent,
+so one zone range covers a whole district (``district_range``).
+``sharding.py`` applies the zone configuration.
+
+Routes learn a document's key from ``PartitionRouter``. Keys for school
+ids come from the school catalog without a query. Keys for user, room
+and help request ids take one id lookup, and are then cached, since
+documents never move between schools.
+
+Sync versions (``VersionClock``) come from the clock, not from a shared
+counter document. A counter would be one hot document on one shard that
+every write in every partition waits on.
+
+Routing is off by default, so an upgrade never hides documents written
+before ``pk`` existed. New deployments set ``PARTITION_ROUTING=1`` from the
+start. Migrating an existing database:
+
+1. Deploy as is (``PARTITION_ROUTING=0``). New documents get ``pk`` but
+   reads do not filter on it.
+2. Run ``python migrations.py backfill_partition_keys``.
+3. Switch to ``PARTITION_ROUTING=1`` and run
+   ``python migrations.py drop_unpartitioned_indexes``.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+PARTITION_ROUTING = os.environ.get('PARTITION_ROUTING', '0') == '1'
+ROUTING_CACHE_SIZE = int(os.environ.get('ROUTING_CACHE_SIZE', '100000'))
+# Allowed clock skew between app servers, plus the longest a write may take to commit
+VERSION_SAFETY_MS = int(os.environ.get('VERSION_SAFETY_MS', '5000'))
+INDEPENDENT = "independent"
+UNASSIGNED = "unassigned"
+
+# Shard key per collection; each is also created as an index by ensure_indexes
+SHARD_KEYS = {
+    "users": [("pk", 1), ("id", 1)],
+    "chat_rooms": [("pk", 1), ("id", 1)],
+    "chat_messages": [("pk", 1), ("room_id", 1), ("created_at", 1), ("id", 1)],
+    "chat_message_buckets": [("pk", 1), ("room_id", 1), ("day", 1)],
+    "help_requests": [("pk", 1), ("id", 1)],
+    "help_responses": [("pk", 1), ("id", 1)],
+}
+
+
+def slug(text: Optional[str]) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-")
+
+
+def partition_key(school_id: Optional[str], district: Optional[str] = None) -> str:
+    if not school_id:
+        return f"{UNASSIGNED}:"
+    return f"{slug(district) or INDEPENDENT}:{school_id}"
+
+
+def district_range(district: Optional[str]) -> Tuple[str, str]:
+    # [min, max) over pk values of every school in the district; ";" sorts right after ":"
+    prefix = slug(district) or INDEPENDENT
+    return f"{prefix}:", f"{prefix};"
+
+
+def scoped(pk: Optional[str], query: Dict[str, Any]) -> Dict[str, Any]:
+    # Adds the partition to a filter; an unknown partition (None) leaves it untargeted
+    if pk is None or not PARTITION_ROUTING:
+        return query
+    return {"pk": pk, **query}
+
+
+def scoped_any(pks: Iterable[Optional[str]], query: Dict[str, Any]) -> Dict[str, Any]:
+    # Targets the shards of several partitions, e.g. all rooms a user belongs to
+    pks = set(pks)
+    if not pks or None in pks or not PARTITION_ROUTING:
+        return query
+    return {"pk": next(iter(pks)) if len(pks) == 1 else {"$in": sorted(pks)}, **query}
+
+
+class VersionClock:
+    # Microseconds since the epoch, strictly increasing within the process.
+    # Versions from different processes may interleave by up to the clock skew,
+    # so readers only trust versions older than VERSION_SAFETY_MS (see settled()).
+    def __init__(self, safety_ms: int = VERSION_SAFETY_MS):
+        self.safety_us = safety_ms * 1000
+        self.last = 0
+        self.lock = threading.Lock()
+
+    def next(self) -> int:
+        with self.lock:
+            self.last = max(self.last + 1, time.time_ns() // 1000)
+            return self.last
+
+    def settled(self) -> int:
+        # Every version at or below this one has been allocated, and its write committed
+        return time.time_ns() // 1000 - self.safety_us
+
+
+class PartitionRouter:
+    def __init__(self, get_db: Callable[[], Any], district_of: Callable[[str], Optional[str]],
+                 cache_size: int = ROUTING_CACHE_SIZE):
+        # A getter, so the router follows the app when it is pointed at another database
+        self.get_db = get_db
+        self.district_of = district_of
+        self.cache_size = cache_size
+        self.caches: Dict[str, "OrderedDict[str, str]"] = {
+            "users": OrderedDict(), "chat_rooms": OrderedDict(), "help_requests": OrderedDict(),
+        }
+        self.counts = {"hits": 0, "lookups": 0}
+
+    def for_school(self, school_id: Optional[str]) -> str:
+        return partition_key(school_id, self.district_of(school_id) if school_id else None)
+
+    def remember(self, collection: str, doc_id: str, pk: Optional[str]):
+        if pk is None:
+            return
+        cache = self.caches[collection]
+        cache[doc_id] = pk
+        cache.move_to_end(doc_id)
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _lookup(self, collection: str, doc_id: str) -> Optional[str]:
+        cache = self.caches[collection]
+        pk = cache.get(doc_id)
+        if pk is not None:
+            cache.move_to_end(doc_id)
+            self.counts["hits"] += 1
+            return pk
+        # The one untargeted read: by id, projected to the routing fields
+        self.counts["lookups"] += 1
+        doc = self.get_db()[collection].find_one({"id": doc_id}, {"_id": 0, "pk": 1, "school_id": 1, "created_by": 1})
+        if doc is None:
+            return None
+        pk = doc.get("pk")
+        if pk is None and doc.get("school_id"):
+            pk = self.for_school(doc["school_id"])
+        elif pk is None and doc.get("created_by"):
+            pk = self.user(doc["created_by"])
+        self.remember(collection, doc_id, pk)
+        return pk
+
+    def user(self, user_id: str) -> Optional[str]:
+        return self._lookup("users", user_id)
+
+    def room(self, room_id: str) -> Optional[str]:
+        return self._lookup("chat_rooms", room_id)
+
+    def help_request(self, request_id: str) -> Optional[str]:
+        return self._lookup("help_requests", request_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "routing": PARTITION_ROUTING,
+            **{f"cached_{name}": len(cache) for name, cache in self.caches.items()},
+            **self.counts,
+        }
@@ -0,0 +1,181 @@
+"""Room presence and typing indicators with heartbeat expiry.
+
+Every chat socket is registered here on connect. Any frame the client
+sends counts as a heartbeat. Expiry uses one hashed timer wheel shared by
+all connections: scheduling, rescheduling and cancelling are O(1), and a
+single background loop advances the wheel. There is no timer task per
+user.
+
+Changes are not sent as they happen. Each room collects the users whose
+state changed since the last flush, and ``flush`` turns them into at most
+one diffed event per room. A join and a leave inside one flush interval
+cancel out and send nothing.
+"""
+import math
+import os
+import time
+from typing import Any, Dict, Hashable, List, Set, Tuple
+
+PRESENCE_TIMEOUT_SECONDS = float(os.environ.get('PRESENCE_TIMEOUT_SECONDS', '45'))
+PRESENCE_FLUSH_SECONDS = float(os.environ.get('PRESENCE_FLUSH_SECONDS', '1'))
+TYPING_TIMEOUT_SECONDS = 6.0
+TYPING_THROTTLE_SECONDS = 2.0
+
+
+class TimerWheel:
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 512, now: float = None):
+        self.tick_seconds = tick_seconds
+        # Each slot maps key -> full turns of the wheel still to wait
+        self.slots: List[Dict[Hashable, int]] = [{} for _ in range(slots)]
+        self.slot_of: Dict[Hashable, int] = {}
+        self.cursor = 0
+        self.last_tick = time.monotonic() if now is None else now
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def schedule(self, key: Hashable, delay: float):
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.tick_seconds))
+        slot = (self.cursor + ticks) % len(self.slots)
+        self.slots[slot][key] = (ticks - 1) // len(self.slots)
+        self.slot_of[key] = slot
+
+    def cancel(self, key: Hashable):
+        slot = self.slot_of.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def advance(self, now: float = None) -> List[Hashable]:
+        now = time.monotonic() if now is None else now
+        steps = int((now - self.last_tick) / self.tick_seconds)
+        self.last_tick += steps * self.tick_seconds
+        expired = []
+        for _ in range(steps):
+            self.cursor = (self.cursor + 1) % len(self.slots)
+            bucket = self.slots[self.cursor]
+            for key, turns in list(bucket.items()):
+                if turns:
+                    bucket[key] = turns - 1
+                else:
+                    del bucket[key]
+                    del self.slot_of[key]
+                    expired.append(key)
+        return expired
+
+
+class PresenceService:
+    def __init__(self, timeout: float = PRESENCE_TIMEOUT_SECONDS, wheel: TimerWheel = None):
+        self.timeout = timeout
+        self.wheel = wheel if wheel is not None else TimerWheel()
+        # connection -> (room_id, user_id); a user is online in a room while any connection is
+        self.connections: Dict[Hashable, Tuple[str, str]] = {}
+        self.online: Dict[str, Dict[str, Set[Hashable]]] = {}
+        self.typing_users: Dict[str, Dict[str, float]] = {}
+        # What clients were last told, and who changed since
+        self._announced_online: Dict[str, Set[str]] = {}
+        self._changed: Dict[str, Set[str]] = {}
+        self._typing_changed: Set[str] = set()
+
+    def connect(self, connection: Hashable, room_id: str, user_id: str):
+        self.connections[connection] = (room_id, user_id)
+        self.online.setdefault(room_id, {}).setdefault(user_id, set()).add(connection)
+        self.wheel.schedule(connection, self.timeout)
+        self._changed.setdefault(room_id, set()).add(user_id)
+
+    def heartbeat(self, connection: Hashable):
+        if connection in self.connections:
+            self.wheel.schedule(connection, self.timeout)
+
+    def disconnect(self, connection: Hashable):
+        entry = self.connections.pop(connection, None)
+        if entry is None:
+            return
+        room_id, user_id = entry
+        self.wheel.cancel(connection)
+        room = self.online[room_id]
+        room[user_id].discard(connection)
+        if not room[user_id]:
+            del room[user_id]
+            self.typing(room_id, user_id, False)
+            if not room:
+                del self.online[room_id]
+        self._changed.setdefault(room_id, set()).add(user_id)
+
+    def typing(self, room_id: str, user_id: str, is_typing: bool, now: float = None):
+        now = time.monotonic() if now is None else now
+        room = self.typing_users.setdefault(room_id, {})
+        key = ("typing", room_id, user_id)
+        if is_typing:
+            last = room.get(user_id)
+            # Repeated keystroke frames only extend the indicator, at most every few seconds
+            if last is not None and now - last < TYPING_THROTTLE_SECONDS:
+                return
+            room[user_id] = now
+            self.wheel.schedule(key, TYPING_TIMEOUT_SECONDS)
+            if last is None:
+                self._typing_changed.add(room_id)
+        elif room.pop(user_id, None) is not None:
+            self.wheel.cancel(key)
+            self._typing_changed.add(room_id)
+        if not room:
+            del self.typing_users[room_id]
+
+    def expire(self, now: float = None) -> List[Tuple[Hashable, str, str]]:
+        # Connections that missed their heartbeat, as (connection, room_id, user_id)
+        stale = []
+        for key in self.wheel.advance(now):
+            if isinstance(key, tuple) and key[0] == "typing":
+                self.typing(key[1], key[2], False)
+                continue
+            room_id, user_id = self.connections[key]
+            stale.append((key, room_id, user_id))
+            self.disconnect(key)
+        return stale
+
+    def flush(self) -> Dict[str, Dict[str, Any]]:
+        events = {}
+        for room_id in self._changed.keys() | self._typing_changed:
+            online = self.online.get(room_id, {})
+            announced = self._announced_online.setdefault(room_id, set())
+            joined, left = [], []
+            for user_id in self._changed.get(room_id, ()):
+                if user_id in online and user_id not in announced:
+                    joined.append(user_id)
+                    announced.add(user_id)
+                elif user_id not in online and user_id in announced:
+                    left.append(user_id)
+                    announced.discard(user_id)
+            if not announced:
+                del self._announced_online[room_id]
+            if joined or left or room_id in self._typing_changed:
+                events[room_id] = {
+                    "type": "presence",
+                    "room_id": room_id,
+                    "online_count": len(online),
+                    "joined": joined,
+                    "left": left,
+                    "typing": list(self.typing_users.get(room_id, {})),
+                }
+        self._changed.clear()
+        self._typing_changed.clear()
+        return events
+
+    def online_count(self, room_id: str) -> int:
+        return len(self.online.get(room_id, ()))
+
+    def snapshot(self, room_id: str) -> Dict[str, Any]:
+        online = self.online.get(room_id, {})
+        return {
+            "room_id": room_id,
+            "online_count": len(online),
+            "online": list(online),
+            "typing": list(self.typing_users.get(room_id, {})),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections": len(self.connections),
+            "rooms": len(self.online),
+            "timers": len(self.wheel),
+        }
@@ -0,0 +1,204 @@
+"""Opt-in per-request Mongo query tracing and N+1 detection.
+
+With ``QUERY_TRACE=1`` every HTTP request is traced. With
+``QUERY_TRACE=header``, only requests that send ``X-Query-Trace: 1`` are
+traced. For a traced request, every Mongo command issued while it is handled
+is recorded with its duration and *shape*: the command, the collection and
+the filter with its values blanked out. The response gets ``X-Request-ID``,
+``X-Query-Count`` and ``Server-Timing`` headers. A structured log line is
+written, and a warning is logged when one shape repeats more than
+``QUERY_TRACE_REPEAT_THRESHOLD`` times.
+
+The headers are sent before the body. For a streamed response (the NDJSON
+and CSV exports) they only count the queries issued before the first
+chunk. The log line has the final count, plus ``queries_at_headers``
+when the two differ.
+
+Tests can bound an endpoint's query count with ``assert_max_queries`` (for
+in-process calls) or ``assert_response_max_queries`` (for responses from a
+test client).
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger("query_trace")
+
+QUERY_TRACE = os.environ.get('QUERY_TRACE', '0')
+QUERY_TRACE_REPEAT_THRESHOLD = int(os.environ.get('QUERY_TRACE_REPEAT_THRESHOLD', '5'))
+
+# Where each command keeps its filter
+FILTER_FIELDS = {
+    "find": lambda c: c.get("filter"),
+    "count": lambda c: c.get("query"),
+    "distinct": lambda c: c.get("query"),
+    "findAndModify": lambda c: c.get("query"),
+    "update": lambda c: (c.get("updates") or [{}])[0].get("q"),
+    "delete": lambda c: (c.get("deletes") or [{}])[0].get("q"),
+    "aggregate": lambda c: c.get("pipeline"),
+}
+
+_current_trace: ContextVar[Optional["QueryTrace"]] = ContextVar("query_trace", default=None)
+
+
+def _blank(value: Any) -> Any:
+    # Keep keys and operators, drop the values
+    if isinstance(value, dict):
+        return {key: _blank(item) for key, item in sorted(value.items())}
+    if isinstance(value, list):
+        return [_blank(value[0])] if value and isinstance(value[0], (dict, list)) else "?"
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> str:
+    collection = command.get(command_name)
+    if command_name == "getMore":
+        collection = command.get("collection")
+    shape = f"{command_name} {collection if isinstance(collection, str) else '-'}"
+    extract = FILTER_FIELDS.get(command_name)
+    if extract:
+        shape += " " + json.dumps(_blank(extract(command) or {}), separators=(",", ":"))
+    return shape
+
+
+class QueryTrace:
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.commands: List[Tuple[str, float]] = []
+
+    def record(self, shape: str, duration_ms: float):
+        self.commands.append((shape, duration_ms))
+
+    @property
+    def count(self) -> int:
+        return len(self.commands)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(duration for _, duration in self.commands)
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        counts = Counter(shape for shape, _ in self.commands)
+        return {shape: count for shape, count in counts.items() if count > threshold}
+
+
+class QueryTraceListener(monitoring.CommandListener):
+    # pymongo calls listeners in the thread issuing the command, so the
+    # request's context variable is visible here (asyncio.to_thread copies it)
+    def __init__(self):
+        self._inflight: Dict[Tuple[int, object], Tuple[QueryTrace, str]] = {}
+
+    def started(self, event):
+        trace = _current_trace.get()
+        if trace is not None:
+            self._inflight[(event.request_id, event.connection_id)] = (trace, command_shape(event.command_name, event.command))
+
+    def succeeded(self, event):
+        entry = self._inflight.pop((event.request_id, event.connection_id), None)
+        if entry:
+            entry[0].record(entry[1], event.duration_micros / 1000)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+class QueryTraceMiddleware:
+    def __init__(self, app, mode: str = QUERY_TRACE, repeat_threshold: int = QUERY_TRACE_REPEAT_THRESHOLD):
+        self.app = app
+        self.mode = mode
+        self.repeat_threshold = repeat_threshold
+
+    def _enabled(self, headers: Dict[bytes, bytes]) -> bool:
+        if self.mode == "1":
+            return True
+        return self.mode == "header" and headers.get(b"x-query-trace") == b"1"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode == "0":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not self._enabled(headers):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        trace = QueryTrace(request_id)
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        status = 500
+        header_count = None
+
+        async def send_wrapper(message):
+            nonlocal status, header_count
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header_count = trace.count
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode()),
+                    (b"x-query-count", str(trace.count).encode()),
+                    (b"server-timing", f'db;dur={trace.total_ms:.2f};desc="{trace.count} queries"'.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            self._log(scope, trace, status, (time.perf_counter() - start) * 1000, header_count)
+
+    def _log(self, scope, trace: QueryTrace, status: int, duration_ms: float, header_count: Optional[int] = None):
+        repeated = trace.repeated(self.repeat_threshold)
+        entry = {
+            "request_id": trace.request_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            "queries": trace.count,
+            "db_ms": round(trace.total_ms, 2),
+            "repeated": repeated,
+        }
+        if header_count is not None and header_count != trace.count:
+            # Streamed body: X-Query-Count undercounts, this log line does not
+            entry["queries_at_headers"] = header_count
+        logger.info(json.dumps(entry))
+        for shape, count in repeated.items():
+            logger.warning(f"Possible N+1 in {scope['method']} {scope['path']} ({trace.request_id}): {count}x {shape}")
+
+
+@contextmanager
+def assert_max_queries(limit: int, repeat_limit: Optional[int] = None):
+    # For code awaited directly in the test's own context
+    trace = QueryTrace("test")
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+    _check(trace.count, limit, trace.repeated(repeat_limit) if repeat_limit is not None else {}, trace.commands)
+
+
+def assert_response_max_queries(response, limit: int):
+    # For responses from a test client; the server must run with QUERY_TRACE=header or 1
+    # and the request must send X-Query-Trace: 1
+    count = response.headers.get("x-query-count")
+    if count is None:
+        raise AssertionError("Response was not traced; send X-Query-Trace: 1 with QUERY_TRACE=header")
+    _check(int(count), limit, {}, [])
+
+
+def _check(count: int, limit: int, repeated: Dict[str, int], commands: List[Tuple[str, float]]):
+    if count > limit:
+        shapes = "\n".join(f"  {shape}" for shape, _ in commands)
+        raise AssertionError(f"Expected at most {limit} queries, got {count}" + (f":\n{shapes}" if shapes else ""))
+    if repeated:
+        raise AssertionError(f"Repeated query shapes: {repeated}")
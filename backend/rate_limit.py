@@ -0,0 +1,231 @@
+"""Token-bucket rate limiting per (client, route class).
+
+Each route class has a refill rate (tokens per second) and a burst size.
+Limits can be overridden with ``RATE_LIMITS``, e.g.
+``RATE_LIMITS="chat_send=0.5/5,help_feed=2/10"``.
+
+Every limited request is charged to a bucket for the client IP (honouring
+``X-Forwarded-For`` only from ``RATE_LIMIT_TRUSTED_PROXIES``). That bucket is
+``RATE_LIMIT_IP_SCALE`` times larger, since a school network shares one
+address. A claimed user id (``X-User-Id`` or ``user_id=``) is charged to a
+second, stricter bucket on top. It can only narrow the budget, so rotating
+ids never gets a client past its IP bucket.
+
+Buckets live in process memory by default. Set ``RATE_LIMIT_BACKEND=mongo``
+to keep them in a shared ``rate_limits`` collection, so several workers
+enforce one budget. ``RateLimitMiddleware`` answers throttled requests with
+429 before any route code or database work runs.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pymongo
+
+DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+    "chat_send": (1.0, 5),
+    "help_feed": (1.0, 10),
+    "ai": (0.2, 3),
+    "upload": (0.5, 5),
+    "write": (2.0, 20),
+    "read": (10.0, 60),
+    "ws_message": (5.0, 20),
+}
+
+TRUSTED_PROXIES = set(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', '127.0.0.1,::1').split(','))
+IP_LIMIT_SCALE = float(os.environ.get('RATE_LIMIT_IP_SCALE', '10'))
+MAX_MEMORY_BUCKETS = 100_000
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, _, value = item.partition("=")
+        rate, _, burst = value.partition("/")
+        limits[name.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    # Route class for an HTTP request, or None when the path is not limited
+    if not path.startswith("/api/"):
+        return None
+    if path.startswith("/api/uploads/") and method in ("POST", "PUT"):
+        # Presigning and the local PUT target; the routes that attach files only carry keys
+        return "upload"
+    if method == "POST":
+        if path.startswith("/api/chat/rooms/") and path.endswith("/messages"):
+            return "chat_send"
+        if path in ("/api/ai-assistant", "/api/chat/ai-bot"):
+            return "ai"
+        if path.startswith("/api/gpa-calculator/batch"):
+            return "upload"
+        return "write"
+    if path == "/api/help-requests":
+        return "help_feed"
+    return "read"
+
+
+class MemoryBucketStore:
+    def __init__(self, max_buckets: int = MAX_MEMORY_BUCKETS):
+        self.max_buckets = max_buckets
+        # Least recently used first; evicting one is O(1) and forgets a (probably refilled) bucket
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def consume(self, key: str, rate: float, burst: float) -> float:
+        # Returns 0 when a token was taken, otherwise seconds until one is available
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_buckets:
+            self.buckets.popitem(last=False)
+        if allowed:
+            return 0.0
+        return (1 - tokens) / rate if rate > 0 else math.inf
+
+
+class MongoBucketStore:
+    # consume() is a network round trip; RateLimiter.check_async runs it off the event loop
+    blocking = True
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def consume(self, key: str, rate: float, burst: float) -> float:
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        # One atomic pipeline update: refill, then take a token if there is one
+        bucket = self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated": now}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": now + timedelta(seconds=(max(burst / rate, 1) * 2) if rate > 0 else 3600),
+                }},
+            ],
+            projection={"_id": 0, "allowed": 1, "tokens": 1},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / rate if rate > 0 else math.inf
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, Tuple[float, float]] = None, store=None):
+        self.limits = limits or dict(DEFAULT_LIMITS)
+        self.store = store or MemoryBucketStore()
+        self.throttled: Counter = Counter()
+        self.allowed: Counter = Counter()
+
+    def ensure_indexes(self):
+        if hasattr(self.store, "ensure_indexes"):
+            self.store.ensure_indexes()
+
+    def check(self, identity: str, route_class: str, scale: float = 1.0) -> float:
+        # 0 when allowed, otherwise the Retry-After delay in seconds
+        limit = self.limits.get(route_class)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        retry_after = self.store.consume(f"{identity}:{route_class}", rate * scale, burst * scale)
+        if retry_after:
+            self.throttled[route_class] += 1
+        else:
+            self.allowed[route_class] += 1
+        return retry_after
+
+    async def check_async(self, identity: str, route_class: str, scale: float = 1.0) -> float:
+        # Memory buckets are cheaper than a thread hop, so only a blocking store goes to a thread
+        if getattr(self.store, "blocking", False):
+            return await asyncio.to_thread(self.check, identity, route_class, scale)
+        return self.check(identity, route_class, scale)
+
+    def stats(self):
+        return {
+            "limits": {name: {"rate": rate, "burst": burst} for name, (rate, burst) in self.limits.items()},
+            "allowed": dict(self.allowed),
+            "throttled": dict(self.throttled),
+        }
+
+
+def client_ip(scope, headers: Dict[bytes, bytes]) -> str:
+    client = scope.get("client")
+    host = client[0] if client else "unknown"
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded and host in TRUSTED_PROXIES:
+        # Walk back from the nearest hop; the first untrusted address is the client
+        for hop in reversed([hop.strip() for hop in forwarded.decode("latin-1").split(",") if hop.strip()]):
+            host = hop
+            if hop not in TRUSTED_PROXIES:
+                break
+    return host
+
+
+def client_identities(scope) -> List[Tuple[str, float]]:
+    # (bucket identity, limit scale): always the IP, plus the claimed user id if any
+    headers = dict(scope.get("headers") or [])
+    identities = [("ip:" + client_ip(scope, headers), IP_LIMIT_SCALE)]
+    user_id = headers.get(b"x-user-id")
+    if not user_id:
+        for part in (scope.get("query_string") or b"").split(b"&"):
+            if part.startswith(b"user_id=") and len(part) > 8:
+                user_id = part[8:]
+                break
+    if user_id:
+        identities.append(("user:" + user_id.decode("latin-1"), 1.0))
+    return identities
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        route_class = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = 0.0
+        for identity, scale in client_identities(scope):
+            retry_after = await self.limiter.check_async(identity, route_class, scale)
+            if retry_after:
+                break
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        body = b'{"detail":"Too many requests"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(min(retry_after, 3600)))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def limiter_from_env(db=None) -> RateLimiter:
+    limits = parse_limits(os.environ.get('RATE_LIMITS', ''))
+    if os.environ.get('RATE_LIMIT_BACKEND', 'memory') == 'mongo' and db is not None:
+        return RateLimiter(limits, MongoBucketStore(db.rate_limits))
+    return RateLimiter(limits)
@@ -0,0 +1,132 @@
+"""Precomputed responses for read-mostly GET routes.
+
+A route registered with ``ResponseCache.register`` has its payload
+serialized and compressed once, and again whenever ``refresh`` is called
+after the underlying data changes. ``ResponseCacheMiddleware`` then answers
+matching requests straight from memory. It sets a strong ETag, answers
+``If-None-Match`` with 304, picks brotli or gzip from ``Accept-Encoding``,
+and sets a per-route ``Cache-Control``.
+"""
+import gzip
+import hashlib
+import json
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+MIN_COMPRESS_SIZE = 512
+
+
+class CachedPayload:
+    def __init__(self, body: bytes, cache_control: str):
+        self.body = body
+        self.cache_control = cache_control
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.encoded: Dict[str, bytes] = {}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.encoded["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(body, quality=11)
+
+
+class ResponseCache:
+    def __init__(self, serializer: Callable[[Any], bytes] = None):
+        self.serializer = serializer or (lambda content: json.dumps(content, separators=(",", ":")).encode())
+        self._builders: Dict[str, Callable[[], Any]] = {}
+        self._cache_control: Dict[str, str] = {}
+        self._payloads: Dict[str, CachedPayload] = {}
+
+    def register(self, path: str, builder: Callable[[], Any], cache_control: str = "public, max-age=300"):
+        self._builders[path] = builder
+        self._cache_control[path] = cache_control
+        self._payloads.pop(path, None)
+
+    def refresh(self, path: str = None):
+        # Rebuild one route (or all of them) after its data changed
+        for route in ([path] if path else list(self._builders)):
+            body = self.serializer(self._builders[route]())
+            self._payloads[route] = CachedPayload(body, self._cache_control[route])
+
+    def get(self, path: str) -> Optional[CachedPayload]:
+        if path not in self._builders:
+            return None
+        if path not in self._payloads:
+            self.refresh(path)
+        return self._payloads[path]
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison function
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _accepted_encodings(accept_encoding: str):
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class ResponseCacheMiddleware:
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        payload = self.cache.get(scope["path"])
+        if payload is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = [
+            (b"etag", payload.etag.encode()),
+            (b"cache-control", payload.cache_control.encode()),
+            (b"vary", b"Accept-Encoding"),
+        ]
+
+        if _etag_matches(_header(scope, b"if-none-match"), payload.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        body = payload.body
+        accepted = _accepted_encodings(_header(scope, b"accept-encoding"))
+        for coding in ("br", "gzip"):
+            if coding in payload.encoded and coding in accepted:
+                body = payload.encoded[coding]
+                headers.append((b"content-encoding", coding.encode()))
+                break
+
+        headers += [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
@@ -0,0 +1,106 @@
+"""Chat session resume: replay the messages a reconnecting client missed.
+
+Each chat broadcast frame is also appended to a bounded ring buffer per
+room. A client reconnects with ``?last_seen=<message id>`` and gets only
+the frames after that id, already encoded. The full history is not
+reloaded.
+
+The buffer belongs to one process. After a restart, or when a client
+lands on another worker, the room's buffer is primed once from the
+latest messages in Mongo. Every other client reconnecting to that room
+is then served from memory, which keeps a post-deploy reconnect storm
+to one query per room. An id older than the buffer falls back to an
+indexed range read (see ``export.room_messages``), capped at
+``REPLAY_MAX_MESSAGES``. Beyond that cap the client is told to reset
+and reload the room.
+
+``RECONNECT_HINT`` is sent to every chat socket. Clients back off with
+full jitter between ``base_ms`` and ``max_ms``. After a 1012 (service
+restart) close, they wait a random delay up to ``restart_spread_ms``
+before the first attempt, so a deploy does not bring every client back
+in the same instant.
+"""
+import os
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+REPLAY_BUFFER_SIZE = int(os.environ.get('REPLAY_BUFFER_SIZE', '200'))
+REPLAY_MAX_ROOMS = int(os.environ.get('REPLAY_MAX_ROOMS', '5000'))
+REPLAY_MAX_MESSAGES = int(os.environ.get('REPLAY_MAX_MESSAGES', '500'))
+
+RECONNECT_HINT = {
+    "base_ms": int(os.environ.get('RECONNECT_BASE_MS', '500')),
+    "max_ms": int(os.environ.get('RECONNECT_MAX_MS', '30000')),
+    "restart_spread_ms": int(os.environ.get('RECONNECT_RESTART_SPREAD_MS', '10000')),
+}
+# Close code sent to chat sockets on shutdown (RFC 6455 "service restart")
+SERVICE_RESTART = 1012
+
+Entry = Tuple[str, str]
+
+
+class ReplayBuffer:
+    def __init__(self, capacity: int = REPLAY_BUFFER_SIZE, max_rooms: int = REPLAY_MAX_ROOMS):
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        # room_id -> (message_id, encoded frame), least recently used room first
+        self.rooms: "OrderedDict[str, Deque[Entry]]" = OrderedDict()
+        # Rooms whose buffer was filled from Mongo, so a miss means "older than the buffer"
+        self.primed = set()
+        self.counts = {"buffer": 0, "primed": 0}
+
+    def _room(self, room_id: str) -> Deque[Entry]:
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = deque(maxlen=self.capacity)
+            while len(self.rooms) > self.max_rooms:
+                evicted, _ = self.rooms.popitem(last=False)
+                self.primed.discard(evicted)
+        else:
+            self.rooms.move_to_end(room_id)
+        return room
+
+    def append(self, room_id: str, message_id: str, frame: str):
+        # A retried broadcast appends the same message again; keep the first copy
+        room = self._room(room_id)
+        if any(entry_id == message_id for entry_id, _ in room):
+            return
+        room.append((message_id, frame))
+
+    def prime(self, room_id: str, entries: List[Entry]):
+        # Entries oldest first; frames broadcast before priming are kept after them
+        known = {message_id for message_id, _ in entries}
+        room = self._room(room_id)
+        newer = [entry for entry in room if entry[0] not in known]
+        room.clear()
+        room.extend(entries[-self.capacity:])
+        room.extend(newer)
+        self.primed.add(room_id)
+        self.counts["primed"] += 1
+
+    def is_primed(self, room_id: str) -> bool:
+        return room_id in self.primed
+
+    def since(self, room_id: str, message_id: str) -> Optional[List[str]]:
+        # Frames after message_id, or None when it is not in the buffer
+        room = self.rooms.get(room_id)
+        if not room:
+            return None
+        frames = []
+        for entry_id, frame in reversed(room):
+            if entry_id == message_id:
+                self.rooms.move_to_end(room_id)
+                self.counts["buffer"] += 1
+                frames.reverse()
+                return frames
+            frames.append(frame)
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "rooms": len(self.rooms),
+            "primed_rooms": len(self.primed),
+            "buffered_messages": sum(len(room) for room in self.rooms.values()),
+            "buffer_hits": self.counts["buffer"],
+            "primes": self.counts["primed"],
+        }
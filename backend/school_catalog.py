@@ -0,0 +1,174 @@
+"""In-memory school catalog with id/district/city lookups and prefix search.
+
+The catalog is loaded from a JSON or CSV file named by ``SCHOOL_CATALOG_PATH``.
+Without that setting, the built-in ``TEXAS_SCHOOLS`` list is used.
+
+JSON files may use the ``{"high_schools": [...], "colleges": [...]}`` shape
+served by ``/api/schools``, or a flat list of schools that each have a
+``school_type``. CSV files need the columns
+``id,name,school_type,city`` and may add ``district``, ``type`` and ``mascot``.
+"""
+import csv
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+SCHOOL_TYPE_GROUPS = {"high_school": "high_schools", "college": "colleges"}
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.entries: List[int] = []
+
+
+class _Trie:
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, key: str, index: int):
+        # Every node on the key's path records the entry, so a prefix lookup is one walk.
+        # Entries are inserted in name order, so each node's list is already ranked.
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            if not node.entries or node.entries[-1] != index:
+                node.entries.append(index)
+
+    def lookup(self, prefix: str) -> List[int]:
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.entries
+
+
+class _SearchIndex:
+    def __init__(self, catalog: "SchoolCatalog", indexes: List[int]):
+        self.full_name = _Trie()  # whole normalized name
+        self.name = _Trie()       # name tokens
+        self.any = _Trie()        # name, city, district and id tokens
+        for index in indexes:
+            self.full_name.insert(catalog._sort_names[index], index)
+            for token in catalog._name_tokens[index]:
+                self.name.insert(token, index)
+            for token in catalog._all_tokens[index]:
+                self.any.insert(token, index)
+
+
+class SchoolCatalog:
+    def __init__(self, schools: List[Dict[str, Any]]):
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_district: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_city: Dict[str, List[Dict[str, Any]]] = {}
+
+        # Keep schools in name order so trie entry lists come out ranked
+        self.schools = sorted(schools, key=lambda school: " ".join(tokenize(school["name"])))
+        self._sort_names: List[str] = []
+        self._name_tokens: List[List[str]] = []
+        self._all_tokens: List[List[str]] = []
+        by_type: Dict[str, List[int]] = {}
+
+        for index, school in enumerate(self.schools):
+            self.by_id[school["id"]] = school
+            if school.get("district"):
+                self.by_district.setdefault(school["district"].lower(), []).append(school)
+            if school.get("city"):
+                self.by_city.setdefault(school["city"].lower(), []).append(school)
+            by_type.setdefault(school.get("school_type"), []).append(index)
+
+            name_tokens = tokenize(school["name"])
+            self._name_tokens.append(name_tokens)
+            self._sort_names.append(" ".join(name_tokens))
+            other_tokens = tokenize(school.get("city")) + tokenize(school.get("district")) + tokenize(school["id"])
+            self._all_tokens.append(list(dict.fromkeys(name_tokens + other_tokens)))
+
+        # One index over everything plus one per school type, so filtered searches stay cheap
+        self._indexes: Dict[Optional[str], _SearchIndex] = {None: _SearchIndex(self, list(range(len(self.schools))))}
+        for school_type, indexes in by_type.items():
+            if school_type:
+                self._indexes[school_type] = _SearchIndex(self, indexes)
+
+    @classmethod
+    def from_grouped(cls, grouped: Dict[str, List[Dict[str, Any]]]) -> "SchoolCatalog":
+        schools = []
+        for school_type, group in SCHOOL_TYPE_GROUPS.items():
+            for school in grouped.get(group, []):
+                schools.append({**school, "school_type": school_type})
+        return cls(schools)
+
+    @classmethod
+    def load(cls, path: str) -> "SchoolCatalog":
+        path = Path(path)
+        if path.suffix.lower() == ".csv":
+            with open(path, newline="", encoding="utf-8") as f:
+                schools = [{key: value for key, value in row.items() if value} for row in csv.DictReader(f)]
+            return cls(schools)
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return cls.from_grouped(data)
+        return cls(data)
+
+    def get(self, school_id: str) -> Optional[Dict[str, Any]]:
+        return self.by_id.get(school_id)
+
+    def grouped(self) -> Dict[str, List[Dict[str, Any]]]:
+        result = {group: [] for group in SCHOOL_TYPE_GROUPS.values()}
+        for school in self.schools:
+            group = SCHOOL_TYPE_GROUPS.get(school.get("school_type"))
+            if group:
+                result[group].append({key: value for key, value in school.items() if key != "school_type"})
+        return result
+
+    @staticmethod
+    def _covers(tokens: List[str], query_tokens: List[str]) -> bool:
+        return all(any(token.startswith(q) for token in tokens) for q in query_tokens)
+
+    def search(self, query: str, school_type: str = None, limit: int = 10, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        # Ranking tiers: name starts with the query, then every query token prefixes
+        # a name token, then matches through city, district or id. Ties are broken
+        # by name, which is the order the trie lists are stored in.
+        query_tokens = tokenize(query)
+        index = self._indexes.get(school_type)
+        if not query_tokens or index is None:
+            return 0, []
+
+        any_lists = [index.any.lookup(token) for token in query_tokens]
+        if len(query_tokens) == 1:
+            total = len(any_lists[0])
+        else:
+            matches = set(min(any_lists, key=len))
+            for entries in sorted(any_lists, key=len)[1:]:
+                matches.intersection_update(entries)
+            total = len(matches)
+
+        name_lists = [index.name.lookup(token) for token in query_tokens]
+        tiers = [
+            (index.full_name.lookup(" ".join(query_tokens)), None),
+            (min(name_lists, key=len), self._name_tokens),
+            (min(any_lists, key=len), self._all_tokens),
+        ]
+
+        needed = offset + limit
+        ranked: List[int] = []
+        seen: Set[int] = set()
+        for entries, tokens in tiers:
+            for entry in entries:
+                if len(ranked) >= needed:
+                    break
+                if entry in seen or (tokens is not None and not self._covers(tokens[entry], query_tokens)):
+                    continue
+                seen.add(entry)
+                ranked.append(entry)
+        return total, [self.schools[entry] for entry in ranked[offset:needed]]
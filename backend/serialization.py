@@ -0,0 +1,40 @@
+"""Fast JSON encoding shared by HTTP responses and WebSocket frames.
+
+orjson serializes datetime, date and UUID natively (naive datetimes keep the
+``isoformat()`` form clients already parse). ObjectId and sets are handled by
+``_default``. Routes that return ``FastJSONResponse`` directly also skip
+FastAPI's ``jsonable_encoder`` walk.
+"""
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+def dumps_text(content: Any) -> str:
+    # WebSocket clients parse text frames
+    return dumps(content).decode()
+
+
+def loads(data: Any) -> Any:
+    return orjson.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
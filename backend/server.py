@@ -1,48 +1,97 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, FastAPI, HTTPException, Request, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from collections import Counter
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, ClassVar, Set, Tuple, Type
 import pymongo
 import os
 import uuid
-import json
 from datetime import datetime, timedelta
-import shutil
+from itertools import islice
 from pathlib import Path
 import asyncio
-from openai import OpenAI
-import socketio
+import base64
+import time
 
-# Database setup
+import archive
+import citations
+import export
+import gpa
+import jobs
+import metrics
+import partition
+import presence
+import query_trace
+import resume
+import storage
+from rate_limit import RateLimitMiddleware, limiter_from_env
+from response_cache import ResponseCache, ResponseCacheMiddleware
+from school_catalog import SchoolCatalog
+from serialization import FastJSONResponse, dumps, dumps_text, loads
+
+# Database setup; connect=False defers connecting to the first command, so importing never waits on Mongo
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
-client = pymongo.MongoClient(MONGO_URL)
+MONGO_TIMEOUT_MS = int(os.environ.get('MONGO_TIMEOUT_MS', '5000'))
+client = pymongo.MongoClient(
+    MONGO_URL,
+    connect=False,
+    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+    event_listeners=[metrics.MongoCommandMetrics(), query_trace.QueryTraceListener()]
+)
 db = client.school_connect
 
 # OpenAI setup
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
-app = FastAPI()
+@lru_cache(maxsize=1)
+def get_openai_client():
+    # The openai package is slow to import; only pay for it on the first AI request
+    if not OPENAI_API_KEY:
+        return None
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
 
-# CORS setup
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+UPLOAD_DIR = "uploads"
+
+@lru_cache(maxsize=1)
+def get_storage():
+    # Local disk by default; STORAGE_BACKEND=s3 imports boto3 on first use
+    return storage.storage_from_env(UPLOAD_DIR)
+
+router = APIRouter(default_response_class=FastJSONResponse)
+
+# Precomputed responses for read-mostly catalog routes
+response_cache = ResponseCache(serializer=dumps)
+
+# Per-client token buckets; throttled requests get a 429 before any route code runs
+rate_limiter = limiter_from_env(db)
+job_queue = jobs.queue_from_env(db)
+
+def use_database(database):
+    # Points the app at another database (benchmarks, tests), including helpers holding a collection
+    global db
+    db = database
+    if hasattr(rate_limiter.store, "collection"):
+        rate_limiter.store.collection = database.rate_limits
+    if job_queue.store is not None:
+        job_queue.store.collection = database.jobs
+metrics.register_rate_limiter(rate_limiter)
 
-# Create uploads directory
-os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Filled in by the lifespan; /readyz reports it
+startup_state: Dict[str, Any] = {"indexes": False, "error": None, "ready_seconds": None}
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, List[WebSocket]] = {}
         self.user_connections: Dict[str, WebSocket] = {}
+        # Help-feed event subscribers, by school and by user
+        self.school_subscribers: Dict[str, List[WebSocket]] = {}
+        self.user_subscribers: Dict[str, List[WebSocket]] = {}
 
     async def connect(self, websocket: WebSocket, user_id: str, room_id: str = None):
         await websocket.accept()
@@ -52,15 +101,20 @@ class ConnectionManager:
             if room_id not in self.active_connections:
                 self.active_connections[room_id] = []
             self.active_connections[room_id].append(websocket)
+            metrics.WEBSOCKET_CONNECTIONS.inc()
 
-    def disconnect(self, user_id: str, room_id: str = None):
-        if user_id in self.user_connections:
-            websocket = self.user_connections[user_id]
+    def disconnect(self, user_id: str, room_id: str = None, websocket: WebSocket = None):
+        # Pass the socket so a stale one never evicts the user's newer connection
+        websocket = websocket or self.user_connections.get(user_id)
+        if websocket is not None and self.user_connections.get(user_id) is websocket:
             del self.user_connections[user_id]
-            
-            if room_id and room_id in self.active_connections:
-                if websocket in self.active_connections[room_id]:
-                    self.active_connections[room_id].remove(websocket)
+        
+        if websocket is not None and room_id and room_id in self.active_connections:
+            if websocket in self.active_connections[room_id]:
+                self.active_connections[room_id].remove(websocket)
+                metrics.WEBSOCKET_CONNECTIONS.dec()
+            if not self.active_connections[room_id]:
+                del self.active_connections[room_id]
 
     async def send_personal_message(self, message: str, user_id: str):
         if user_id in self.user_connections:
@@ -68,10 +122,60 @@ class ConnectionManager:
 
     async def broadcast_to_room(self, message: str, room_id: str):
         if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
+            start = time.perf_counter()
+            connections = self.active_connections[room_id]
+            for connection in list(connections):
+                try:
+                    await connection.send_text(message)
+                except Exception:
+                    # Dead socket; presence expiry or its receive loop removes it
+                    pass
+            metrics.BROADCAST_FANOUT.labels("room").observe(len(connections))
+            metrics.BROADCAST_SECONDS.labels("room").observe(time.perf_counter() - start)
+
+    async def subscribe(self, websocket: WebSocket, user_id: str, school_id: str):
+        await websocket.accept()
+        self.school_subscribers.setdefault(school_id, []).append(websocket)
+        self.user_subscribers.setdefault(user_id, []).append(websocket)
+
+    def unsubscribe(self, websocket: WebSocket, user_id: str, school_id: str):
+        for subscribers, key in ((self.school_subscribers, school_id), (self.user_subscribers, user_id)):
+            connections = subscribers.get(key)
+            if connections and websocket in connections:
+                connections.remove(websocket)
+                if not connections:
+                    del subscribers[key]
+
+    async def publish(self, message: str, school_id: str = None, user_ids: List[str] = ()):
+        # Each socket receives the event once, even if it matches both the school and a user
+        targets = list(self.school_subscribers.get(school_id, [])) if school_id else []
+        for user_id in user_ids:
+            for connection in self.user_subscribers.get(user_id, []):
+                if connection not in targets:
+                    targets.append(connection)
+        
+        start = time.perf_counter()
+        for connection in targets:
+            try:
                 await connection.send_text(message)
+            except Exception:
+                # Dead socket; it is removed when its receive loop exits
+                pass
+        metrics.BROADCAST_FANOUT.labels("help_event").observe(len(targets))
+        metrics.BROADCAST_SECONDS.labels("help_event").observe(time.perf_counter() - start)
+
+    async def close_all(self, code: int):
+        # On shutdown, so clients reconnect to the next instance with jittered backoff
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections):
+                try:
+                    await connection.close(code=code)
+                except Exception:
+                    pass
 
 manager = ConnectionManager()
+presence_service = presence.PresenceService()
+replay_buffer = resume.ReplayBuffer()
 
 # Enhanced Texas Schools Data (Saturn-inspired)
 TEXAS_SCHOOLS = {
@@ -106,6 +210,35 @@ TEXAS_SCHOOLS = {
     ]
 }
 
+ACADEMIC_RESOURCES = {
+    "summarizing_tools": [
+        {"name": "QuillBot Summarizer", "url": "https://quillbot.com/summarize", "description": "AI-powered text summarization"},
+        {"name": "SMMRY", "url": "https://smmry.com/", "description": "Automatic article summarizer"},
+        {"name": "Resoomer", "url": "https://resoomer.com/", "description": "Summarize your documents online"}
+    ],
+    "study_tools": [
+        {"name": "Khan Academy", "url": "https://khanacademy.org", "description": "Free educational content"},
+        {"name": "Coursera", "url": "https://coursera.org", "description": "Online courses from universities"},
+        {"name": "Quizlet", "url": "https://quizlet.com", "description": "Flashcards and study sets"}
+    ],
+    "ai_detection_tools": [
+        {"name": "ZeroGPT", "url": "https://zerogpt.com", "description": "AI content detection"},
+        {"name": "GPTZero", "url": "https://gptzero.me", "description": "Advanced AI detection"},
+        {"name": "Originality.ai", "url": "https://originality.ai", "description": "Plagiarism and AI detection"}
+    ],
+    "research_tools": [
+        {"name": "Google Scholar", "url": "https://scholar.google.com", "description": "Academic search engine"},
+        {"name": "JSTOR", "url": "https://jstor.org", "description": "Academic articles and books"},
+        {"name": "ResearchGate", "url": "https://researchgate.net", "description": "Academic networking platform"}
+    ]
+}
+
+# Catalog of schools students can register with; replaced at startup when SCHOOL_CATALOG_PATH is set
+SCHOOL_CATALOG_PATH = os.environ.get('SCHOOL_CATALOG_PATH')
+school_catalog = SchoolCatalog.from_grouped(TEXAS_SCHOOLS)
+# Districts are resolved through whichever catalog is loaded at the time
+partitions = partition.PartitionRouter(lambda: db, lambda school_id: (school_catalog.get(school_id) or {}).get("district"))
+
 # Pydantic Models
 class User(BaseModel):
     id: str
@@ -137,21 +270,268 @@ class ChatMessage(BaseModel):
     file_urls: List[str] = []
     created_at: datetime
 
+class HelpResponse(BaseModel):
+    id: str
+    request_id: str
+    user_id: str
+    message: str
+    file_urls: List[str] = []
+    created_at: datetime
+
 class HelpRequest(BaseModel):
     id: str
     user_id: str
+    school_id: Optional[str] = None
+    title: str
+    subject: str
+    description: str
+    image_urls: List[str] = []
+    response_count: int = 0
+    latest_response: Optional[Dict[str, Any]] = None  # preview of the newest response
+    status: str = "open"
+    created_at: datetime
+
+# Response models for read paths. Fields named in `enriched_fields` are filled in
+# from other collections or computed, so projection_for() leaves them out.
+class Classmate(BaseModel):
+    id: str
+    name: str
+    email: str
+    grade_level: str
+    shared_classes: List[str] = []
+    enriched_fields: ClassVar[Set[str]] = {"shared_classes"}
+
+class ChatRoomListItem(BaseModel):
+    id: str
+    name: str
+    type: str
+    school_id: Optional[str] = None
+    created_by: str
+    created_at: datetime
+    is_secret: bool = False
+    member_count: int = 0
+    recent_message_count: int = 0
+    online_count: int = 0
+    enriched_fields: ClassVar[Set[str]] = {"member_count", "recent_message_count", "online_count"}
+
+class ChatMessageItem(ChatMessage):
+    user_name: Optional[str] = None
+    user_email: Optional[str] = None
+    enriched_fields: ClassVar[Set[str]] = {"user_name", "user_email"}
+
+class HelpResponseItem(HelpResponse):
+    user_name: Optional[str] = None
+    user_email: Optional[str] = None
+    enriched_fields: ClassVar[Set[str]] = {"user_name", "user_email"}
+
+class HelpResponsePage(BaseModel):
+    responses: List[HelpResponseItem]
+    total: int
+    skip: int
+    limit: int
+
+class LatestResponsePreview(BaseModel):
+    id: str
+    user_id: str
+    message: str
+    created_at: datetime
+    user_name: Optional[str] = None
+
+class HelpRequestListItem(BaseModel):
+    id: str
+    user_id: str
+    school_id: Optional[str] = None
     title: str
     subject: str
     description: str
     image_urls: List[str] = []
-    responses: List[Dict[str, Any]] = []
+    response_count: int = 0
+    latest_response: Optional[LatestResponsePreview] = None
     status: str = "open"
     created_at: datetime
+    user_name: Optional[str] = None
+    user_email: Optional[str] = None
+    user_school: Optional[str] = None
+    enriched_fields: ClassVar[Set[str]] = {"user_name", "user_email", "user_school"}
+
+def projection_for(model: Type[BaseModel], **extra: Any) -> Dict[str, Any]:
+    # Read only the stored fields a response model returns
+    enriched = getattr(model, "enriched_fields", set())
+    fields = {name: 1 for name in model.model_fields if name not in enriched}
+    return {"_id": 0, **fields, **extra}
+
+# Length of the message preview kept on the help request for the latest response
+RESPONSE_PREVIEW_LENGTH = 200
+
+# Maximum number of documents per collection returned by one /api/sync call
+SYNC_BATCH_LIMIT = 500
+
+# Search page size bounds
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Chat rooms searched per request (see search())
+SEARCH_MAX_ROOMS = int(os.environ.get('SEARCH_MAX_ROOMS', '50'))
+
+def ensure_indexes():
+    # Hot indexes lead with the partition key (see partition.py); the shard keys are among them
+    for name, keys in partition.SHARD_KEYS.items():
+        db[name].create_index(keys, unique=name in ("help_responses", "chat_message_buckets"))
+    # Routing lookups resolve an id to its partition once per process
+    for name in ("users", "chat_rooms", "help_requests"):
+        db[name].create_index("id")
+    db.help_responses.create_index([("pk", 1), ("request_id", 1), ("created_at", 1)])
+    # Delta sync: every synced document carries a monotonically increasing version.
+    # Room membership spans partitions, so it is the one unprefixed hot index.
+    db.chat_rooms.create_index([("members", 1), ("version", 1)])
+    db.chat_rooms.create_index([("former_members", 1), ("version", 1)])
+    db.chat_messages.create_index([("pk", 1), ("room_id", 1), ("version", 1)])
+    db.help_requests.create_index([("pk", 1), ("version", 1)])
+    db.users.create_index([("pk", 1), ("version", 1)])
+    # A requester's help requests, newest first
+    db.help_requests.create_index([("pk", 1), ("user_id", 1), ("created_at", -1)])
+    # Presigned uploads: pending keys expire, attached ones are kept
+    db.uploads.create_index("key", unique=True)
+    db.uploads.create_index("expires_at", expireAfterSeconds=0)
+    # The school help feed and exports walk (created_at, id) in either direction;
+    # room history and the archival scan use the chat_messages shard key index the same way
+    db.help_requests.create_index([("pk", 1), ("created_at", 1), ("id", 1)])
+    archive.ensure_archive_indexes(db)
+    rate_limiter.ensure_indexes()
+    job_queue.ensure_indexes()
+    # Full-text search. Message search is scoped to a room: a text index with a prefix
+    # only reads that room's entries. A collection has one text index, so the unscoped
+    # one from earlier releases is replaced.
+    if "message_text" in db.chat_messages.index_information():
+        db.chat_messages.drop_index("message_text")
+    db.chat_messages.create_index([("room_id", 1), ("message", "text")], name="room_message_text")
+    db.help_requests.create_index(
+        [("school_id", 1), ("title", "text"), ("description", "text")],
+        weights={"title": 3, "description": 1},
+        name="school_help_text"
+    )
+
+version_clock = partition.VersionClock()
+
+def next_version() -> int:
+    return version_clock.next()
+
+def current_version() -> int:
+    return version_clock.settled()
+
+def encode_token(kind: str, *values: int) -> str:
+    raw = ":".join([kind] + [str(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_token(kind: str, token: str, size: Optional[int]) -> List[int]:
+    # size=None accepts any number of values (at least one)
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        parts = base64.urlsafe_b64decode(padded).decode().split(":")
+        if parts[0] != kind or (len(parts) != size + 1 if size is not None else len(parts) < 2):
+            raise ValueError(parts[0])
+        return [int(value) for value in parts[1:]]
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid token")
+
+def encode_sync_token(version: int) -> str:
+    return encode_token("v1", version)
+
+def decode_sync_token(token: Optional[str]) -> int:
+    return decode_token("v1", token, 1)[0] if token else 0
+
+def users_by_id(user_ids, fields=("name", "email")) -> Dict[str, Dict[str, Any]]:
+    # Authors can belong to any school, so this one batched lookup is not partition-targeted
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+    return {user["id"]: user for user in db.users.find({"id": {"$in": list(set(user_ids))}}, projection)}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global school_catalog
+    started = time.perf_counter()
+    if SCHOOL_CATALOG_PATH:
+        school_catalog = await asyncio.to_thread(SchoolCatalog.load, SCHOOL_CATALOG_PATH)
+    response_cache.register("/api/schools", lambda: school_catalog.grouped(), "public, max-age=3600")
+    response_cache.register("/api/academic-resources", lambda: ACADEMIC_RESOURCES, "public, max-age=86400")
+    response_cache.refresh()
+    job_queue.start()
+    # Serve right away; index bootstrap waits for Mongo in the background and gates /readyz
+    tasks = [asyncio.create_task(bootstrap_database(started)), asyncio.create_task(run_presence())]
+    yield
+    for task in tasks:
+        task.cancel()
+    await job_queue.stop()
+    await manager.close_all(resume.SERVICE_RESTART)
+
+async def bootstrap_database(started: float):
+    delay = 1
+    while True:
+        try:
+            await asyncio.to_thread(ensure_indexes)
+            break
+        except Exception as e:
+            startup_state["error"] = str(e)
+            print(f"Index bootstrap failed, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+    startup_state.update(indexes=True, error=None, ready_seconds=round(time.perf_counter() - started, 3))
+    print(f"Ready {startup_state['ready_seconds']}s after startup")
+    await run_archiver()
+
+async def run_archiver():
+    # Periodically compact old chat messages into per-room, per-day buckets
+    while True:
+        try:
+            result = await asyncio.to_thread(archive.archive_old_messages, db)
+            if result["messages"]:
+                print(f"Archived chat messages: {result}")
+        except Exception as e:
+            print(f"Chat archive error: {e}")
+        await asyncio.sleep(archive.ARCHIVE_INTERVAL_SECONDS)
+
+async def run_presence():
+    # One loop expires missed heartbeats and fans out batched presence diffs
+    while True:
+        await asyncio.sleep(presence.PRESENCE_FLUSH_SECONDS)
+        try:
+            for websocket, room_id, user_id in presence_service.expire():
+                manager.disconnect(user_id, room_id, websocket)
+                try:
+                    await websocket.close(code=4408)
+                except Exception:
+                    pass
+            for room_id, event in presence_service.flush().items():
+                await manager.broadcast_to_room(dumps_text(event), room_id)
+        except Exception as e:
+            print(f"Presence error: {e}")
+
+@job_queue.job("help.publish")
+async def publish_help_event(event_type: str, data: Dict[str, Any], school_id: str = None, user_ids: List[str] = ()):
+    event = {"type": event_type, "school_id": school_id, "data": data}
+    message = dumps_text(event)
+    await manager.publish(message, school_id=school_id, user_ids=user_ids)
+
+def attach_uploads(file_keys: List[str], user_id: str, kind: str) -> List[str]:
+    # Confirms presigned uploads: the key must be this user's pending upload and the object must exist
+    backend = get_storage()
+    urls = []
+    for key in file_keys:
+        upload = db.uploads.find_one({"key": key, "user_id": user_id, "kind": kind, "status": "pending"}, {"_id": 0, "key": 1})
+        size = backend.stat(key) if upload else None
+        if size is None:
+            raise HTTPException(status_code=400, detail=f"File {key} was not uploaded")
+        if size > storage.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File {key} is too large")
+        db.uploads.update_one({"key": key}, {"$set": {"status": "attached", "size": size}, "$unset": {"expires_at": ""}})
+        metrics.UPLOAD_BYTES.labels(kind).inc(size)
+        urls.append(backend.public_url(key))
+    return urls
 
 # Real OpenAI Integration
 async def get_ai_response(prompt: str, subject: str = "") -> str:
+    openai_client = get_openai_client()
     if not openai_client:
         # Fallback responses when no API key
+        metrics.AI_REQUESTS.labels("fallback").inc()
         academic_responses = [
             f"Great question about {subject}! Let me help you break this down step by step...",
             f"I can definitely help with {subject}! Here's what I suggest...",
@@ -167,6 +547,7 @@ async def get_ai_response(prompt: str, subject: str = "") -> str:
         Provide helpful, educational guidance that encourages learning and understanding rather than just giving answers.
         Be encouraging, clear, and academically appropriate."""
         
+        start = time.perf_counter()
         response = openai_client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
@@ -177,22 +558,34 @@ async def get_ai_response(prompt: str, subject: str = "") -> str:
             temperature=0.7
         )
         
+        metrics.AI_REQUEST_SECONDS.labels("ok").observe(time.perf_counter() - start)
+        metrics.AI_REQUESTS.labels("ok").inc()
         return response.choices[0].message.content
     except Exception as e:
+        metrics.AI_REQUESTS.labels("error").inc()
         print(f"OpenAI API error: {e}")
         return "I'm having trouble processing your request right now. Please try again in a moment!"
 
 # API Routes
 
-@app.get("/api/schools")
+@router.get("/api/schools")
 async def get_schools():
-    return TEXAS_SCHOOLS
+    return school_catalog.grouped()
+
+@router.get("/api/schools/search")
+async def search_schools(q: str, school_type: str = None, limit: int = 10, offset: int = 0):
+    limit = max(1, min(limit, 50))
+    offset = max(offset, 0)
+    total, schools = school_catalog.search(q, school_type=school_type, limit=limit, offset=offset)
+    return {"results": schools, "total": total, "offset": offset, "limit": limit}
 
-@app.post("/api/register")
+@router.post("/api/register")
 async def register_user(user_data: dict):
     user_id = str(uuid.uuid4())
+    pk = partitions.for_school(user_data["school_id"])
     user = {
         "id": user_id,
+        "pk": pk,
         "name": user_data["name"],
         "email": user_data["email"],
         "school_id": user_data["school_id"],
@@ -200,58 +593,57 @@ async def register_user(user_data: dict):
         "grade_level": user_data["grade_level"],
         "classes": user_data["classes"],
         "gpa": None,
-        "created_at": datetime.now()
+        "created_at": datetime.now(),
+        "version": next_version()
     }
     
     db.users.insert_one(user)
+    partitions.remember("users", user_id, pk)
     
     # Create or join school chatroom
     school_room_id = f"school_{user_data['school_id']}"
-    school_room = db.chat_rooms.find_one({"id": school_room_id})
+    school_room = db.chat_rooms.find_one(partition.scoped(pk, {"id": school_room_id}), {"_id": 1})
     
     if not school_room:
         # Create school chatroom
-        school_info = None
-        school_list = TEXAS_SCHOOLS["high_schools"] if user_data["school_type"] == "high_school" else TEXAS_SCHOOLS["colleges"]
-        for school in school_list:
-            if school["id"] == user_data["school_id"]:
-                school_info = school
-                break
+        school_info = school_catalog.get(user_data["school_id"])
         
         school_room = {
             "id": school_room_id,
+            "pk": pk,
             "name": f"{school_info['name'] if school_info else user_data['school_id']} School Chat",
             "type": "school",
             "school_id": user_data["school_id"],
             "members": [user_id],
             "created_by": user_id,
             "created_at": datetime.now(),
-            "is_secret": False
+            "is_secret": False,
+            "version": next_version()
         }
         db.chat_rooms.insert_one(school_room)
     else:
-        # Add user to existing school chatroom
-        if user_id not in school_room["members"]:
-            db.chat_rooms.update_one(
-                {"id": school_room_id},
-                {"$push": {"members": user_id}}
-            )
+        # Add user to existing school chatroom without reading the member list
+        db.chat_rooms.update_one(
+            partition.scoped(pk, {"id": school_room_id, "members": {"$ne": user_id}}),
+            {"$push": {"members": user_id}, "$set": {"version": next_version()}}
+        )
     
     return {"message": "User registered successfully", "user_id": user_id}
 
-@app.get("/api/classmates/{user_id}")
+@router.get("/api/classmates/{user_id}", response_model=List[Classmate])
 async def get_classmates(user_id: str):
-    user = db.users.find_one({"id": user_id})
+    pk = partitions.user(user_id)
+    user = db.users.find_one(partition.scoped(pk, {"id": user_id}), {"_id": 0, "school_id": 1, "classes.subject": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user_subjects = [cls["subject"] for cls in user["classes"]]
     
-    classmates = list(db.users.find({
+    classmates = list(db.users.find(partition.scoped(pk, {
         "school_id": user["school_id"],
         "id": {"$ne": user_id},
         "classes.subject": {"$in": user_subjects}
-    }))
+    }), projection_for(Classmate, **{"classes.subject": 1})))
     
     result = []
     for classmate in classmates:
@@ -268,108 +660,219 @@ async def get_classmates(user_id: str):
             "shared_classes": shared_subjects
         })
     
-    return result
+    return FastJSONResponse(result)
 
-@app.post("/api/help-requests")
+@router.post("/api/help-requests")
 async def create_help_request(
     title: str = Form(...),
     subject: str = Form(...),
     description: str = Form(...),
     user_id: str = Form(...),
-    files: List[UploadFile] = File(default=[])
+    file_keys: List[str] = Form(default=[])
 ):
     request_id = str(uuid.uuid4())
-    image_urls = []
+    image_urls = attach_uploads(file_keys, user_id, "help_request")
     
-    for file in files:
-        if file.filename:
-            file_extension = file.filename.split(".")[-1]
-            filename = f"{request_id}_{len(image_urls)}.{file_extension}"
-            file_path = f"uploads/{filename}"
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            image_urls.append(f"/uploads/{filename}")
+    pk = partitions.user(user_id)
+    user = db.users.find_one(partition.scoped(pk, {"id": user_id}), {"_id": 0, "name": 1, "email": 1, "school_id": 1})
     
     help_request = {
         "id": request_id,
+        "pk": partitions.for_school(user["school_id"] if user else None),
         "user_id": user_id,
+        "school_id": user["school_id"] if user else None,
         "title": title,
         "subject": subject,
         "description": description,
         "image_urls": image_urls,
-        "responses": [],
+        "response_count": 0,
+        "latest_response": None,
         "status": "open",
-        "created_at": datetime.now()
+        "created_at": datetime.now(),
+        "version": next_version()
     }
     
     db.help_requests.insert_one(help_request)
+    partitions.remember("help_requests", request_id, help_request["pk"])
+    
+    event_data = {key: value for key, value in help_request.items() if key not in ("_id", "pk")}
+    if user:
+        event_data["user_name"] = user["name"]
+        event_data["user_email"] = user["email"]
+        event_data["user_school"] = user["school_id"]
+    await job_queue.enqueue("help.publish", {
+        "event_type": "help_request.created",
+        "data": event_data,
+        "school_id": help_request["school_id"],
+        "user_ids": [user_id]
+    })
+    
     return {"message": "Help request created", "request_id": request_id}
 
-@app.get("/api/help-requests")
+@router.get("/api/help-requests", response_model=List[HelpRequestListItem])
 async def get_help_requests(school_id: str = None, user_id: str = None):
     query = {}
     if user_id:
         query["user_id"] = user_id
+    if school_id:
+        query["school_id"] = school_id
+    # A requester's help requests live in their school's partition
+    pk = partitions.for_school(school_id) if school_id else partitions.user(user_id) if user_id else None
+    
+    requests = list(db.help_requests.find(partition.scoped(pk, query), projection_for(HelpRequestListItem)).sort("created_at", -1))
     
-    requests = list(db.help_requests.find(query).sort("created_at", -1))
+    # Add requester and latest response user details in one lookup
+    user_ids = [request["user_id"] for request in requests]
+    user_ids += [request["latest_response"]["user_id"] for request in requests if request.get("latest_response")]
+    users = users_by_id(user_ids, fields=("name", "email", "school_id"))
     
     for request in requests:
-        user = db.users.find_one({"id": request["user_id"]})
-        if user and (not school_id or user["school_id"] == school_id):
+        user = users.get(request["user_id"])
+        if user:
             request["user_name"] = user["name"]
             request["user_email"] = user["email"]
             request["user_school"] = user["school_id"]
-            request["_id"] = str(request["_id"])
             
-            # Add response user details
-            for response in request["responses"]:
-                response_user = db.users.find_one({"id": response["user_id"]})
-                if response_user:
-                    response["user_name"] = response_user["name"]
-                    response["user_email"] = response_user["email"]
+            latest = request.get("latest_response")
+            if latest and latest["user_id"] in users:
+                latest["user_name"] = users[latest["user_id"]]["name"]
     
-    return [req for req in requests if "user_name" in req]
+    return FastJSONResponse([req for req in requests if "user_name" in req])
 
-@app.post("/api/help-requests/{request_id}/respond")
+@router.post("/api/help-requests/{request_id}/respond")
 async def respond_to_help_request(
     request_id: str,
     user_id: str = Form(...),
     message: str = Form(...),
-    files: List[UploadFile] = File(default=[])
+    file_keys: List[str] = Form(default=[])
 ):
     response_id = str(uuid.uuid4())
-    file_urls = []
-    
-    # Handle file uploads for responses
-    for file in files:
-        if file.filename:
-            file_extension = file.filename.split(".")[-1]
-            filename = f"response_{response_id}_{len(file_urls)}.{file_extension}"
-            file_path = f"uploads/{filename}"
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            file_urls.append(f"/uploads/{filename}")
+    
+    # The routing lookup finds the request, so a missing one is a 404 before any upload is attached
+    pk = partitions.help_request(request_id)
+    if pk is None and not db.help_requests.find_one({"id": request_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Help request not found")
+    
+    # Attach files the client already uploaded with presigned URLs
+    file_urls = attach_uploads(file_keys, user_id, "help_response")
     
     response = {
         "id": response_id,
+        "pk": pk,
+        "request_id": request_id,
         "user_id": user_id,
         "message": message,
         "file_urls": file_urls,
         "created_at": datetime.now()
     }
     
-    db.help_requests.update_one(
-        {"id": request_id},
-        {"$push": {"responses": response}}
+    latest_response = {
+        "id": response_id,
+        "user_id": user_id,
+        "message": message[:RESPONSE_PREVIEW_LENGTH],
+        "created_at": response["created_at"]
+    }
+    
+    # Insert before counting, so a failed insert never leaves response_count ahead of the responses
+    db.help_responses.insert_one(response)
+    
+    help_request = db.help_requests.find_one_and_update(
+        partition.scoped(pk, {"id": request_id}),
+        {
+            "$inc": {"response_count": 1},
+            "$set": {
+                "latest_response": latest_response,
+                "version": next_version()
+            }
+        },
+        projection={"_id": 0, "user_id": 1, "school_id": 1, "status": 1, "response_count": 1},
+        return_document=pymongo.ReturnDocument.AFTER
     )
+    if not help_request:
+        # Deleted since the lookup above
+        db.help_responses.delete_one(partition.scoped(pk, {"id": response_id}))
+        raise HTTPException(status_code=404, detail="Help request not found")
+    
+    # Notifications and the status change run after the response is sent
+    job_payload = {
+        "request_id": request_id,
+        "pk": pk,
+        "school_id": help_request.get("school_id"),
+        "requester_id": help_request["user_id"]
+    }
+    await job_queue.enqueue("help.response_added", dict(
+        job_payload,
+        response_count=help_request["response_count"],
+        latest_response=latest_response
+    ))
+    # The first response moves an open request to answered
+    if help_request.get("status") == "open":
+        await job_queue.enqueue("help.mark_answered", job_payload)
     
-    return {"message": "Response added"}
+    return {"message": "Response added", "response_id": response_id}
+
+@job_queue.job("help.response_added")
+async def notify_help_response(request_id: str, school_id: str, requester_id: str, response_count: int,
+                               latest_response: Dict[str, Any], pk: str = None):
+    responder_id = latest_response["user_id"]
+    responder = db.users.find_one(partition.scoped(partitions.user(responder_id), {"id": responder_id}), {"_id": 0, "name": 1})
+    event_preview = dict(latest_response, user_name=responder["name"] if responder else "Unknown")
+    await publish_help_event("help_request.responded", {
+        "request_id": request_id,
+        "response_count": response_count,
+        "latest_response": event_preview
+    }, school_id, [requester_id])
 
-@app.post("/api/ai-assistant")
+@job_queue.job("help.mark_answered", durable=True)
+async def mark_help_request_answered(request_id: str, school_id: str, requester_id: str, pk: str = None):
+    # Conditional, so a retried or duplicated job changes the status once.
+    # Jobs queued before partitioning carry no pk and are routed here.
+    pk = pk or partitions.help_request(request_id)
+    status_update = db.help_requests.update_one(
+        partition.scoped(pk, {"id": request_id, "status": "open"}),
+        {"$set": {"status": "answered", "version": next_version()}}
+    )
+    # The socket write is its own in-process job: this one may run on any worker, or be retried
+    if status_update.modified_count:
+        await job_queue.enqueue("help.publish", {
+            "event_type": "status_changed",
+            "data": {"request_id": request_id, "old_status": "open", "status": "answered"},
+            "school_id": school_id,
+            "user_ids": [requester_id]
+        })
+
+@router.get("/api/help-requests/{request_id}/responses", response_model=HelpResponsePage)
+async def get_help_request_responses(request_id: str, skip: int = 0, limit: int = 20):
+    limit = max(1, min(limit, 100))
+    skip = max(skip, 0)
+    pk = partitions.help_request(request_id)
+    help_request = db.help_requests.find_one(partition.scoped(pk, {"id": request_id}), {"_id": 0, "response_count": 1})
+    if not help_request:
+        raise HTTPException(status_code=404, detail="Help request not found")
+    
+    responses = list(
+        db.help_responses.find(partition.scoped(pk, {"request_id": request_id}), projection_for(HelpResponseItem))
+        .sort("created_at", 1)
+        .skip(skip)
+        .limit(limit)
+    )
+    
+    # Add response user details
+    users = users_by_id(response["user_id"] for response in responses)
+    for response in responses:
+        response_user = users.get(response["user_id"])
+        if response_user:
+            response["user_name"] = response_user["name"]
+            response["user_email"] = response_user["email"]
+    
+    return FastJSONResponse({
+        "responses": responses,
+        "total": help_request.get("response_count", 0),
+        "skip": skip,
+        "limit": limit
+    })
+
+@router.post("/api/ai-assistant")
 async def ai_assistant(request_data: dict):
     prompt = request_data.get("prompt", "")
     subject = request_data.get("subject", "")
@@ -379,59 +882,79 @@ async def ai_assistant(request_data: dict):
 
 # Chat System Routes
 
-@app.post("/api/chat/rooms")
+@router.post("/api/chat/rooms")
 async def create_chat_room(room_data: dict):
     room_id = str(uuid.uuid4())
+    # Group rooms and DMs live with their creator's school
+    school_id = room_data.get("school_id")
+    pk = partitions.for_school(school_id) if school_id else partitions.user(room_data["created_by"])
     room = {
         "id": room_id,
+        "pk": pk,
         "name": room_data["name"],
         "type": room_data.get("type", "group"),  # "group", "secret", "dm"
         "school_id": room_data.get("school_id"),
         "members": room_data["members"],
         "created_by": room_data["created_by"],
         "created_at": datetime.now(),
-        "is_secret": room_data.get("is_secret", False)
+        "is_secret": room_data.get("is_secret", False),
+        "version": next_version()
     }
     
     db.chat_rooms.insert_one(room)
+    partitions.remember("chat_rooms", room_id, pk)
     return {"message": "Chat room created", "room_id": room_id}
 
-@app.get("/api/chat/rooms/{user_id}")
+@router.get("/api/chat/rooms/{user_id}", response_model=List[ChatRoomListItem])
 async def get_user_chat_rooms(user_id: str):
-    rooms = list(db.chat_rooms.find({"members": user_id}))
+    # Membership spans partitions; the rooms found tell us which ones to target next
+    rooms = list(db.chat_rooms.find(
+        {"members": user_id},
+        projection_for(ChatRoomListItem, pk=1, member_count={"$size": {"$ifNull": ["$members", []]}})
+    ))
+    room_pks = [room.pop("pk", None) for room in rooms]
+    for room, pk in zip(rooms, room_pks):
+        partitions.remember("chat_rooms", room["id"], pk)
     
+    # Get recent message counts for all rooms in one aggregation
+    recent_counts = {
+        row["_id"]: row["count"]
+        for row in db.chat_messages.aggregate([
+            {"$match": partition.scoped_any(room_pks, {
+                "room_id": {"$in": [room["id"] for room in rooms]},
+                "created_at": {"$gte": datetime.now() - timedelta(hours=24)}
+            })},
+            {"$group": {"_id": "$room_id", "count": {"$sum": 1}}}
+        ])
+    }
     for room in rooms:
-        room["_id"] = str(room["_id"])
-        # Get recent message count
-        recent_messages = db.chat_messages.count_documents({
-            "room_id": room["id"],
-            "created_at": {"$gte": datetime.now() - timedelta(hours=24)}
-        })
-        room["recent_message_count"] = recent_messages
+        room["recent_message_count"] = recent_counts.get(room["id"], 0)
+        room["online_count"] = presence_service.online_count(room["id"])
     
-    return rooms
+    return FastJSONResponse(rooms)
 
-@app.post("/api/chat/rooms/{room_id}/join")
+@router.post("/api/chat/rooms/{room_id}/join")
 async def join_chat_room(room_id: str, user_data: dict):
     user_id = user_data["user_id"]
     
-    room = db.chat_rooms.find_one({"id": room_id})
+    pk = partitions.room(room_id)
+    room = db.chat_rooms.find_one(partition.scoped(pk, {"id": room_id}), {"_id": 1})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    if user_id not in room["members"]:
-        db.chat_rooms.update_one(
-            {"id": room_id},
-            {"$push": {"members": user_id}}
-        )
+    db.chat_rooms.update_one(
+        partition.scoped(pk, {"id": room_id, "members": {"$ne": user_id}}),
+        {"$push": {"members": user_id}, "$pull": {"former_members": user_id}, "$set": {"version": next_version()}}
+    )
     
     return {"message": "Joined room successfully"}
 
-@app.post("/api/chat/rooms/{room_id}/leave")
+@router.post("/api/chat/rooms/{room_id}/leave")
 async def leave_chat_room(room_id: str, user_data: dict):
     user_id = user_data["user_id"]
     
-    room = db.chat_rooms.find_one({"id": room_id})
+    pk = partitions.room(room_id)
+    room = db.chat_rooms.find_one(partition.scoped(pk, {"id": room_id}), {"_id": 0, "type": 1})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
@@ -439,81 +962,300 @@ async def leave_chat_room(room_id: str, user_data: dict):
     if room["type"] == "school":
         return {"message": "Left school chat (can rejoin anytime)"}
     
+    # Former members let /api/sync tell the user's other devices the room is gone
     db.chat_rooms.update_one(
-        {"id": room_id},
-        {"$pull": {"members": user_id}}
+        partition.scoped(pk, {"id": room_id, "members": user_id}),
+        {"$pull": {"members": user_id}, "$addToSet": {"former_members": user_id}, "$set": {"version": next_version()}}
     )
     
     return {"message": "Left room successfully"}
 
-@app.post("/api/chat/rooms/{room_id}/messages")
+@router.post("/api/chat/rooms/{room_id}/messages")
 async def send_chat_message(
     room_id: str,
     user_id: str = Form(...),
     message: str = Form(...),
     message_type: str = Form(default="text"),
-    files: List[UploadFile] = File(default=[])
+    file_keys: List[str] = Form(default=[])
 ):
     message_id = str(uuid.uuid4())
-    file_urls = []
-    
-    # Handle file uploads
-    for file in files:
-        if file.filename:
-            file_extension = file.filename.split(".")[-1]
-            filename = f"chat_{message_id}_{len(file_urls)}.{file_extension}"
-            file_path = f"uploads/{filename}"
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            file_urls.append(f"/uploads/{filename}")
+    
+    # Attach files the client already uploaded with presigned URLs
+    file_urls = attach_uploads(file_keys, user_id, "chat")
     
     chat_message = {
         "id": message_id,
+        "pk": partitions.room(room_id),
         "room_id": room_id,
         "user_id": user_id,
         "message": message,
         "message_type": message_type,
         "file_urls": file_urls,
-        "created_at": datetime.now()
+        "created_at": datetime.now(),
+        "version": next_version()
     }
     
     db.chat_messages.insert_one(chat_message)
     
-    # Broadcast to room members via WebSocket
-    user = db.users.find_one({"id": user_id})
-    broadcast_data = {
-        "id": message_id,
-        "room_id": room_id,
-        "user_id": user_id,
-        "user_name": user["name"] if user else "Unknown",
-        "message": message,
-        "message_type": message_type,
-        "file_urls": file_urls,
-        "created_at": chat_message["created_at"].isoformat()
-    }
-    
-    await manager.broadcast_to_room(json.dumps(broadcast_data), room_id)
+    # Sender lookup and fan-out run after the response; keyed by room so order is kept
+    await job_queue.enqueue("chat.broadcast", {
+        "message": {key: value for key, value in chat_message.items() if key not in ("_id", "version", "pk")}
+    }, key=room_id)
     
     return {"message": "Message sent", "message_id": message_id}
 
-@app.get("/api/chat/rooms/{room_id}/messages")
+@job_queue.job("chat.broadcast")
+async def broadcast_chat_message(message: Dict[str, Any]):
+    user = db.users.find_one(partition.scoped(partitions.user(message["user_id"]), {"id": message["user_id"]}), {"_id": 0, "name": 1})
+    frame = dumps_text(dict(message, user_name=user["name"] if user else "Unknown"))
+    replay_buffer.append(message["room_id"], message["id"], frame)
+    await manager.broadcast_to_room(frame, message["room_id"])
+    presence_service.typing(message["room_id"], message["user_id"], False)
+
+def message_frames(messages: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    # (id, frame) pairs encoded exactly like live broadcasts
+    users = users_by_id(message["user_id"] for message in messages)
+    return [
+        (message["id"], dumps_text(dict(message, user_name=users.get(message["user_id"], {}).get("name", "Unknown"))))
+        for message in messages
+    ]
+
+def replay_since(room_id: str, last_seen: str) -> Tuple[List[str], str]:
+    # Frames a reconnecting client missed, and where they came from
+    frames = replay_buffer.since(room_id, last_seen)
+    pk = partitions.room(room_id)
+    if frames is None and not replay_buffer.is_primed(room_id):
+        # First resume in this room since startup: one query fills the buffer for everyone else
+        recent = list(
+            db.chat_messages.find(partition.scoped(pk, {"room_id": room_id}), {"_id": 0, "version": 0, "pk": 0})
+            .sort([("created_at", -1), ("id", -1)])
+            .limit(replay_buffer.capacity)
+        )
+        replay_buffer.prime(room_id, message_frames(list(reversed(recent))))
+        frames = replay_buffer.since(room_id, last_seen)
+    if frames is not None:
+        return frames, "buffer"
+    
+    # Older than the buffer: bounded range read on (pk, room_id, created_at, id)
+    anchor = db.chat_messages.find_one(partition.scoped(pk, {"room_id": room_id, "id": last_seen}), {"_id": 0, "created_at": 1, "id": 1})
+    if anchor is None:
+        return [], "reset"
+    missed = list(islice(
+        export.room_messages(db, room_id, (anchor["created_at"], anchor["id"]), pk=pk),
+        resume.REPLAY_MAX_MESSAGES + 1
+    ))
+    if len(missed) > resume.REPLAY_MAX_MESSAGES:
+        return [], "reset"
+    return [frame for _, frame in message_frames(missed)], "mongo"
+
+async def resume_session(websocket: WebSocket, room_id: str, last_seen: Optional[str]):
+    frames, source = replay_since(room_id, last_seen) if last_seen else ([], "new")
+    metrics.SESSION_RESUMES.labels(source).inc()
+    for frame in frames:
+        await websocket.send_text(frame)
+    # "reset" means the gap was too large to replay; the client reloads the room instead
+    await websocket.send_text(dumps_text({
+        "type": "session",
+        "room_id": room_id,
+        "source": source,
+        "replayed": len(frames),
+        "reconnect": resume.RECONNECT_HINT
+    }))
+
+@router.get("/api/chat/rooms/{room_id}/messages", response_model=List[ChatMessageItem])
 async def get_chat_messages(room_id: str, limit: int = 50):
-    messages = list(db.chat_messages.find({"room_id": room_id}).sort("created_at", -1).limit(limit))
+    pk = partitions.room(room_id)
+    messages = list(
+        db.chat_messages.find(partition.scoped(pk, {"room_id": room_id}), projection_for(ChatMessageItem))
+        .sort("created_at", -1)
+        .limit(limit)
+    )
+    
+    # Fill the rest of the page from archived buckets
+    if len(messages) < limit:
+        before = messages[-1]["created_at"] if messages else datetime.now()
+        messages.extend(archive.load_archived_messages(
+            db, room_id, before, limit - len(messages), exclude_ids=[m["id"] for m in messages], pk=pk
+        ))
     
     # Add user details to messages
+    users = users_by_id(message["user_id"] for message in messages)
     for message in messages:
-        user = db.users.find_one({"id": message["user_id"]})
+        user = users.get(message["user_id"])
         if user:
             message["user_name"] = user["name"]
             message["user_email"] = user["email"]
-        message["_id"] = str(message["_id"])
     
-    return list(reversed(messages))
+    return FastJSONResponse(list(reversed(messages)))
+
+# Delta sync for returning clients
+@router.get("/api/sync")
+async def sync_changes(user_id: str, since: str = None):
+    since_version = decode_sync_token(since)
+    pk = partitions.user(user_id)
+    user = db.users.find_one(partition.scoped(pk, {"id": user_id}), {"_id": 0, "school_id": 1, "classes": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # The high-water mark trails the version clock by VERSION_SAFETY_MS (see
+    # partition.VersionClock). A version is allocated before its write commits, so a
+    # token at "now" could pass over a write still in flight and skip it for good.
+    # Writes slower than the safety window (or clock skew beyond it) can still be missed.
+    high_water = current_version()
+    changed = {"version": {"$gt": since_version, "$lte": high_water}}
+    truncated_at = []
+    
+    def fetch(collection, query, projection=None):
+        docs = list(
+            collection.find({**query, **changed}, projection or {"_id": 0, "pk": 0, "former_members": 0})
+            .sort("version", 1)
+            .limit(SYNC_BATCH_LIMIT)
+        )
+        if len(docs) == SYNC_BATCH_LIMIT:
+            truncated_at.append(docs[-1]["version"])
+        return docs
+    
+    member_rooms = list(db.chat_rooms.find({"members": user_id}, {"_id": 0, "id": 1, "pk": 1}))
+    room_ids = [room["id"] for room in member_rooms]
+    rooms = fetch(db.chat_rooms, {"members": user_id})
+    # Rooms the user left since the token; a room changed again later is reported again
+    removed_rooms = [room["id"] for room in fetch(db.chat_rooms, {"former_members": user_id}, {"_id": 0, "id": 1, "version": 1})]
+    messages = fetch(db.chat_messages, partition.scoped_any((room.get("pk") for room in member_rooms), {"room_id": {"$in": room_ids}}))
+    help_requests = fetch(db.help_requests, partition.scoped(pk, {"school_id": user["school_id"]}))
+    
+    user_subjects = [cls["subject"] for cls in user["classes"]]
+    classmates = []
+    for classmate in fetch(db.users, partition.scoped(pk, {
+        "school_id": user["school_id"],
+        "id": {"$ne": user_id},
+        "classes.subject": {"$in": user_subjects}
+    })):
+        classmates.append({
+            "id": classmate["id"],
+            "name": classmate["name"],
+            "email": classmate["email"],
+            "grade_level": classmate["grade_level"],
+            "shared_classes": [cls["subject"] for cls in classmate["classes"] if cls["subject"] in user_subjects],
+            "version": classmate["version"]
+        })
+    
+    # Add user details, as in the full-list endpoints
+    senders = users_by_id(message["user_id"] for message in messages)
+    for message in messages:
+        sender = senders.get(message["user_id"])
+        if sender:
+            message["user_name"] = sender["name"]
+            message["user_email"] = sender["email"]
+    requesters = users_by_id((request["user_id"] for request in help_requests), fields=("name", "email", "school_id"))
+    for request in help_requests:
+        requester = requesters.get(request["user_id"])
+        if requester:
+            request["user_name"] = requester["name"]
+            request["user_email"] = requester["email"]
+            request["user_school"] = requester["school_id"]
+    
+    # If any collection was cut off, resume from the lowest truncation point.
+    # Documents above it may be sent again; clients upsert by id.
+    next_version_seen = min(truncated_at) if truncated_at else high_water
+    
+    return FastJSONResponse({
+        "token": encode_sync_token(next_version_seen),
+        "has_more": bool(truncated_at),
+        "rooms": rooms,
+        "removed_rooms": removed_rooms,
+        "messages": messages,
+        "help_requests": help_requests,
+        "classmates": classmates
+    })
+
+# Full-text search over chat history and help requests.
+# The room-prefixed text index needs an equality match on room_id, so each of the user's
+# rooms is searched on its own (text scores do not depend on the room) and the ranked lists
+# merged. The cursor keeps an offset per room and one for help requests, so a page costs
+# at most SEARCH_MAX_ROOMS + 1 queries of `limit` rows each, however deep the page.
+# Users in more rooms than that search the first SEARCH_MAX_ROOMS by room id.
+@router.get("/api/search")
+async def search(
+    user_id: str,
+    q: str,
+    scope: str = "all",
+    subject: str = None,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    cursor: str = None
+):
+    if scope not in ("all", "messages", "help_requests"):
+        raise HTTPException(status_code=400, detail="scope must be all, messages or help_requests")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    # Chat rooms carry no subject, so messages cannot be filtered by one
+    if scope == "messages" and subject:
+        raise HTTPException(status_code=400, detail="subject filters help requests; it cannot be used with scope=messages")
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    
+    pk = partitions.user(user_id)
+    user = db.users.find_one(partition.scoped(pk, {"id": user_id}), {"_id": 0, "school_id": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Help request offset, then one offset per searched room, in room id order
+    help_offset, *room_offsets = decode_token("s2", cursor, None) if cursor else (0,)
+    score = {"score": {"$meta": "textScore"}}
+    ranking = [("score", {"$meta": "textScore"}), ("created_at", -1)]
+    
+    rooms = []
+    room_hits: Dict[str, List[Dict[str, Any]]] = {}
+    # With scope=all, a subject filter narrows results to help requests
+    if scope in ("all", "messages") and not subject:
+        rooms = list(db.chat_rooms.find({"members": user_id}, {"_id": 0, "id": 1, "pk": 1}).sort("id", 1).limit(SEARCH_MAX_ROOMS))
+        # A room joined or left since the cursor was issued shifts the offsets; pages may then repeat hits
+        room_offsets = (room_offsets + [0] * len(rooms))[:len(rooms)]
+        for room, offset in zip(rooms, room_offsets):
+            room_hits[room["id"]] = list(
+                db.chat_messages.find(
+                    partition.scoped(room.get("pk"), {"room_id": room["id"], "$text": {"$search": q}}),
+                    {"_id": 0, "version": 0, "pk": 0, **score}
+                ).sort(ranking).skip(offset).limit(limit)
+            )
+    messages = [doc for hits in room_hits.values() for doc in hits]
+    
+    help_requests = []
+    if scope in ("all", "help_requests"):
+        query = partition.scoped(pk, {"school_id": user["school_id"], "$text": {"$search": q}})
+        if subject:
+            query["subject"] = subject
+        help_requests = list(
+            db.help_requests.find(query, {"_id": 0, "version": 0, "pk": 0, **score})
+            .sort(ranking).skip(help_offset).limit(limit)
+        )
+    
+    # Merge the two ranked lists and keep the best `limit` hits
+    candidates = [("message", doc) for doc in messages] + [("help_request", doc) for doc in help_requests]
+    candidates.sort(key=lambda hit: (hit[1]["score"], hit[1]["created_at"]), reverse=True)
+    page = candidates[:limit]
+    
+    authors = users_by_id(doc["user_id"] for _, doc in page)
+    results = []
+    for kind, doc in page:
+        author = authors.get(doc["user_id"])
+        doc["user_name"] = author["name"] if author else "Unknown"
+        results.append({"kind": kind, **doc})
+    
+    # Each room's hits are ranked, so the ones used are a prefix of its list
+    used = Counter(doc["room_id"] if kind == "message" else None for kind, doc in page)
+    exhausted = (
+        all(len(hits) < limit for hits in room_hits.values())
+        and len(help_requests) < limit and len(page) == len(candidates)
+    )
+    
+    return FastJSONResponse({
+        "results": results,
+        "next_cursor": None if exhausted else encode_token(
+            "s2", help_offset + used[None], *(offset + used[room["id"]] for room, offset in zip(rooms, room_offsets))
+        )
+    })
 
 # AI Chatbot in rooms
-@app.post("/api/chat/ai-bot")
+@router.post("/api/chat/ai-bot")
 async def ai_chatbot_response(request_data: dict):
     prompt = request_data.get("prompt", "")
     room_context = request_data.get("room_context", "")
@@ -524,86 +1266,306 @@ async def ai_chatbot_response(request_data: dict):
     return {"response": response, "bot_name": "StudyBot"}
 
 # WebSocket endpoint for real-time chat
-@app.websocket("/ws/chat/{room_id}/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str, user_id: str):
+@router.websocket("/ws/chat/{room_id}/{user_id}")
+async def websocket_endpoint(websocket: WebSocket, room_id: str, user_id: str, last_seen: str = None):
     await manager.connect(websocket, user_id, room_id)
+    presence_service.connect(websocket, room_id, user_id)
     try:
+        # Live broadcasts may interleave with the replay; clients drop duplicate ids
+        await resume_session(websocket, room_id, last_seen)
         while True:
             data = await websocket.receive_text()
-            # Handle incoming WebSocket messages if needed
-            pass
+            # Any frame proves the socket is alive; clients also send {"type": "heartbeat"}
+            presence_service.heartbeat(websocket)
+            retry_after = await rate_limiter.check_async(f"user:{user_id}", "ws_message")
+            if retry_after:
+                await websocket.send_text(dumps_text({"type": "error", "code": 429, "retry_after": retry_after}))
+                continue
+            try:
+                frame = loads(data)
+            except ValueError:
+                continue
+            if isinstance(frame, dict) and frame.get("type") == "typing":
+                presence_service.typing(room_id, user_id, bool(frame.get("typing", True)))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Also on errors and cancellation, or the socket and its gauge count would leak
+        manager.disconnect(user_id, room_id, websocket)
+        presence_service.disconnect(websocket)
+
+@router.get("/api/chat/rooms/{room_id}/presence")
+async def get_room_presence(room_id: str):
+    return presence_service.snapshot(room_id)
+
+@router.get("/api/jobs/stats")
+async def job_stats():
+    return job_queue.stats()
+
+@router.get("/api/chat/resume/stats")
+async def resume_stats():
+    return replay_buffer.stats()
+
+@router.get("/api/partitions/stats")
+async def partition_stats():
+    return partitions.stats()
+
+@router.get("/api/presence/stats")
+async def presence_stats():
+    return presence_service.stats()
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.latest()
+    return Response(content=body, media_type=content_type)
+
+@router.get("/api/rate-limits/stats")
+async def rate_limit_stats():
+    return rate_limiter.stats()
+
+# WebSocket endpoint for help-feed events
+@router.websocket("/ws/help-requests/{school_id}/{user_id}")
+async def help_events_endpoint(websocket: WebSocket, school_id: str, user_id: str):
+    await manager.subscribe(websocket, user_id, school_id)
+    try:
+        while True:
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(user_id, room_id)
+        pass
+    finally:
+        manager.unsubscribe(websocket, user_id, school_id)
 
 # GPA Calculator
-@app.post("/api/gpa-calculator")
+@router.post("/api/gpa-calculator")
 async def calculate_gpa(grades_data: dict):
     grades = grades_data.get("grades", [])
+    if not isinstance(grades, list) or not all(isinstance(grade, dict) and isinstance(grade.get("letter"), str) for grade in grades):
+        raise HTTPException(status_code=400, detail="grades must be a list of objects with a letter")
     total_points = 0
+    total_weighted_points = 0
     total_hours = 0
     
-    grade_points = {"A": 4.0, "B": 3.0, "C": 2.0, "D": 1.0, "F": 0.0}
-    
     for grade in grades:
-        points = grade_points.get(grade["letter"], 0.0)
-        hours = grade.get("credit_hours", 3)
+        points = gpa.GRADE_POINTS.get(grade["letter"].strip().upper(), 0.0)
+        bonus = gpa.LEVEL_BONUS.get(str(grade.get("level") or "regular").lower(), 0.0) if points > 0 else 0.0
+        try:
+            hours = gpa.credit_hours(grade.get("credit_hours"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         total_points += points * hours
+        total_weighted_points += (points + bonus) * hours
         total_hours += hours
     
-    gpa = total_points / total_hours if total_hours > 0 else 0.0
-    return {"gpa": round(gpa, 2)}
+    unweighted = total_points / total_hours if total_hours > 0 else 0.0
+    weighted = total_weighted_points / total_hours if total_hours > 0 else 0.0
+    return {"gpa": round(unweighted, 2), "weighted_gpa": round(weighted, 2)}
+
+@router.post("/api/gpa-calculator/batch")
+async def calculate_gpa_batch(batch_data: dict):
+    records = batch_data.get("records", [])
+    term_order = batch_data.get("term_order")
+    try:
+        result = await asyncio.to_thread(gpa.compute_from_records, records, term_order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(result)
+
+@router.post("/api/gpa-calculator/batch/csv")
+async def calculate_gpa_batch_csv(
+    file: UploadFile = File(...),
+    term_order: str = Form(default="")
+):
+    order = [term.strip() for term in term_order.split(",") if term.strip()] or None
+    try:
+        result = await asyncio.to_thread(gpa.compute_from_csv, file.file, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(result)
 
-@app.post("/api/mla-format")
+@router.post("/api/mla-format")
 async def generate_mla_citation(citation_data: dict):
-    citation_type = citation_data.get("type", "website")
-    
-    if citation_type == "website":
-        author = citation_data.get("author", "")
-        title = citation_data.get("title", "")
-        website = citation_data.get("website", "")
-        url = citation_data.get("url", "")
-        date = citation_data.get("date", "")
-        
-        citation = f'{author}. "{title}" {website}, {date}, {url}.'
-        
-    elif citation_type == "book":
-        author = citation_data.get("author", "")
-        title = citation_data.get("title", "")
-        publisher = citation_data.get("publisher", "")
-        year = citation_data.get("year", "")
-        
-        citation = f'{author}. {title}. {publisher}, {year}.'
-    
-    else:
+    citation = citations.format_citation(citation_data)
+    if citation is None:
         citation = "Citation format not supported yet."
     
     return {"citation": citation}
 
-@app.get("/api/academic-resources")
+@router.post("/api/mla-format/batch")
+async def generate_works_cited(batch_data: dict):
+    sources = batch_data.get("sources", [])
+    output_format = batch_data.get("format", "ndjson")
+    if output_format not in ("ndjson", "text"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or text")
+    if not isinstance(sources, list) or len(sources) > citations.MAX_BATCH_SOURCES:
+        raise HTTPException(status_code=400, detail=f"sources must be a list of at most {citations.MAX_BATCH_SOURCES} items")
+    
+    # Sorting and de-duplication need every entry, so formatting happens up front
+    # and the formatted list is streamed out
+    entries, errors = citations.build_works_cited(sources)
+    
+    if output_format == "text":
+        return StreamingResponse(citations.iter_text(entries, errors), media_type="text/plain; charset=utf-8")
+    
+    def ndjson_lines():
+        for entry in entries:
+            yield dumps(entry) + b"\n"
+        for error in errors:
+            yield dumps(error) + b"\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@router.get("/api/academic-resources")
 async def get_academic_resources():
-    resources = {
-        "summarizing_tools": [
-            {"name": "QuillBot Summarizer", "url": "https://quillbot.com/summarize", "description": "AI-powered text summarization"},
-            {"name": "SMMRY", "url": "https://smmry.com/", "description": "Automatic article summarizer"},
-            {"name": "Resoomer", "url": "https://resoomer.com/", "description": "Summarize your documents online"}
-        ],
-        "study_tools": [
-            {"name": "Khan Academy", "url": "https://khanacademy.org", "description": "Free educational content"},
-            {"name": "Coursera", "url": "https://coursera.org", "description": "Online courses from universities"},
-            {"name": "Quizlet", "url": "https://quizlet.com", "description": "Flashcards and study sets"}
-        ],
-        "ai_detection_tools": [
-            {"name": "ZeroGPT", "url": "https://zerogpt.com", "description": "AI content detection"},
-            {"name": "GPTZero", "url": "https://gptzero.me", "description": "Advanced AI detection"},
-            {"name": "Originality.ai", "url": "https://originality.ai", "description": "Plagiarism and AI detection"}
-        ],
-        "research_tools": [
-            {"name": "Google Scholar", "url": "https://scholar.google.com", "description": "Academic search engine"},
-            {"name": "JSTOR", "url": "https://jstor.org", "description": "Academic articles and books"},
-            {"name": "ResearchGate", "url": "https://researchgate.net", "description": "Academic networking platform"}
-        ]
+    return ACADEMIC_RESOURCES
+
+def export_response(rows, columns, output_format: str, limit: Optional[int], filename: str):
+    if output_format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    # A sync generator: Starlette pulls each chunk in a worker thread, so the cursor never blocks the loop
+    return StreamingResponse(
+        export.encode(db, rows, columns, output_format, limit),
+        media_type=export.FORMATS[output_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{output_format}"'}
+    )
+
+def decode_export_cursor(after: Optional[str]):
+    try:
+        return export.decode_cursor(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/api/export/rooms/{room_id}/messages")
+async def export_room_messages(
+    room_id: str,
+    format: str = "ndjson",
+    after: str = None,
+    limit: int = None,
+    batch_size: int = export.EXPORT_BATCH_SIZE
+):
+    pk = partitions.room(room_id)
+    if not db.chat_rooms.find_one(partition.scoped(pk, {"id": room_id}), {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Chat room not found")
+    rows = export.room_messages(db, room_id, decode_export_cursor(after), batch_size, pk=pk)
+    return export_response(rows, export.MESSAGE_COLUMNS, format, limit, f"room_{room_id}_messages")
+
+@router.get("/api/export/schools/{school_id}/help-requests")
+async def export_help_requests(
+    school_id: str,
+    format: str = "ndjson",
+    after: str = None,
+    limit: int = None,
+    batch_size: int = export.EXPORT_BATCH_SIZE
+):
+    rows = export.school_help_requests(db, school_id, decode_export_cursor(after), batch_size, pk=partitions.for_school(school_id))
+    return export_response(rows, export.HELP_REQUEST_COLUMNS, format, limit, f"school_{school_id}_help_requests")
+
+@router.post("/api/uploads/presign")
+async def presign_upload(upload_data: dict):
+    user_id = upload_data.get("user_id")
+    if not isinstance(user_id, str) or not user_id:
+        raise HTTPException(status_code=400, detail="user_id is required")
+    kind = upload_data.get("kind")
+    if kind not in storage.UPLOAD_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(storage.UPLOAD_KINDS)}")
+    try:
+        size = int(upload_data.get("size", 0))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="size must be a number of bytes")
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="size must be a number of bytes")
+    if size > storage.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Files are limited to {storage.MAX_UPLOAD_BYTES} bytes")
+    
+    content_type = upload_data.get("content_type") or "application/octet-stream"
+    key = storage.new_key(kind, upload_data.get("filename", ""))
+    db.uploads.insert_one({
+        "key": key,
+        "user_id": user_id,
+        "kind": kind,
+        "content_type": content_type,
+        "size": size,
+        "status": "pending",
+        "created_at": datetime.now(),
+        # Unattached keys are forgotten an hour after their URL expires; the TTL monitor compares in UTC
+        "expires_at": datetime.utcnow() + timedelta(seconds=storage.UPLOAD_URL_TTL_SECONDS + 3600)
+    })
+    return {
+        "file_key": key,
+        "upload": get_storage().presign_put(key, content_type, size),
+        "expires_in": storage.UPLOAD_URL_TTL_SECONDS
     }
-    return resources
+
+@router.put("/api/uploads/{key:path}")
+async def put_local_upload(key: str, request: Request, expires: int, signature: str):
+    # Target of LocalStorage presigned URLs; S3 deployments upload straight to the bucket
+    backend = get_storage()
+    if not isinstance(backend, storage.LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found")
+    content_type = request.headers.get("content-type", "")
+    if not storage.valid_key(key) or not backend.verify(key, expires, content_type, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload URL")
+    if int(request.headers.get("content-length") or 0) > storage.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    
+    start = time.perf_counter()
+    try:
+        size = await backend.write(key, request.stream())
+    except ValueError:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    metrics.UPLOAD_SECONDS.labels(key.split("/")[0]).observe(time.perf_counter() - start)
+    return {"file_key": key, "size": size}
+
+@router.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness: the event loop answers; dependencies are /readyz's job
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz():
+    checks = {}
+    try:
+        await asyncio.wait_for(asyncio.to_thread(db.command, "ping"), timeout=2)
+        checks["mongo"] = "ok"
+    except Exception as e:
+        checks["mongo"] = f"error: {e.__class__.__name__}"
+    checks["indexes"] = "ok" if startup_state["indexes"] else f"pending: {startup_state['error'] or 'starting'}"
+    try:
+        writable = await asyncio.wait_for(asyncio.to_thread(get_storage().writable), timeout=2)
+    except Exception:
+        writable = False
+    checks["uploads"] = "ok" if writable else "not writable"
+    # A missing key is not an outage; the assistant falls back to canned answers
+    checks["ai"] = "configured" if OPENAI_API_KEY else "fallback"
+    ready = checks["mongo"] == "ok" and checks["indexes"] == "ok" and checks["uploads"] == "ok"
+    return FastJSONResponse(
+        {"status": "ready" if ready else "not ready", "checks": checks, "ready_seconds": startup_state["ready_seconds"]},
+        status_code=200 if ready else 503
+    )
+
+def create_app() -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+    app.include_router(router)
+
+    # Innermost first: the response cache, then the rate limiter, metrics, tracing and CORS
+    app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+    # Outside the cache and limiter so their answers are counted too
+    app.add_middleware(metrics.MetricsMiddleware, routes_app=app)
+    # Opt-in per-request Mongo query tracing (QUERY_TRACE=1 or header)
+    app.add_middleware(query_trace.QueryTraceMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,72 @@
+"""Zone sharding for the partitioned collections (see partition.py).
+
+Run against a mongos from the backend directory, after the backend has
+started once and created its indexes:
+
+    python sharding.py shard
+    python sharding.py zones sharding_zones.example.json
+
+``shard`` shards each collection in ``SHARD_KEYS`` on its pk-prefixed key.
+``zones`` pins districts to shards. The zone file maps a zone name to its
+shards and districts:
+
+    {"north-texas": {"shards": ["shard1"], "districts": ["Plano ISD"]}}
+
+``null`` in ``districts`` stands for schools without a district. A district
+that is not listed stays in unzoned chunks, which the balancer places
+freely. To add a district later, add it to a zone and run ``zones``
+again.
+"""
+import json
+import os
+import sys
+from typing import Any, Dict
+
+import pymongo
+from bson.min_key import MinKey
+
+from partition import SHARD_KEYS, district_range
+
+DATABASE = "school_connect"
+
+
+def shard_collections(client, database: str = DATABASE):
+    admin = client.admin
+    admin.command("enableSharding", database)
+    sharded = []
+    for name, keys in SHARD_KEYS.items():
+        admin.command("shardCollection", f"{database}.{name}", key=dict(keys))
+        sharded.append(name)
+    return {"sharded": sharded}
+
+
+def configure_zones(client, zones: Dict[str, Dict[str, Any]], database: str = DATABASE):
+    admin = client.admin
+    ranges = 0
+    for zone, spec in zones.items():
+        for shard in spec.get("shards", []):
+            admin.command("addShardToZone", shard, zone=zone)
+        for district in spec.get("districts", []):
+            low, high = district_range(district)
+            for name, keys in SHARD_KEYS.items():
+                # The range covers every pk of the district, whatever the rest of the key
+                rest = {field: MinKey() for field, _ in keys[1:]}
+                admin.command(
+                    "updateZoneKeyRange", f"{database}.{name}",
+                    min={"pk": low, **rest}, max={"pk": high, **rest}, zone=zone
+                )
+                ranges += 1
+    return {"zones": list(zones), "ranges": ranges}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("shard", "zones") or (sys.argv[1] == "zones" and len(sys.argv) < 3):
+        print("Usage: python sharding.py shard | zones <zones.json>")
+        sys.exit(1)
+
+    mongo_client = pymongo.MongoClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017/'))
+    if sys.argv[1] == "shard":
+        print(shard_collections(mongo_client))
+    else:
+        with open(sys.argv[2]) as f:
+            print(configure_zones(mongo_client, json.load(f)))
@@ -0,0 +1,156 @@
+"""Object storage for uploads, with direct-to-store presigned PUTs.
+
+Uploads take two steps. The client first asks ``POST /api/uploads/presign``
+for a short-lived PUT URL and sends the bytes straight to it. It then
+passes the returned ``file_key`` to the route that owns the file
+(``file_keys`` on help requests, responses and chat messages). That route
+checks the object exists and attaches it.
+
+Backends, selected with ``STORAGE_BACKEND``:
+
+- ``local`` (default): files live under ``uploads/`` and are served at
+  ``/uploads``. The presigned URL points back at this app and is signed
+  with ``UPLOAD_SIGNING_SECRET``. Set the same secret on every worker.
+- ``s3``: any S3-compatible store (AWS S3, MinIO). Configured with
+  ``S3_BUCKET``, ``S3_ENDPOINT_URL``, ``S3_REGION``, ``S3_PUBLIC_URL`` and
+  the usual AWS credential variables. Upload bytes never pass through
+  Python. The bucket needs a CORS rule that allows PUT from the frontend
+  origin.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlencode
+
+UPLOAD_URL_TTL_SECONDS = int(os.environ.get('UPLOAD_URL_TTL_SECONDS', '300'))
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+UPLOAD_KINDS = ("help_request", "help_response", "chat")
+
+
+def new_key(kind: str, filename: str) -> str:
+    extension = Path(filename or "").suffix.lower()[:10]
+    if not extension[1:].isalnum():
+        extension = ""
+    return f"{kind}/{datetime.utcnow():%Y/%m/%d}/{uuid.uuid4().hex}{extension}"
+
+
+def valid_key(key: str) -> bool:
+    return bool(key) and not key.startswith("/") and ".." not in key.split("/") and key.split("/")[0] in UPLOAD_KINDS
+
+
+class LocalStorage:
+    def __init__(self, root: str = "uploads", public_path: str = "/uploads", secret: str = None):
+        self.root = Path(root)
+        self.public_path = public_path
+        # A per-process secret only works with a single worker
+        self.secret = (secret or secrets.token_hex(32)).encode()
+
+    def _signature(self, key: str, expires: int, content_type: str) -> str:
+        return hmac.new(self.secret, f"{key}\n{expires}\n{content_type}".encode(), hashlib.sha256).hexdigest()
+
+    def presign_put(self, key: str, content_type: str, size: int, expires_in: int = UPLOAD_URL_TTL_SECONDS) -> Dict[str, Any]:
+        # The size limit is enforced while streaming in write()
+        expires = int(time.time()) + expires_in
+        query = urlencode({"expires": expires, "signature": self._signature(key, expires, content_type)})
+        return {"url": f"/api/uploads/{key}?{query}", "method": "PUT", "headers": {"Content-Type": content_type}}
+
+    def verify(self, key: str, expires: int, content_type: str, signature: str) -> bool:
+        return expires >= time.time() and hmac.compare_digest(self._signature(key, expires, content_type), signature)
+
+    async def write(self, key: str, chunks: AsyncIterator[bytes], max_bytes: int = MAX_UPLOAD_BYTES) -> int:
+        # Streams to a temporary file and renames it, so a half-written upload is never visible
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + ".part")
+        size = 0
+        try:
+            with open(partial, "wb") as out:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError("Upload too large")
+                    out.write(chunk)
+            os.replace(partial, path)
+        finally:
+            if partial.exists():
+                partial.unlink()
+        return size
+
+    def stat(self, key: str) -> Optional[int]:
+        try:
+            return (self.root / key).stat().st_size
+        except OSError:
+            return None
+
+    def public_url(self, key: str) -> str:
+        return f"{self.public_path}/{key}"
+
+    def writable(self) -> bool:
+        return os.access(self.root, os.W_OK)
+
+
+class S3Storage:
+    def __init__(self, bucket: str, endpoint_url: str = None, region: str = None, public_url: str = None):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        # Path-style addressing and SigV4 are what MinIO and other S3 stand-ins expect
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path" if endpoint_url else "auto"}),
+        )
+        if public_url:
+            self.public_base = public_url.rstrip("/")
+        elif endpoint_url:
+            self.public_base = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_base = f"https://{bucket}.s3.amazonaws.com"
+
+    def presign_put(self, key: str, content_type: str, size: int, expires_in: int = UPLOAD_URL_TTL_SECONDS) -> Dict[str, Any]:
+        # Content-Length is signed, so the store rejects a body larger than the declared size
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.bucket, "Key": key, "ContentType": content_type, "ContentLength": size},
+            ExpiresIn=expires_in,
+        )
+        return {"url": url, "method": "PUT", "headers": {"Content-Type": content_type}}
+
+    def stat(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+        except ClientError:
+            return None
+
+    def public_url(self, key: str) -> str:
+        return f"{self.public_base}/{key}"
+
+    def writable(self) -> bool:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+            return True
+        except (BotoCoreError, ClientError):
+            return False
+
+
+def storage_from_env(upload_dir: str = "uploads"):
+    if os.environ.get('STORAGE_BACKEND', 'local') == 's3':
+        return S3Storage(
+            os.environ['S3_BUCKET'],
+            endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+            region=os.environ.get('S3_REGION'),
+            public_url=os.environ.get('S3_PUBLIC_URL'),
+        )
+    return LocalStorage(upload_dir, secret=os.environ.get('UPLOAD_SIGNING_SECRET'))
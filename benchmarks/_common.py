@@ -0,0 +1,43 @@
+"""Shared helpers for the backend benchmark scripts."""
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017/")
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    ordered = sorted(samples_ms)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def write_results(path, results):
+    with open(path, "w") as out:
+        json.dump(results, out, indent=2, default=str)
+    print(f"Results written to {path}")
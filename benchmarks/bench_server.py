@@ -0,0 +1,72 @@
+"""Backend process for load_bench.py.
+
+Points server.py at a scratch database (a local mongod, or mongomock with
+``--mock``), seeds it unless ``--skip-seed`` is given, lifts the rate
+limits and serves the app with uvicorn. load_bench.py starts this script
+itself; running it by hand is only useful to profile the server side:
+
+    python benchmarks/bench_server.py --port 8765 --mock
+"""
+import argparse
+import json
+import os
+
+import pymongo
+import uvicorn
+
+from _common import DEFAULT_MONGO_URL
+from seed_data import Dataset, seed
+
+
+def dataset_arguments(parser):
+    defaults = Dataset()
+    for name, value in vars(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=value)
+
+
+def dataset_from_args(args) -> Dataset:
+    return Dataset(**{name: getattr(args, name) for name in vars(Dataset())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=DEFAULT_MONGO_URL)
+    parser.add_argument("--db", default="school_connect_bench")
+    parser.add_argument("--mock", action="store_true", help="use mongomock instead of a mongod")
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    dataset_arguments(parser)
+    args = parser.parse_args()
+
+    # seed_data stamps every document with its pk, so measure the routed reads
+    os.environ.setdefault("PARTITION_ROUTING", "1")
+    import server
+
+    if args.mock:
+        import mongomock
+        server.use_database(mongomock.MongoClient()[args.db])
+        ensure_indexes = server.ensure_indexes
+
+        def ensure_supported_indexes():
+            # mongomock has no text indexes; /api/search is skipped in mock runs
+            try:
+                ensure_indexes()
+            except Exception as e:
+                print(f"Skipping unsupported index: {e}")
+
+        server.ensure_indexes = ensure_supported_indexes
+    else:
+        server.use_database(pymongo.MongoClient(args.mongo_url)[args.db])
+
+    # The driver is one client hammering the API; measure the handlers, not the limiter
+    server.rate_limiter.limits = {}
+
+    if not args.skip_seed:
+        print(json.dumps({"seeded": seed(server.db, dataset_from_args(args))}), flush=True)
+
+    uvicorn.run(server.app, host=args.host, port=args.port, log_level="warning", ws_max_size=1 << 20)
+
+
+if __name__ == "__main__":
+    main()
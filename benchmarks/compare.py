@@ -0,0 +1,80 @@
+"""Diff two benchmark result files.
+
+Prints every latency and throughput metric that appears in both files with
+its relative change, and exits with status 1 when any metric regressed by
+more than ``--threshold`` percent:
+
+    python benchmarks/compare.py before.json after.json --threshold 10
+
+Works with the output of any script in this directory. Latency metrics
+(``p50``, ``p95``, ``p99``, ``mean``, ``max``) regress when they grow;
+throughput metrics (``rps``, ``deliveries_per_second``) regress when they
+shrink.
+"""
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = {"mean", "p50", "p95", "p99", "max", "errors", "connect_errors"}
+HIGHER_IS_BETTER = {"rps", "deliveries", "deliveries_per_second"}
+
+
+def flatten(results, prefix=""):
+    metrics = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{path} / "))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key in LOWER_IS_BETTER | HIGHER_IS_BETTER:
+            metrics[path] = (key, value)
+    return metrics
+
+
+def compare(before, after, threshold):
+    old, new = flatten({k: v for k, v in before.items() if k != "meta"}), flatten({k: v for k, v in after.items() if k != "meta"})
+    rows, regressions = [], 0
+    for path in sorted(old.keys() & new.keys()):
+        metric, old_value = old[path]
+        new_value = new[path][1]
+        if old_value == 0:
+            change = 0.0 if new_value == 0 else float("inf")
+        else:
+            change = (new_value - old_value) / abs(old_value) * 100
+        worse = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+        regressions += worse
+        rows.append((path, old_value, new_value, change, worse))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    parser.add_argument("--only-changes", action="store_true", help="hide metrics within the threshold")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    for label, results in (("before", before), ("after", after)):
+        meta = results.get("meta", {})
+        if meta:
+            print(f"{label}: {meta.get('revision')} {meta.get('backend', '')} {meta.get('timestamp', '')}")
+
+    rows, regressions = compare(before, after, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for path, old_value, new_value, change, worse in rows:
+        if args.only_changes and abs(change) <= args.threshold:
+            continue
+        flag = "  REGRESSION" if worse else ""
+        print(f"{path:{width}}  {old_value:>12}  {new_value:>12}  {change:+8.1f}%{flag}")
+
+    print(f"{regressions} regression(s) beyond {args.threshold}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
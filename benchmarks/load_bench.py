@@ -0,0 +1,310 @@
+"""Offline HTTP and WebSocket load benchmark.
+
+Starts bench_server.py against a scratch database and seeds it with
+schools x users x rooms x messages x help requests. It then drives the
+HTTP routes with concurrent clients, and finally opens thousands of chat
+WebSockets to measure how long a posted message takes to reach every
+socket in the room:
+
+    python benchmarks/load_bench.py --output before.json            # local mongod
+    python benchmarks/load_bench.py --mock --output smoke.json      # mongomock, no mongod needed
+    python benchmarks/compare.py before.json after.json
+
+Mock runs skip the routes mongomock cannot serve: /api/search (no text
+indexes) and GET /api/chat/rooms/{user_id} (no ``$size`` projections).
+Their numbers are only meaningful relative to other mock runs. Thousands of sockets need
+a raised open-file limit (``ulimit -n 65536``).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import websockets
+
+from _common import DEFAULT_MONGO_URL, percentiles, write_results
+from bench_server import dataset_arguments, dataset_from_args
+from seed_data import SUBJECTS
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCHOOL_QUERIES = ["plano", "austin high", "rice", "ut", "westlake", "h"]
+SEARCH_QUERIES = ["derivative", "quadratic equation", "lab report", "thesis citation"]
+GRADES = [
+    {"letter": "A", "credit_hours": 3, "level": "ap"},
+    {"letter": "B+", "credit_hours": 4, "level": "honors"},
+    {"letter": "A-", "credit_hours": 3, "level": "regular"},
+    {"letter": "C", "credit_hours": 1, "level": "regular"},
+]
+
+
+def http_routes(dataset, mock):
+    def user(rng):
+        s = rng.randrange(dataset.schools)
+        return s, dataset.user_id(s, rng.randrange(dataset.users_per_school))
+
+    def room(rng):
+        s = rng.randrange(dataset.schools)
+        r = rng.randrange(dataset.rooms_per_school)
+        return dataset.room_id(s, r), rng.choice(dataset.room_members(s, r))
+
+    def send_message(rng):
+        room_id, user_id = room(rng)
+        return "POST", f"/api/chat/rooms/{room_id}/messages", {"data": {"user_id": user_id, "message": "load test message"}}
+
+    def help_responses(rng):
+        request_id = dataset.help_request_id(rng.randrange(dataset.schools), rng.randrange(max(dataset.help_requests_per_school, 1)))
+        return "GET", f"/api/help-requests/{request_id}/responses", {}
+
+    routes = {
+        "GET /api/schools": lambda rng: ("GET", "/api/schools", {}),
+        "GET /api/schools/search": lambda rng: ("GET", "/api/schools/search", {"params": {"q": rng.choice(SCHOOL_QUERIES)}}),
+        "GET /api/classmates/{user_id}": lambda rng: ("GET", f"/api/classmates/{user(rng)[1]}", {}),
+        "GET /api/help-requests": lambda rng: (
+            "GET", "/api/help-requests", {"params": {"school_id": dataset.school_id(rng.randrange(dataset.schools))}}
+        ),
+        "GET /api/help-requests/{id}/responses": help_responses,
+        "GET /api/chat/rooms/{room_id}/messages": lambda rng: ("GET", f"/api/chat/rooms/{room(rng)[0]}/messages", {}),
+        "GET /api/sync": lambda rng: ("GET", "/api/sync", {"params": {"user_id": user(rng)[1]}}),
+        "POST /api/chat/rooms/{room_id}/messages": send_message,
+        "POST /api/help-requests": lambda rng: ("POST", "/api/help-requests", {"data": {
+            "user_id": user(rng)[1], "title": "Load test question", "subject": rng.choice(SUBJECTS),
+            "description": "How do I solve this one?",
+        }}),
+        "POST /api/gpa-calculator": lambda rng: ("POST", "/api/gpa-calculator", {"json": {"grades": rng.sample(GRADES, 3)}}),
+        "POST /api/mla-format": lambda rng: ("POST", "/api/mla-format", {"json": {
+            "type": "book", "author": "Doe, Jane", "title": f"Load Testing {rng.randint(1, 50)}", "publisher": "Bench Press", "year": "2024",
+        }}),
+    }
+    if not mock:
+        routes["GET /api/chat/rooms/{user_id}"] = lambda rng: ("GET", f"/api/chat/rooms/{user(rng)[1]}", {})
+        routes["GET /api/search"] = lambda rng: ("GET", "/api/search", {
+            "params": {"user_id": user(rng)[1], "q": rng.choice(SEARCH_QUERIES)}
+        })
+    return routes
+
+
+async def run_route(client, build, requests, concurrency, seed):
+    rng = random.Random(seed)
+    samples, errors = [], 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, path, kwargs = build(rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            samples.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return dict(percentiles(samples), rps=round(len(samples) / elapsed, 1), errors=errors)
+
+
+def socket_slots(dataset, count):
+    # One socket per user, spread round-robin over every room
+    rooms = [(s, r) for s in range(dataset.schools) for r in range(dataset.rooms_per_school)]
+    used, slots = set(), []
+    cursors = {room: 0 for room in rooms}
+    while len(slots) < count and rooms:
+        for room in list(rooms):
+            members = dataset.room_members(*room)
+            while cursors[room] < len(members) and members[cursors[room]] in used:
+                cursors[room] += 1
+            if cursors[room] == len(members):
+                rooms.remove(room)
+                continue
+            user_id = members[cursors[room]]
+            used.add(user_id)
+            slots.append((dataset.room_id(*room), user_id))
+            if len(slots) == count:
+                break
+    return slots
+
+
+async def run_websockets(client, ws_url, dataset, clients, messages, connect_concurrency, drain_timeout):
+    slots = socket_slots(dataset, clients)
+    sent, lags = {}, []
+    received = 0
+    all_received = asyncio.Event()
+    expected = 0
+    connect_samples, connect_errors = [], 0
+    sockets = []
+    semaphore = asyncio.Semaphore(connect_concurrency)
+
+    async def listen(ws):
+        nonlocal received
+        try:
+            async for frame in ws:
+                now = time.perf_counter()
+                marker = json.loads(frame).get("message", "")
+                if marker in sent:
+                    lags.append((now - sent[marker]) * 1000)
+                    received += 1
+                    if expected and received >= expected:
+                        all_received.set()
+        except websockets.ConnectionClosed:
+            pass
+
+    async def open_socket(room_id, user_id):
+        nonlocal connect_errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ws = await websockets.connect(f"{ws_url}/ws/chat/{room_id}/{user_id}", open_timeout=30, max_queue=None)
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+                connect_errors += 1
+                return
+            connect_samples.append((time.perf_counter() - start) * 1000)
+            sockets.append((room_id, ws, asyncio.create_task(listen(ws))))
+
+    await asyncio.gather(*(open_socket(room_id, user_id) for room_id, user_id in slots))
+
+    room_sizes = {}
+    for room_id, _, _ in sockets:
+        room_sizes[room_id] = room_sizes.get(room_id, 0) + 1
+    senders = {room_id: user_id for room_id, user_id in slots if room_id in room_sizes}
+    rooms = sorted(room_sizes)
+
+    post_samples = []
+    start = time.perf_counter()
+    for i in range(messages if rooms else 0):
+        room_id = rooms[i % len(rooms)]
+        marker = f"bench:{i}"
+        expected += room_sizes[room_id]
+        sent[marker] = time.perf_counter()
+        await client.post(f"/api/chat/rooms/{room_id}/messages", data={"user_id": senders[room_id], "message": marker})
+        post_samples.append((time.perf_counter() - sent[marker]) * 1000)
+    if expected and received < expected:
+        # The event may have fired mid-run, before later messages raised the target
+        all_received.clear()
+        try:
+            await asyncio.wait_for(all_received.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+    elapsed = time.perf_counter() - start
+
+    for _, ws, task in sockets:
+        await ws.close()
+        task.cancel()
+
+    return {
+        "sockets": len(sockets),
+        "rooms": len(rooms),
+        "connect_errors": connect_errors,
+        "connect_ms": percentiles(connect_samples),
+        "post_ms": percentiles(post_samples),
+        "broadcast_lag_ms": percentiles(lags),
+        "deliveries_expected": expected,
+        "deliveries": received,
+        "deliveries_per_second": round(received / elapsed, 1) if elapsed else 0,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_until_ready(client, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"bench_server.py exited with code {process.returncode}")
+        try:
+            if (await client.get("/api/schools")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+async def run(args, dataset, process):
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_until_ready(client, process, args.startup_timeout)
+        results = {"http": {}, "websocket": None}
+        for i, (name, build) in enumerate(http_routes(dataset, args.mock).items()):
+            if args.routes and not any(part in name for part in args.routes):
+                continue
+            results["http"][name] = await run_route(client, build, args.requests, args.concurrency, seed=i)
+            print(f"{name:44} {results['http'][name]}")
+        if args.ws_clients:
+            ws_url = "ws" + base_url[len("http"):]
+            results["websocket"] = await run_websockets(
+                client, ws_url, dataset, args.ws_clients, args.ws_messages, args.ws_connect_concurrency, args.drain_timeout
+            )
+            print(f"websocket {json.dumps(results['websocket'])}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=DEFAULT_MONGO_URL)
+    parser.add_argument("--db", default="school_connect_bench")
+    parser.add_argument("--mock", action="store_true", help="run the server on mongomock instead of a mongod")
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--url", help="benchmark an already running server seeded with the same dataset options")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=600, help="seconds to wait for seeding and startup")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per HTTP route")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--routes", nargs="*", help="only run HTTP routes whose name contains one of these")
+    parser.add_argument("--ws-clients", type=int, default=2000)
+    parser.add_argument("--ws-messages", type=int, default=200)
+    parser.add_argument("--ws-connect-concurrency", type=int, default=200)
+    parser.add_argument("--drain-timeout", type=float, default=30)
+    parser.add_argument("--output", default="load_bench.json")
+    dataset_arguments(parser)
+    args = parser.parse_args()
+    dataset = dataset_from_args(args)
+
+    process = None
+    if not args.url:
+        command = [sys.executable, str(BENCH_DIR / "bench_server.py"), "--port", str(args.port),
+                   "--mongo-url", args.mongo_url, "--db", args.db]
+        command += ["--mock"] if args.mock else []
+        command += ["--skip-seed"] if args.skip_seed else []
+        for name, value in vars(dataset).items():
+            command += [f"--{name.replace('_', '-')}", str(value)]
+        process = subprocess.Popen(command)
+
+    try:
+        results = asyncio.run(run(args, dataset, process))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    results["meta"] = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "backend": "mongomock" if args.mock else "mongod",
+        "dataset": dataset.describe(),
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+    }
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Search latency benchmark.
+
+Seeds a scratch database with chat messages and help requests, then times
+/api/search queries in-process against it:
+
+    python benchmarks/search_bench.py --messages 10000000 --output search.json
+
+Seeding 10M messages takes a while; pass --skip-seed to reuse a database
+seeded by an earlier run.
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pymongo
+
+from _common import DEFAULT_MONGO_URL, percentiles, write_results
+
+WORDS = (
+    "algebra derivative integral photosynthesis mitosis essay thesis citation "
+    "newton momentum velocity equation quadratic polynomial chemistry molarity "
+    "reaction history revolution constitution amendment novel metaphor poem "
+    "vocabulary spanish conjugation homework quiz exam project lab report"
+).split()
+SUBJECTS = ["Math", "Science", "English", "History", "Spanish"]
+QUERIES = ["derivative", "quadratic equation", "photosynthesis mitosis", "lab report", "thesis citation essay"]
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(db, messages, rooms, users, help_requests, batch=10000):
+    rng = random.Random(42)
+    for name in ("users", "chat_rooms", "chat_messages", "help_requests"):
+        db[name].drop()
+
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    db.users.insert_many([
+        {"id": uid, "name": f"Student {i}", "email": f"s{i}@example.com", "school_id": "bench_school",
+         "school_type": "high_school", "grade_level": "10", "classes": [], "created_at": datetime.now()}
+        for i, uid in enumerate(user_ids)
+    ])
+    room_ids = [f"room_{i}" for i in range(rooms)]
+    db.chat_rooms.insert_many([
+        {"id": rid, "name": rid, "type": "group", "school_id": "bench_school",
+         "members": rng.sample(user_ids, min(30, users)) + [user_ids[0]], "created_by": user_ids[0],
+         "created_at": datetime.now(), "is_secret": False}
+        for rid in room_ids
+    ])
+
+    start = datetime.now() - timedelta(days=365)
+    docs = []
+    for i in range(messages):
+        docs.append({
+            "id": str(uuid.uuid4()), "room_id": rng.choice(room_ids), "user_id": rng.choice(user_ids),
+            "message": sentence(rng), "message_type": "text", "file_urls": [],
+            "created_at": start + timedelta(seconds=i * 3),
+        })
+        if len(docs) == batch:
+            db.chat_messages.insert_many(docs, ordered=False)
+            docs = []
+    if docs:
+        db.chat_messages.insert_many(docs, ordered=False)
+
+    db.help_requests.insert_many([
+        {"id": str(uuid.uuid4()), "user_id": rng.choice(user_ids), "school_id": "bench_school",
+         "title": sentence(rng, 6), "subject": rng.choice(SUBJECTS), "description": sentence(rng, 40),
+         "image_urls": [], "response_count": 0, "latest_response": None, "status": "open",
+         "created_at": start + timedelta(minutes=i)}
+        for i in range(help_requests)
+    ])
+    return user_ids[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=DEFAULT_MONGO_URL)
+    parser.add_argument("--db", default="school_connect_bench")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--rooms", type=int, default=2_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--help-requests", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--output", default="search_bench.json")
+    args = parser.parse_args()
+
+    import server
+
+    server.use_database(pymongo.MongoClient(args.mongo_url)[args.db])
+    if args.skip_seed:
+        user_id = server.db.chat_rooms.find_one({"id": "room_0"})["members"][-1]
+    else:
+        user_id = seed(server.db, args.messages, args.rooms, args.users, args.help_requests)
+    server.ensure_indexes()
+
+    results = {"messages": server.db.chat_messages.estimated_document_count(), "queries": {}}
+    loop = asyncio.new_event_loop()
+    for scope in ("messages", "help_requests", "all"):
+        for query in QUERIES:
+            samples = []
+            for _ in range(args.iterations):
+                start = loop.time()
+                loop.run_until_complete(server.search(user_id=user_id, q=query, scope=scope, limit=20))
+                samples.append((loop.time() - start) * 1000)
+            results["queries"][f"{scope}:{query}"] = percentiles(samples)
+            print(f"{scope:14} {query:24} {results['queries'][f'{scope}:{query}']}")
+
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Deterministic benchmark dataset: schools x users x rooms x messages x help requests.
+
+Ids are derived from positions (``bench_u_3_17`` is user 17 of school 3), so
+the load driver can address any seeded document without reading the
+database back.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import _common  # noqa: F401  (puts backend/ on sys.path)
+from partition import partition_key
+
+SUBJECTS = ["Math", "Science", "English", "History", "Spanish", "Computer Science"]
+GRADE_LEVELS = ["9", "10", "11", "12"]
+WORDS = (
+    "algebra derivative integral photosynthesis mitosis essay thesis citation newton momentum "
+    "velocity equation quadratic polynomial chemistry molarity reaction revolution constitution "
+    "novel metaphor poem vocabulary conjugation homework quiz exam project lab report due tomorrow"
+).split()
+COLLECTIONS = ("users", "chat_rooms", "chat_messages", "chat_message_buckets", "help_requests", "help_responses", "counters")
+
+
+@dataclass
+class Dataset:
+    schools: int = 20
+    users_per_school: int = 250
+    rooms_per_school: int = 10
+    room_size: int = 40
+    messages_per_room: int = 500
+    help_requests_per_school: int = 200
+    responses_per_request: int = 3
+
+    def school_id(self, s: int) -> str:
+        return f"bench_school_{s}"
+
+    def user_id(self, s: int, u: int) -> str:
+        return f"bench_u_{s}_{u}"
+
+    def room_id(self, s: int, r: int) -> str:
+        # Room 0 of each school is its school-wide room, as created by /api/register
+        return f"school_{self.school_id(s)}" if r == 0 else f"bench_r_{s}_{r}"
+
+    def room_members(self, s: int, r: int):
+        if r == 0:
+            return [self.user_id(s, u) for u in range(self.users_per_school)]
+        first = (r * self.room_size) % self.users_per_school
+        return [self.user_id(s, (first + i) % self.users_per_school) for i in range(min(self.room_size, self.users_per_school))]
+
+    def help_request_id(self, s: int, h: int) -> str:
+        return f"bench_h_{s}_{h}"
+
+    def describe(self):
+        return {
+            "schools": self.schools,
+            "users": self.schools * self.users_per_school,
+            "rooms": self.schools * self.rooms_per_school,
+            "messages": self.schools * self.rooms_per_school * self.messages_per_room,
+            "help_requests": self.schools * self.help_requests_per_school,
+            "help_responses": self.schools * self.help_requests_per_school * self.responses_per_request,
+        }
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(db, dataset: Dataset, batch: int = 10_000):
+    rng = random.Random(42)
+    for name in COLLECTIONS:
+        db[name].drop()
+
+    version = 0
+
+    def stamp():
+        nonlocal version
+        version += 1
+        return version
+
+    now = datetime.now()
+    for s in range(dataset.schools):
+        school_id = dataset.school_id(s)
+        # Bench schools are not in the catalog, so they partition as independent schools
+        pk = partition_key(school_id)
+        db.users.insert_many([{
+            "id": dataset.user_id(s, u), "pk": pk, "name": f"Student {s}-{u}", "email": f"s{s}_{u}@example.com",
+            "school_id": school_id, "school_type": "high_school", "grade_level": rng.choice(GRADE_LEVELS),
+            "classes": [{"subject": subject, "teacher": f"Teacher {rng.randint(1, 30)}"} for subject in rng.sample(SUBJECTS, 4)],
+            "gpa": None, "created_at": now - timedelta(days=400), "version": stamp(),
+        } for u in range(dataset.users_per_school)])
+
+        db.chat_rooms.insert_many([{
+            "id": dataset.room_id(s, r), "pk": pk, "name": f"Room {s}-{r}", "type": "school" if r == 0 else "group",
+            "school_id": school_id, "members": dataset.room_members(s, r), "created_by": dataset.user_id(s, 0),
+            "created_at": now - timedelta(days=400), "is_secret": False, "version": stamp(),
+        } for r in range(dataset.rooms_per_school)])
+
+        docs = []
+        for r in range(dataset.rooms_per_school):
+            members = dataset.room_members(s, r)
+            start = now - timedelta(minutes=dataset.messages_per_room)
+            for m in range(dataset.messages_per_room):
+                docs.append({
+                    "id": f"bench_m_{s}_{r}_{m}", "pk": pk, "room_id": dataset.room_id(s, r), "user_id": rng.choice(members),
+                    "message": _sentence(rng, rng.randint(4, 20)), "message_type": "text", "file_urls": [],
+                    "created_at": start + timedelta(minutes=m), "version": stamp(),
+                })
+                if len(docs) >= batch:
+                    db.chat_messages.insert_many(docs, ordered=False)
+                    docs = []
+        if docs:
+            db.chat_messages.insert_many(docs, ordered=False)
+
+        requests, responses = [], []
+        for h in range(dataset.help_requests_per_school):
+            request_id = dataset.help_request_id(s, h)
+            created = now - timedelta(hours=dataset.help_requests_per_school - h)
+            latest = None
+            for i in range(dataset.responses_per_request):
+                response = {
+                    "id": f"{request_id}_r{i}", "pk": pk, "request_id": request_id,
+                    "user_id": dataset.user_id(s, rng.randrange(dataset.users_per_school)),
+                    "message": _sentence(rng, 25), "file_urls": [], "created_at": created + timedelta(minutes=i + 1),
+                }
+                responses.append(response)
+                latest = {key: response[key] for key in ("id", "user_id", "message", "created_at")}
+            requests.append({
+                "id": request_id, "pk": pk, "user_id": dataset.user_id(s, rng.randrange(dataset.users_per_school)),
+                "school_id": school_id, "title": _sentence(rng, 6), "subject": rng.choice(SUBJECTS),
+                "description": _sentence(rng, 40), "image_urls": [],
+                "response_count": dataset.responses_per_request, "latest_response": latest,
+                "status": "answered" if latest else "open", "created_at": created, "version": stamp(),
+            })
+        if requests:
+            db.help_requests.insert_many(requests, ordered=False)
+        if responses:
+            db.help_responses.insert_many(responses, ordered=False)
+    return dataset.describe()
@@ -0,0 +1,89 @@
+"""Response serialization benchmark.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with the
+orjson-based encoder in serialization.py on two representative payloads:
+a 50-message chat history page and a 500-item help feed.
+
+    python benchmarks/serialization_bench.py --output serialization.json
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from _common import percentiles, write_results
+from serialization import dumps
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:  # still report the stdlib baseline without FastAPI installed
+    jsonable_encoder = None
+
+
+def history_page(rng, size=50):
+    start = datetime.now() - timedelta(hours=2)
+    return [{
+        "id": str(uuid.uuid4()), "room_id": "school_plano_east", "user_id": str(uuid.uuid4()),
+        "message": " ".join(rng.choice(["homework", "quiz", "due", "tomorrow", "chapter", "help"]) for _ in range(15)),
+        "message_type": "text", "file_urls": [], "created_at": start + timedelta(seconds=i * 30),
+        "user_name": f"Student {i}", "user_email": f"student{i}@example.com",
+    } for i in range(size)]
+
+
+def help_feed(rng, size=500):
+    start = datetime.now() - timedelta(days=30)
+    return [{
+        "id": str(uuid.uuid4()), "user_id": str(uuid.uuid4()), "school_id": "plano_east",
+        "title": f"Question {i} about chapter {rng.randint(1, 20)}", "subject": rng.choice(["Math", "Science", "English"]),
+        "description": "I am stuck on this problem and could use a hint. " * 4,
+        "image_urls": [f"/uploads/{uuid.uuid4()}_0.png"], "response_count": rng.randint(0, 12),
+        "latest_response": {"id": str(uuid.uuid4()), "user_id": str(uuid.uuid4()), "message": "Try factoring first.",
+                            "created_at": start + timedelta(hours=i, minutes=5), "user_name": "Helper"},
+        "status": "open", "created_at": start + timedelta(hours=i),
+        "user_name": f"Student {i}", "user_email": f"student{i}@example.com", "user_school": "plano_east",
+    } for i in range(size)]
+
+
+def baseline(content):
+    # FastAPI's JSONResponse path when a route returns plain Python objects
+    if jsonable_encoder is not None:
+        content = jsonable_encoder(content)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def measure(fn, payload, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(payload)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--output", default="serialization_bench.json")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    payloads = {"history_page_50": history_page(rng), "help_feed_500": help_feed(rng)}
+    results = {"baseline": "jsonable_encoder+json.dumps" if jsonable_encoder else "json.dumps(default=str)"}
+    for name, payload in payloads.items():
+        results[name] = {
+            "bytes": len(dumps(payload)),
+            "baseline_ms": measure(baseline, payload, args.iterations),
+            "orjson_ms": measure(dumps, payload, args.iterations),
+        }
+        speedup = results[name]["baseline_ms"]["p50"] / max(results[name]["orjson_ms"]["p50"], 1e-6)
+        results[name]["p50_speedup"] = round(speedup, 1)
+        print(f"{name}: {results[name]['bytes']} bytes, p50 speedup x{results[name]['p50_speedup']}")
+
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Backend startup benchmark.
+
+Measures, over several cold starts:
+
+- import_seconds: how long ``import server`` takes in a fresh interpreter
+- healthz_seconds: time from spawning uvicorn until /healthz answers
+- readyz_seconds: time from spawning uvicorn until /readyz answers 200
+  (Mongo reachable, indexes bootstrapped)
+
+    python benchmarks/startup_bench.py --runs 5 --output startup.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from _common import BACKEND_DIR, DEFAULT_MONGO_URL, percentiles, write_results
+
+
+def time_import():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import server"], cwd=BACKEND_DIR, check=True)
+    return time.perf_counter() - start
+
+
+def status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+def time_serve(port, timeout, env):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    healthz = readyz = None
+    try:
+        while time.perf_counter() - start < timeout and readyz is None:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            if healthz is None and status(f"http://127.0.0.1:{port}/healthz") == 200:
+                healthz = time.perf_counter() - start
+            if healthz is not None and status(f"http://127.0.0.1:{port}/readyz") == 200:
+                readyz = time.perf_counter() - start
+            time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return healthz, readyz
+
+
+def milliseconds(seconds):
+    return "timeout" if seconds is None else f"{seconds * 1000:.0f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=DEFAULT_MONGO_URL)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", default="startup_bench.json")
+    args = parser.parse_args()
+
+    env = dict(os.environ, MONGO_URL=args.mongo_url)
+    imports, healthz, readyz = [], [], []
+    for run in range(args.runs):
+        imports.append(time_import() * 1000)
+        up, ready = time_serve(args.port, args.timeout, env)
+        if up is not None:
+            healthz.append(up * 1000)
+        if ready is not None:
+            readyz.append(ready * 1000)
+        print(f"run {run + 1}: import {imports[-1]:.0f}ms, healthz {milliseconds(up)}, readyz {milliseconds(ready)}")
+
+    write_results(args.output, {
+        "import_ms": percentiles(imports),
+        "healthz_ms": percentiles(healthz),
+        "readyz_ms": percentiles(readyz),
+        "readyz_timeouts": args.runs - len(readyz),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,22 @@ uvicorn server:app --host 0.0.0.0 --port 8001 &
 BACKEND_PID=$!
 
 echo "Waiting for backend to start..."
-sleep 30
-
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+# Poll liveness instead of sleeping; /readyz additionally waits for Mongo and indexes
+TRIES=0
+until wget -q -O /dev/null http://127.0.0.1:8001/healthz 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    TRIES=$((TRIES + 1))
+    if [ $TRIES -ge 120 ]; then
+        echo "Backend did not answer /healthz within 60 seconds, exiting"
+        kill $BACKEND_PID
+        exit 1
+    fi
+    sleep 0.5
+done
+echo "Backend is up"
 
 # Start Nginx
 nginx -g 'daemon off;' &
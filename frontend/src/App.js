@@ -3,23 +3,30 @@ import './App.css';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+// Local uploads are served by the backend; object-store URLs are already absolute
+const fileUrl = (url) => (/^https?:\/\//.test(url) ? url : `${BACKEND_URL}${url}`);
+
 function App() {
   const [currentUser, setCurrentUser] = useState(null);
   const [activeView, setActiveView] = useState('register');
-  const [schools, setSchools] = useState({ high_schools: [], colleges: [] });
+  const [schoolQuery, setSchoolQuery] = useState('');
+  const [schoolMatches, setSchoolMatches] = useState([]);
   const [classmates, setClassmates] = useState([]);
   const [helpRequests, setHelpRequests] = useState([]);
+  const [helpResponses, setHelpResponses] = useState({});
   const [chatRooms, setChatRooms] = useState([]);
   const [activeChatRoom, setActiveChatRoom] = useState(null);
   const [chatMessages, setChatMessages] = useState([]);
   const [loading, setLoading] = useState(false);
   const [ws, setWs] = useState(null);
+  const [roomPresence, setRoomPresence] = useState({ online_count: 0, typing: [] });
 
   // Registration form state
   const [registrationForm, setRegistrationForm] = useState({
     name: '',
     email: '',
     school_id: '',
+    school_name: '',
     school_type: 'high_school',
     grade_level: '',
     classes: []
@@ -71,12 +78,27 @@ function App() {
   // Refs
   const messagesEndRef = useRef(null);
   const fileInputRef = useRef(null);
+  const heartbeatRef = useRef(null);
+  const lastTypingSentRef = useRef(0);
+  // Chat session resume: newest message id seen per room, and reconnect backoff state
+  const lastSeenRef = useRef({});
+  const chatSocketRef = useRef(null);
+  const reconnectRef = useRef({ timer: null, attempt: 0, hint: { base_ms: 500, max_ms: 30000, restart_spread_ms: 10000 } });
+  const helpEventsRef = useRef(null);
 
   useEffect(() => {
-    fetchSchools();
     fetchAcademicResources();
   }, []);
 
+  useEffect(() => {
+    if (!schoolQuery.trim() || schoolQuery === registrationForm.school_name) {
+      setSchoolMatches([]);
+      return;
+    }
+    const timer = setTimeout(() => searchSchools(schoolQuery, registrationForm.school_type), 150);
+    return () => clearTimeout(timer);
+  }, [schoolQuery, registrationForm.school_type]);
+
   useEffect(() => {
     if (currentUser) {
       fetchClassmates();
@@ -85,15 +107,67 @@ function App() {
     }
   }, [currentUser]);
 
+  useEffect(() => {
+    if (!currentUser) return;
+    const wsBase = BACKEND_URL.replace(/^http/, 'ws');
+    // Same backoff as the chat socket; events missed while disconnected are refetched
+    const state = { timer: null, attempt: 0 };
+    const connect = () => {
+      const eventsWs = new WebSocket(`${wsBase}/ws/help-requests/${currentUser.school_id}/${currentUser.id}`);
+      helpEventsRef.current = eventsWs;
+      eventsWs.onopen = () => {
+        if (state.attempt > 0) {
+          fetchHelpRequests();
+        }
+        state.attempt = 0;
+      };
+      eventsWs.onmessage = (event) => applyHelpEvent(JSON.parse(event.data));
+      eventsWs.onclose = (event) => {
+        state.timer = setTimeout(connect, reconnectDelay(state, event.code));
+      };
+    };
+    connect();
+    return () => {
+      clearTimeout(state.timer);
+      // Detach first so logging out does not trigger a reconnect
+      helpEventsRef.current.onclose = null;
+      helpEventsRef.current.close();
+      helpEventsRef.current = null;
+    };
+  }, [currentUser]);
+
+  const applyHelpEvent = ({ type, data }) => {
+    if (type === 'help_request.created') {
+      setHelpRequests(prev => prev.some(req => req.id === data.id) ? prev : [data, ...prev]);
+    } else if (type === 'help_request.responded') {
+      setHelpRequests(prev => prev.map(req => req.id === data.request_id
+        ? { ...req, response_count: data.response_count, latest_response: data.latest_response }
+        : req));
+      setHelpResponses(prev => {
+        const { [data.request_id]: _, ...rest } = prev;
+        return rest;
+      });
+    } else if (type === 'status_changed') {
+      setHelpRequests(prev => prev.map(req => req.id === data.request_id ? { ...req, status: data.status } : req));
+    }
+  };
+
   useEffect(() => {
     if (activeChatRoom) {
       fetchChatMessages();
+      fetchRoomPresence();
       connectWebSocket();
     }
     return () => {
-      if (ws) {
-        ws.close();
+      clearTimeout(reconnectRef.current.timer);
+      reconnectRef.current.attempt = 0;
+      if (chatSocketRef.current) {
+        // Detach first so leaving the room does not trigger a reconnect
+        chatSocketRef.current.onclose = null;
+        chatSocketRef.current.close();
+        chatSocketRef.current = null;
       }
+      clearInterval(heartbeatRef.current);
     };
   }, [activeChatRoom]);
 
@@ -105,31 +179,102 @@ function App() {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  const rememberLastSeen = (roomId, messages) => {
+    if (messages.length) {
+      lastSeenRef.current[roomId] = messages[messages.length - 1].id;
+    }
+  };
+
+  const reconnectDelay = (state, closeCode) => {
+    // Full jitter; after a server restart (1012) the first attempt is spread out too
+    const { base_ms, max_ms, restart_spread_ms } = reconnectRef.current.hint;
+    const spread = closeCode === 1012 && state.attempt === 0
+      ? restart_spread_ms
+      : Math.min(max_ms, base_ms * 2 ** state.attempt);
+    state.attempt += 1;
+    return Math.random() * spread;
+  };
+
+  const scheduleReconnect = (closeCode) => {
+    const state = reconnectRef.current;
+    clearTimeout(state.timer);
+    state.timer = setTimeout(connectWebSocket, reconnectDelay(state, closeCode));
+  };
+
   const connectWebSocket = () => {
     if (currentUser && activeChatRoom) {
-      const wsUrl = `ws://localhost:8001/ws/chat/${activeChatRoom.id}/${currentUser.id}`;
+      const roomId = activeChatRoom.id;
+      const wsBase = BACKEND_URL.replace(/^http/, 'ws');
+      const lastSeen = lastSeenRef.current[roomId];
+      const wsUrl = `${wsBase}/ws/chat/${roomId}/${currentUser.id}${lastSeen ? `?last_seen=${encodeURIComponent(lastSeen)}` : ''}`;
       const newWs = new WebSocket(wsUrl);
+      chatSocketRef.current = newWs;
+
+      newWs.onopen = () => {
+        // The server drops sockets that stay silent past the presence timeout
+        clearInterval(heartbeatRef.current);
+        heartbeatRef.current = setInterval(() => {
+          if (newWs.readyState === WebSocket.OPEN) {
+            newWs.send(JSON.stringify({ type: 'heartbeat' }));
+          }
+        }, 15000);
+      };
       
       newWs.onmessage = (event) => {
-        const message = JSON.parse(event.data);
-        setChatMessages(prev => [...prev, message]);
+        const frame = JSON.parse(event.data);
+        if (frame.type === 'presence') {
+          setRoomPresence({ online_count: frame.online_count, typing: frame.typing });
+        } else if (frame.type === 'session') {
+          // Replayed frames (if any) arrived before this; "reset" means the gap was too large
+          reconnectRef.current.attempt = 0;
+          reconnectRef.current.hint = frame.reconnect || reconnectRef.current.hint;
+          if (frame.source === 'reset') {
+            fetchChatMessages();
+          }
+        } else if (!frame.type) {
+          lastSeenRef.current[roomId] = frame.id;
+          // Replay and live broadcasts can overlap right after a reconnect
+          setChatMessages(prev => prev.some(message => message.id === frame.id) ? prev : [...prev, frame]);
+        }
       };
 
-      newWs.onclose = () => {
+      newWs.onclose = (event) => {
+        clearInterval(heartbeatRef.current);
         console.log('WebSocket disconnected');
+        scheduleReconnect(event.code);
       };
 
       setWs(newWs);
     }
   };
 
-  const fetchSchools = async () => {
+  const fetchRoomPresence = async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/schools`);
+      const response = await fetch(`${BACKEND_URL}/api/chat/rooms/${activeChatRoom.id}/presence`);
       const data = await response.json();
-      setSchools(data);
+      setRoomPresence({ online_count: data.online_count, typing: data.typing });
     } catch (error) {
-      console.error('Error fetching schools:', error);
+      console.error('Error fetching room presence:', error);
+    }
+  };
+
+  const sendTyping = () => {
+    // The server throttles too; this just avoids a frame per keystroke
+    const now = Date.now();
+    if (ws && ws.readyState === WebSocket.OPEN && now - lastTypingSentRef.current > 2000) {
+      lastTypingSentRef.current = now;
+      ws.send(JSON.stringify({ type: 'typing', typing: true }));
+    }
+  };
+
+  const searchSchools = async (query, schoolType) => {
+    try {
+      const params = new URLSearchParams({ q: query, school_type: schoolType, limit: 8 });
+      const response = await fetch(`${BACKEND_URL}/api/schools/search?${params}`);
+      const data = await response.json();
+      setSchoolMatches(data.results);
+    } catch (error) {
+      console.error('Error searching schools:', error);
     }
   };
 
@@ -153,6 +298,20 @@ function App() {
     }
   };
 
+  const fetchHelpResponses = async (requestId) => {
+    const loaded = helpResponses[requestId]?.items || [];
+    try {
+      const response = await fetch(`${BACKEND_URL}/api/help-requests/${requestId}/responses?skip=${loaded.length}&limit=20`);
+      const data = await response.json();
+      setHelpResponses(prev => ({
+        ...prev,
+        [requestId]: { items: [...loaded, ...data.responses], total: data.total }
+      }));
+    } catch (error) {
+      console.error('Error fetching help responses:', error);
+    }
+  };
+
   const fetchChatRooms = async () => {
     try {
       const response = await fetch(`${BACKEND_URL}/api/chat/rooms/${currentUser.id}`);
@@ -170,6 +329,7 @@ function App() {
       const response = await fetch(`${BACKEND_URL}/api/chat/rooms/${activeChatRoom.id}/messages`);
       const data = await response.json();
       setChatMessages(data);
+      rememberLastSeen(activeChatRoom.id, data);
     } catch (error) {
       console.error('Error fetching chat messages:', error);
     }
@@ -187,6 +347,10 @@ function App() {
 
   const handleRegistration = async (e) => {
     e.preventDefault();
+    if (!registrationForm.school_id) {
+      alert('Please pick your school from the list');
+      return;
+    }
     setLoading(true);
     
     try {
@@ -237,6 +401,29 @@ function App() {
     setRegistrationForm({ ...registrationForm, classes: updatedClasses });
   };
 
+  const uploadFiles = async (files, kind) => {
+    // Presign each file, PUT it straight to storage, and return the keys to attach
+    const keys = [];
+    for (let file of files) {
+      const contentType = file.type || 'application/octet-stream';
+      const presign = await fetch(`${BACKEND_URL}/api/uploads/presign`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-User-Id': currentUser.id },
+        body: JSON.stringify({ user_id: currentUser.id, kind, filename: file.name, content_type: contentType, size: file.size })
+      });
+      if (!presign.ok) throw new Error(`Could not upload ${file.name}`);
+      const { file_key, upload } = await presign.json();
+      const stored = await fetch(fileUrl(upload.url), {
+        method: upload.method,
+        headers: upload.headers,
+        body: file
+      });
+      if (!stored.ok) throw new Error(`Could not upload ${file.name}`);
+      keys.push(file_key);
+    }
+    return keys;
+  };
+
   const createHelpRequest = async (e) => {
     e.preventDefault();
     
@@ -246,19 +433,22 @@ function App() {
     formData.append('description', helpForm.description);
     formData.append('user_id', currentUser.id);
     
-    for (let file of helpForm.files) {
-      formData.append('files', file);
-    }
-    
     try {
+      for (let key of await uploadFiles(helpForm.files, 'help_request')) {
+        formData.append('file_keys', key);
+      }
       const response = await fetch(`${BACKEND_URL}/api/help-requests`, {
         method: 'POST',
+        headers: { 'X-User-Id': currentUser.id },
         body: formData
       });
       
       if (response.ok) {
         setHelpForm({ title: '', subject: '', description: '', files: [] });
-        fetchHelpRequests();
+        // The help-events socket delivers the new request; refetch if it is down
+        if (helpEventsRef.current?.readyState !== WebSocket.OPEN) {
+          fetchHelpRequests();
+        }
         alert('Help request posted! 📚');
       }
     } catch (error) {
@@ -271,18 +461,17 @@ function App() {
     formData.append('user_id', currentUser.id);
     formData.append('message', responseText);
     
-    for (let file of files) {
-      formData.append('files', file);
-    }
-    
     try {
+      for (let key of await uploadFiles(files, 'help_response')) {
+        formData.append('file_keys', key);
+      }
       const response = await fetch(`${BACKEND_URL}/api/help-requests/${requestId}/respond`, {
         method: 'POST',
+        headers: { 'X-User-Id': currentUser.id },
         body: formData
       });
       
       if (response.ok) {
-        fetchHelpRequests();
         alert('Response sent! 💬');
       }
     } catch (error) {
@@ -322,6 +511,7 @@ function App() {
     try {
       const response = await fetch(`${BACKEND_URL}/api/chat/rooms/${activeChatRoom.id}/messages`, {
         method: 'POST',
+        headers: { 'X-User-Id': currentUser.id },
         body: formData
       });
       
@@ -407,9 +597,7 @@ function App() {
 
   const getCurrentSchoolName = () => {
     if (!currentUser) return '';
-    const schoolList = currentUser.school_type === 'high_school' ? schools.high_schools : schools.colleges;
-    const school = schoolList.find(s => s.id === currentUser.school_id);
-    return school ? school.name : currentUser.school_id;
+    return currentUser.school_name || currentUser.school_id;
   };
 
   if (!currentUser) {
@@ -452,24 +640,49 @@ function App() {
               <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-4">
                 <select
                   value={registrationForm.school_type}
-                  onChange={(e) => setRegistrationForm({...registrationForm, school_type: e.target.value, school_id: ''})}
+                  onChange={(e) => {
+                    setRegistrationForm({...registrationForm, school_type: e.target.value, school_id: '', school_name: ''});
+                    setSchoolQuery('');
+                  }}
                   className="border-2 border-gray-200 rounded-xl px-4 py-3 focus:ring-2 focus:ring-blue-500 focus:border-transparent transition-all"
                 >
                   <option value="high_school">High School</option>
                   <option value="college">College</option>
                 </select>
 
-                <select
-                  value={registrationForm.school_id}
-                  onChange={(e) => setRegistrationForm({...registrationForm, school_id: e.target.value})}
-                  className="border-2 border-gray-200 rounded-xl px-4 py-3 focus:ring-2 focus:ring-blue-500 focus:border-transparent transition-all"
-                  required
-                >
-                  <option value="">Select School</option>
-                  {(registrationForm.school_type === 'high_school' ? schools.high_schools : schools.colleges).map(school => (
-                    <option key={school.id} value={school.id}>{school.name}</option>
-                  ))}
-                </select>
+                <div className="relative">
+                  <input
+                    type="text"
+                    placeholder="Search for your school"
+                    value={schoolQuery}
+                    onChange={(e) => {
+                      setSchoolQuery(e.target.value);
+                      setRegistrationForm({...registrationForm, school_id: '', school_name: ''});
+                    }}
+                    className="w-full border-2 border-gray-200 rounded-xl px-4 py-3 focus:ring-2 focus:ring-blue-500 focus:border-transparent transition-all"
+                    required
+                  />
+                  {schoolMatches.length > 0 && (
+                    <ul className="absolute z-10 w-full bg-white border-2 border-gray-200 rounded-xl mt-1 shadow-lg max-h-64 overflow-y-auto">
+                      {schoolMatches.map(school => (
+                        <li key={school.id}>
+                          <button
+                            type="button"
+                            onClick={() => {
+                              setRegistrationForm({...registrationForm, school_id: school.id, school_name: school.name});
+                              setSchoolQuery(school.name);
+                              setSchoolMatches([]);
+                            }}
+                            className="w-full text-left px-4 py-2 hover:bg-blue-50"
+                          >
+                            <span className="font-medium">{school.name}</span>
+                            <span className="text-sm text-gray-500 ml-2">{school.city}</span>
+                          </button>
+                        </li>
+                      ))}
+                    </ul>
+                  )}
+                </div>
 
                 <input
                   type="text"
@@ -570,6 +783,8 @@ function App() {
     );
   }
 
+  const othersTyping = roomPresence.typing.filter(id => id !== currentUser.id);
+
   return (
     <div className="min-h-screen bg-gray-50 flex">
       {/* Sidebar */}
@@ -735,7 +950,7 @@ function App() {
                     >
                       <div className="font-semibold">{room.name}</div>
                       <div className={`text-sm ${activeChatRoom?.id === room.id ? 'text-blue-100' : 'text-gray-500'}`}>
-                        {room.type === 'school' ? '🏫' : room.is_secret ? '🔒' : '👥'} {room.members.length} members
+                        {room.type === 'school' ? '🏫' : room.is_secret ? '🔒' : '👥'} {room.member_count} members · {room.online_count} online
                       </div>
                     </button>
                   ))}
@@ -797,6 +1012,7 @@ function App() {
                       <p className="text-sm text-gray-600">
                         {activeChatRoom.type === 'school' ? '🏫 School Chat' : 
                          activeChatRoom.is_secret ? '🔒 Secret Group' : '👥 Public Group'}
+                        {' · '}{roomPresence.online_count} online
                       </p>
                     </div>
 
@@ -816,7 +1032,7 @@ function App() {
                               {message.file_urls && message.file_urls.length > 0 && (
                                 <div className="mt-2">
                                   {message.file_urls.map((url, index) => (
-                                    <img key={index} src={`${BACKEND_URL}${url}`} alt="attachment" className="max-w-full rounded" />
+                                    <img key={index} src={fileUrl(url)} alt="attachment" className="max-w-full rounded" />
                                   ))}
                                 </div>
                               )}
@@ -830,12 +1046,21 @@ function App() {
                       </div>
                     </div>
 
+                    {othersTyping.length > 0 && (
+                      <div className="px-4 text-xs text-gray-500">
+                        {othersTyping.length === 1 ? 'Someone is typing…' : `${othersTyping.length} people are typing…`}
+                      </div>
+                    )}
+
                     <div className="p-4 border-t border-gray-200">
                       <div className="flex space-x-2">
                         <input
                           type="text"
                           value={newMessage}
-                          onChange={(e) => setNewMessage(e.target.value)}
+                          onChange={(e) => {
+                            setNewMessage(e.target.value);
+                            sendTyping();
+                          }}
                           onKeyPress={(e) => e.key === 'Enter' && sendChatMessage()}
                           placeholder="Type your message..."
                           className="flex-1 border rounded-lg px-4 py-2 focus:ring-2 focus:ring-blue-500"
@@ -992,10 +1217,10 @@ function App() {
                               {request.image_urls.map((url, index) => (
                                 <img
                                   key={index}
-                                  src={`${BACKEND_URL}${url}`}
+                                  src={fileUrl(url)}
                                   alt="Homework attachment"
                                   className="w-24 h-24 object-cover rounded-lg border-2 border-gray-200 hover:border-blue-400 transition-all cursor-pointer"
-                                  onClick={() => window.open(`${BACKEND_URL}${url}`, '_blank')}
+                                  onClick={() => window.open(fileUrl(url), '_blank')}
                                 />
                               ))}
                             </div>
@@ -1003,12 +1228,12 @@ function App() {
                         )}
 
                         {/* Responses */}
-                        {request.responses.length > 0 && (
+                        {request.response_count > 0 && (
                           <div className="mb-4">
-                            <h4 className="font-semibold mb-3 text-gray-700">💬 Responses:</h4>
+                            <h4 className="font-semibold mb-3 text-gray-700">💬 Responses ({request.response_count}):</h4>
                             <div className="space-y-3">
-                              {request.responses.map((response, index) => (
-                                <div key={index} className="bg-gray-50 rounded-lg p-4 border-l-4 border-green-500">
+                              {(helpResponses[request.id]?.items || (request.latest_response ? [request.latest_response] : [])).map((response) => (
+                                <div key={response.id} className="bg-gray-50 rounded-lg p-4 border-l-4 border-green-500">
                                   <div className="flex justify-between items-start mb-2">
                                     <span className="font-medium text-green-700">{response.user_name}</span>
                                     <span className="text-xs text-gray-500">
@@ -1021,7 +1246,7 @@ function App() {
                                       {response.file_urls.map((url, idx) => (
                                         <img
                                           key={idx}
-                                          src={`${BACKEND_URL}${url}`}
+                                          src={fileUrl(url)}
                                           alt="Response attachment"
                                           className="w-16 h-16 object-cover rounded border"
                                         />
@@ -1031,6 +1256,15 @@ function App() {
                                 </div>
                               ))}
                             </div>
+                            {(helpResponses[request.id]?.items.length || 0) < request.response_count && (
+                              <button
+                                type="button"
+                                onClick={() => fetchHelpResponses(request.id)}
+                                className="mt-3 text-sm text-blue-600 hover:text-blue-800 font-medium"
+                              >
+                                {helpResponses[request.id] ? 'Load more responses' : `View all ${request.response_count} responses`}
+                              </button>
+                            )}
                           </div>
                         )}
 
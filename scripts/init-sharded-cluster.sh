@@ -0,0 +1,32 @@
+#!/bin/bash
+# Initiates the replica sets of docker-compose.sharded.yml and registers both shards with mongos.
+set -e
+
+wait_for() {
+    until mongosh --quiet "mongodb://$1" --eval 'db.adminCommand({ping: 1}).ok' >/dev/null 2>&1; do
+        sleep 1
+    done
+}
+
+initiate() {
+    # host:port, replica set name, extra replica set options
+    wait_for "$1"
+    mongosh --quiet "mongodb://$1" --eval "
+        try { rs.status() } catch (e) {
+            rs.initiate({_id: '$2', $3 members: [{_id: 0, host: '$1'}]})
+        }"
+}
+
+initiate config:27019 config "configsvr: true,"
+initiate shard1:27018 shard1
+initiate shard2:27018 shard2
+
+wait_for mongos:27017
+# Retried until both shards have elected a primary
+until mongosh --quiet "mongodb://mongos:27017" --eval "
+    sh.addShard('shard1/shard1:27018');
+    sh.addShard('shard2/shard2:27018');
+"; do
+    sleep 2
+done
+echo "Sharded cluster ready on mongos:27017"
@@ -0,0 +1,33 @@
+import citations
+
+
+def test_empty_fields_leave_no_stray_punctuation():
+    assert citations.format_citation({"type": "book", "title": "Dune", "year": "1965"}) == "Dune. 1965."
+    assert citations.format_citation({"type": "podcast", "title": "Dune"}) is None
+
+
+def test_works_cited_sorts_and_dedupes_ignoring_articles_and_case():
+    entries, errors = citations.build_works_cited([
+        {"type": "book", "author": "Herbert, Frank", "title": "The Zebra"},
+        {"type": "book", "author": "Adams, Douglas", "title": "Hitchhiker"},
+        {"type": "book", "author": "herbert, frank", "title": "the zebra"},
+    ])
+    assert [entry["index"] for entry in entries] == [1, 0]
+    assert entries[1]["duplicates"] == [2]
+    assert errors == []
+
+
+def test_invalid_sources_are_reported_by_index():
+    entries, errors = citations.build_works_cited([
+        "not a source",
+        {"type": "website", "title": "Page", "website": "Site"},
+        {"type": "podcast", "title": "Episode"},
+    ])
+    assert [entry["index"] for entry in entries] == [1]
+    assert errors == [
+        {"index": 0, "error": "Source must be an object"},
+        {"index": 2, "error": "Unsupported source type: podcast"},
+    ]
+    text = "".join(citations.iter_text(entries, errors))
+    assert text.startswith('Works Cited\n\n"Page" Site.\n')
+    assert text.endswith("Skipped sources\n\n0: Source must be an object\n2: Unsupported source type: podcast\n")
@@ -0,0 +1,28 @@
+import csv
+import io
+from datetime import datetime
+
+import pytest
+
+export = pytest.importorskip("export")
+
+
+def read_csv(chunks):
+    return list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+
+
+def test_empty_csv_export_still_has_the_header():
+    assert read_csv(export.iter_csv(iter([]), export.MESSAGE_COLUMNS)) == [list(export.MESSAGE_COLUMNS)]
+
+
+def test_csv_rows_follow_the_header():
+    row = {
+        "id": "m1", "room_id": "r1", "user_id": "u1", "user_name": "Ada", "message": "hi, all",
+        "message_type": "text", "file_urls": ["a.png", "b.png"], "created_at": datetime(2024, 1, 2, 3, 4, 5),
+    }
+    header, line = read_csv(export.iter_csv(iter([row]), export.MESSAGE_COLUMNS))
+    values = dict(zip(header, line))
+    assert values["message"] == "hi, all"
+    assert values["file_urls"] == "a.png b.png"
+    assert values["created_at"] == "2024-01-02T03:04:05"
+    assert values["cursor"] == export.encode_cursor(row)
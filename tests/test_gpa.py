@@ -0,0 +1,62 @@
+import io
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import gpa  # noqa: E402
+
+
+def csv(text):
+    return io.StringIO(text.strip() + "\n")
+
+
+def test_blank_credit_hours_use_the_default_in_both_paths():
+    records = gpa.compute_from_records([{"student_id": "a", "letter": "A", "credit_hours": ""}])
+    uploaded = gpa.compute_from_csv(csv("student_id,letter,credit_hours\na,A,"))
+    assert records["students"][0]["cumulative"]["credits"] == gpa.DEFAULT_CREDIT_HOURS
+    assert uploaded["students"][0]["cumulative"]["credits"] == gpa.DEFAULT_CREDIT_HOURS
+
+
+@pytest.mark.parametrize("value", ["abc", "-1", "inf"])
+def test_malformed_credit_hours_are_rejected_in_both_paths(value):
+    with pytest.raises(ValueError):
+        gpa.compute_from_records([{"student_id": "a", "letter": "A", "credit_hours": value}])
+    with pytest.raises(ValueError):
+        gpa.compute_from_csv(csv(f"student_id,letter,credit_hours\na,A,{value}"))
+
+
+def test_tied_students_share_a_rank():
+    result = gpa.compute_from_records([
+        {"student_id": "a", "letter": "A"},
+        {"student_id": "b", "letter": "A"},
+        {"student_id": "c", "letter": "B"},
+    ])
+    ranks = {student["student_id"]: student["class_rank"] for student in result["students"]}
+    assert ranks == {"a": 1, "b": 1, "c": 3}
+
+
+def test_zero_credit_students_are_unranked():
+    result = gpa.compute_from_records([
+        {"student_id": "a", "letter": "A", "credit_hours": 0},
+        {"student_id": "b", "letter": "B"},
+    ])
+    students = {student["student_id"]: student for student in result["students"]}
+    assert students["a"]["cumulative"] == {"credits": 0.0, "unweighted": None, "weighted": None}
+    assert students["a"]["class_rank"] is None and students["a"]["percentile"] is None
+    assert students["b"]["class_rank"] == 1
+
+
+def test_failing_grades_earn_no_level_bonus():
+    result = gpa.compute_from_records([
+        {"student_id": "a", "term": "fall", "letter": "F", "level": "ap"},
+        {"student_id": "a", "term": "spring", "letter": "A", "level": "ap"},
+    ], term_order=["fall", "spring"])
+    fall, spring = result["students"][0]["terms"]
+    assert (fall["unweighted"], fall["weighted"]) == (0.0, 0.0)
+    assert (spring["weighted"], spring["cumulative_weighted"]) == (5.0, 2.5)
+
+
+def test_terms_missing_from_term_order_are_rejected():
+    with pytest.raises(ValueError):
+        gpa.compute_from_records([{"student_id": "a", "term": "fall", "letter": "A"}], term_order=["spring"])
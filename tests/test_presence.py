@@ -0,0 +1,65 @@
+import presence
+
+
+def service(timeout=5.0, slots=512):
+    return presence.PresenceService(timeout=timeout, wheel=presence.TimerWheel(tick_seconds=1.0, slots=slots, now=0.0))
+
+
+def test_timer_wheel_waits_full_turns_for_long_delays():
+    wheel = presence.TimerWheel(tick_seconds=1.0, slots=8, now=0.0)
+    wheel.schedule("key", 20)
+    assert wheel.advance(12.0) == []
+    assert wheel.advance(19.0) == []
+    assert wheel.advance(20.0) == ["key"]
+    assert len(wheel) == 0
+
+
+def test_cancelled_and_rescheduled_timers_do_not_fire_early():
+    wheel = presence.TimerWheel(tick_seconds=1.0, slots=8, now=0.0)
+    wheel.schedule("gone", 2)
+    wheel.schedule("moved", 2)
+    wheel.cancel("gone")
+    wheel.schedule("moved", 5)
+    assert wheel.advance(4.0) == []
+    assert wheel.advance(5.0) == ["moved"]
+
+
+def test_heartbeats_keep_a_connection_and_silence_expires_it():
+    presence_service = service()
+    presence_service.connect("socket", "room", "ada")
+    assert presence_service.expire(3.0) == []
+    presence_service.heartbeat("socket")
+    # Without the heartbeat the connection would have expired at 5s
+    assert presence_service.expire(7.0) == []
+    assert presence_service.expire(8.0) == [("socket", "room", "ada")]
+    assert presence_service.online_count("room") == 0
+    assert presence_service.stats() == {"connections": 0, "rooms": 0, "timers": 0}
+
+
+def test_a_user_stays_online_while_any_connection_is_open():
+    presence_service = service()
+    presence_service.connect("tab1", "room", "ada")
+    presence_service.connect("tab2", "room", "ada")
+    presence_service.disconnect("tab1")
+    assert presence_service.snapshot("room")["online"] == ["ada"]
+
+
+def test_flush_sends_one_diff_and_a_join_then_leave_sends_nothing():
+    presence_service = service()
+    presence_service.connect("a", "room", "ada")
+    event = presence_service.flush()["room"]
+    assert (event["joined"], event["left"], event["online_count"]) == (["ada"], [], 1)
+    assert presence_service.flush() == {}
+
+    presence_service.connect("b", "room", "bob")
+    presence_service.disconnect("b")
+    assert presence_service.flush() == {}
+
+
+def test_typing_expires_without_new_keystrokes():
+    presence_service = service(timeout=60.0)
+    presence_service.connect("a", "room", "ada")
+    presence_service.typing("room", "ada", True, now=0.0)
+    assert presence_service.flush()["room"]["typing"] == ["ada"]
+    assert presence_service.expire(presence.TYPING_TIMEOUT_SECONDS) == []
+    assert presence_service.flush()["room"]["typing"] == []
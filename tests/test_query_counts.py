@@ -0,0 +1,106 @@
+"""Query-count bounds for the hot read endpoints.
+
+Each bound is independent of the amount of data, so a per-row lookup
+(an N+1) fails the test. The tests need a reachable MongoDB (``MONGO_URL``).
+They use a scratch database (``TEST_MONGO_DB``), which they drop.
+pymongo only reports commands to listeners for a real server, so mongomock
+cannot stand in.
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pymongo = pytest.importorskip("pymongo")
+
+os.environ.setdefault("QUERY_TRACE", "header")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from query_trace import assert_max_queries, assert_response_max_queries  # noqa: E402
+
+SCHOOL_ID = "test_school"
+USERS = 30
+MESSAGES = 60
+HELP_REQUESTS = 20
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    try:
+        server.client.admin.command("ping")
+    except pymongo.errors.PyMongoError as e:
+        pytest.skip(f"MongoDB not reachable: {e}")
+    database = server.client[os.environ.get("TEST_MONGO_DB", "school_connect_query_counts")]
+    server.client.drop_database(database.name)
+    server.use_database(database)
+    server.ensure_indexes()
+
+    pk = server.partitions.for_school(SCHOOL_ID)
+    now = datetime.now()
+    user_ids = [f"qc_user_{i}" for i in range(USERS)]
+    # Settled versions, so /api/sync returns everything below
+    database.users.insert_many([{
+        "id": user_id, "pk": pk, "name": f"User {i}", "email": f"user{i}@example.com", "school_id": SCHOOL_ID,
+        "school_type": "high_school", "grade_level": "10", "classes": [{"subject": "Math", "teacher": "T"}],
+        "gpa": None, "created_at": now, "version": i + 1,
+    } for i, user_id in enumerate(user_ids)])
+    database.chat_rooms.insert_one({
+        "id": "qc_room", "pk": pk, "name": "Room", "type": "group", "school_id": SCHOOL_ID, "members": user_ids,
+        "created_by": user_ids[0], "created_at": now, "is_secret": False, "version": 100,
+    })
+    database.chat_messages.insert_many([{
+        "id": f"qc_message_{i}", "pk": pk, "room_id": "qc_room", "user_id": user_ids[i % USERS],
+        "message": f"message {i}", "message_type": "text", "file_urls": [],
+        "created_at": now - timedelta(minutes=MESSAGES - i), "version": 200 + i,
+    } for i in range(MESSAGES)])
+    database.help_requests.insert_many([{
+        "id": f"qc_help_{i}", "pk": pk, "user_id": user_ids[i % USERS], "school_id": SCHOOL_ID,
+        "title": f"Help {i}", "subject": "Math", "description": "Stuck", "image_urls": [], "response_count": 1,
+        "latest_response": {"id": f"qc_response_{i}", "user_id": user_ids[-1 - i % USERS], "message": "Try this", "created_at": now},
+        "status": "answered", "created_at": now - timedelta(minutes=i), "version": 300 + i,
+    } for i in range(HELP_REQUESTS)])
+    yield user_ids
+    server.client.drop_database(database.name)
+
+
+@pytest.fixture(autouse=True)
+def cold_routing_cache():
+    # Count the routing lookups too, as on a fresh worker
+    for cache in server.partitions.caches.values():
+        cache.clear()
+
+
+def test_get_chat_messages_query_count(seeded):
+    # Routing lookup, the page, authors (the page is full, so no archive read)
+    with assert_max_queries(3, repeat_limit=1):
+        response = asyncio.run(server.get_chat_messages("qc_room", limit=50))
+    assert response.body.count(b'"user_name"') == 50
+
+
+def test_get_help_requests_query_count(seeded):
+    # The school's requests, then requesters and latest responders together
+    with assert_max_queries(2, repeat_limit=1):
+        asyncio.run(server.get_help_requests(school_id=SCHOOL_ID))
+
+
+def test_get_user_chat_rooms_query_count(seeded):
+    # Member rooms, then recent message counts in one aggregation
+    with assert_max_queries(2, repeat_limit=1):
+        asyncio.run(server.get_user_chat_rooms(seeded[0]))
+
+
+def test_sync_query_count(seeded):
+    from fastapi.testclient import TestClient
+
+    # Routing lookup, user, member rooms, rooms, removed rooms, messages, help requests,
+    # classmates, then message authors and requesters in one lookup each
+    client = TestClient(server.app)
+    response = client.get("/api/sync", params={"user_id": seeded[0]}, headers={"X-Query-Trace": "1"})
+    assert response.status_code == 200
+    assert len(response.json()["messages"]) == MESSAGES
+    assert_response_max_queries(response, 10)
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("pymongo")
+
+import rate_limit  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    store = rate_limit.MemoryBucketStore()
+    assert [store.consume("k", 2.0, 3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.consume("k", 2.0, 3) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert store.consume("k", 2.0, 3) == 0.0
+    # A long idle period refills only up to the burst
+    clock.now += 60
+    assert [store.consume("k", 2.0, 3) for _ in range(4)][-1] > 0
+
+
+def test_memory_buckets_evict_the_least_recently_used(clock):
+    store = rate_limit.MemoryBucketStore(max_buckets=2)
+    for key in ("a", "b"):
+        store.consume(key, 1.0, 1)
+    store.consume("a", 1.0, 1)
+    store.consume("c", 1.0, 1)
+    assert list(store.buckets) == ["a", "c"]
+    # "b" was forgotten, so it starts again with a full bucket
+    assert store.consume("b", 1.0, 1) == 0.0
+
+
+def test_limiter_scales_the_ip_bucket(clock):
+    limiter = rate_limit.RateLimiter({"read": (1.0, 2)})
+    assert all(limiter.check("ip:1.2.3.4", "read", scale=10) == 0 for _ in range(20))
+    assert limiter.check("ip:1.2.3.4", "read", scale=10) > 0
+    assert limiter.check("anyone", "unlimited") == 0
+    assert limiter.stats()["throttled"] == {"read": 1}
+
+
+def scope(client, headers=(), query=b""):
+    return {"client": (client, 1234), "headers": list(headers), "query_string": query}
+
+
+def test_forwarded_for_is_only_trusted_from_known_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", {"10.0.0.1"})
+    forwarded = [(b"x-forwarded-for", b"6.6.6.6, 7.7.7.7, 10.0.0.1")]
+    assert rate_limit.client_ip(scope("10.0.0.1"), dict(forwarded)) == "7.7.7.7"
+    assert rate_limit.client_ip(scope("8.8.8.8"), dict(forwarded)) == "8.8.8.8"
+
+
+def test_a_claimed_user_id_adds_a_bucket_but_never_replaces_the_ip():
+    identities = rate_limit.client_identities(scope("8.8.8.8", [(b"x-user-id", b"u1")]))
+    assert identities == [("ip:8.8.8.8", rate_limit.IP_LIMIT_SCALE), ("user:u1", 1.0)]
+    assert rate_limit.client_identities(scope("8.8.8.8", query=b"q=x&user_id=u2"))[1] == ("user:u2", 1.0)
+    assert rate_limit.client_identities(scope("8.8.8.8")) == [("ip:8.8.8.8", rate_limit.IP_LIMIT_SCALE)]
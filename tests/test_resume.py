@@ -0,0 +1,49 @@
+import resume
+
+
+def frames(*ids):
+    return [f"frame-{message_id}" for message_id in ids]
+
+
+def filled(capacity=3, count=5):
+    buffer = resume.ReplayBuffer(capacity=capacity)
+    for i in range(1, count + 1):
+        buffer.append("room", f"m{i}", f"frame-m{i}")
+    return buffer
+
+
+def test_replays_only_the_frames_after_last_seen():
+    buffer = filled()
+    assert buffer.since("room", "m3") == frames("m4", "m5")
+    assert buffer.since("room", "m5") == []
+
+
+def test_an_id_older_than_the_buffer_window_is_a_miss():
+    buffer = filled()
+    assert buffer.since("room", "m1") is None
+    assert buffer.since("room", "m2") is None
+    assert buffer.since("other", "m5") is None
+
+
+def test_a_retried_append_is_kept_once():
+    buffer = filled(count=2)
+    buffer.append("room", "m2", "frame-m2")
+    assert buffer.since("room", "m1") == frames("m2")
+
+
+def test_priming_keeps_frames_broadcast_before_it():
+    buffer = resume.ReplayBuffer(capacity=10)
+    buffer.append("room", "m3", "frame-m3")
+    buffer.prime("room", [("m1", "frame-m1"), ("m2", "frame-m2"), ("m3", "frame-m3")])
+    assert buffer.is_primed("room")
+    assert buffer.since("room", "m1") == frames("m2", "m3")
+
+
+def test_least_recently_used_rooms_are_evicted():
+    buffer = resume.ReplayBuffer(capacity=3, max_rooms=2)
+    buffer.prime("a", [("m1", "frame-m1")])
+    buffer.append("b", "m1", "frame-m1")
+    buffer.since("a", "m1")
+    buffer.append("c", "m1", "frame-m1")
+    assert list(buffer.rooms) == ["a", "c"]
+    assert buffer.is_primed("a") and not buffer.is_primed("b")
@@ -0,0 +1,43 @@
+import json
+
+from school_catalog import SchoolCatalog
+
+SCHOOLS = [
+    {"id": "plano_east", "name": "Plano East Senior High", "school_type": "high_school", "city": "Plano", "district": "Plano ISD"},
+    {"id": "plano_west", "name": "Plano West Senior High", "school_type": "high_school", "city": "Plano", "district": "Plano ISD"},
+    {"id": "east_central", "name": "East Central High", "school_type": "high_school", "city": "San Antonio"},
+    {"id": "rice", "name": "Rice University", "school_type": "college", "city": "Houston"},
+]
+
+
+def names(results):
+    return [school["name"] for school in results[1]]
+
+
+def test_name_prefix_ranks_before_token_and_city_matches():
+    catalog = SchoolCatalog(SCHOOLS)
+    assert names(catalog.search("east")) == ["East Central High", "Plano East Senior High"]
+    assert names(catalog.search("houston")) == ["Rice University"]
+
+
+def test_every_query_token_must_match():
+    catalog = SchoolCatalog(SCHOOLS)
+    total, results = catalog.search("plano we")
+    assert total == 1 and names((total, results)) == ["Plano West Senior High"]
+    assert catalog.search("plano rice") == (0, [])
+
+
+def test_type_filter_offset_and_empty_queries():
+    catalog = SchoolCatalog(SCHOOLS)
+    assert names(catalog.search("plano", limit=1, offset=1)) == ["Plano West Senior High"]
+    assert catalog.search("rice", school_type="high_school") == (0, [])
+    assert catalog.search("  ", limit=5) == (0, [])
+    assert catalog.search("rice", school_type="unknown") == (0, [])
+
+
+def test_grouped_catalog_round_trips(tmp_path):
+    path = tmp_path / "schools.json"
+    path.write_text(json.dumps(SchoolCatalog(SCHOOLS).grouped()))
+    catalog = SchoolCatalog.load(str(path))
+    assert catalog.get("rice")["school_type"] == "college"
+    assert len(catalog.by_district["plano isd"]) == 2